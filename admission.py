@@ -0,0 +1,176 @@
+"""
+Admission control for CPU-heavy endpoints.
+Each client address gets a token bucket; buckets live in
+a small memory-mapped table in /dev/shm so every gunicorn worker on the box
+sees the same limits. Each worker also caps how many CPU-bound requests it runs
+at once and sheds requests it could not start within the latency budget.
+Throttled clients get 429 and shed requests 503, both with Retry-After; read
+endpoints are not gated and so keep priority.
+"""
+
+import fcntl
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+import logging
+from functools import wraps
+from typing import Optional, Tuple
+from flask import jsonify, request, Response
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', 2))  # Tokens refilled per second
+ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', 20))  # Bucket size
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 4))  # Per worker
+ADMISSION_BUDGET_MS = float(os.environ.get('ADMISSION_BUDGET_MS', 200))  # Longest acceptable wait for a slot
+ADMISSION_STATE_FILE = os.environ.get(
+    'ADMISSION_STATE_FILE',
+    os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'budget-gm-admission')
+)
+
+SLOTS = 4096
+PROBES = 4
+_ENTRY = struct.Struct('Qdd')  # client hash, tokens, last refill time
+
+_state = None  # (pid, file, mmap) for the current process
+_worker = None  # (pid, semaphore) for the current process
+_in_flight = 0
+_avg_service_ms = 0.0
+_counts = {'admitted': 0, 'throttled': 0, 'shed': 0}
+
+def _open_state():
+    """Map the shared bucket table; opened per process so flock excludes other workers"""
+    global _state
+    if _state is None or _state[0] != os.getpid():
+        f = open(ADMISSION_STATE_FILE, 'a+b')
+        if os.fstat(f.fileno()).st_size < SLOTS * _ENTRY.size:
+            f.truncate(SLOTS * _ENTRY.size)
+        _state = (os.getpid(), f, mmap.mmap(f.fileno(), SLOTS * _ENTRY.size))
+    return _state
+
+def _semaphore():
+    # Created lazily after fork so it is a gevent semaphore once the worker is patched
+    global _worker
+    if _worker is None or _worker[0] != os.getpid():
+        _worker = (os.getpid(), threading.BoundedSemaphore(ADMISSION_MAX_CONCURRENT))
+    return _worker[1]
+
+def client_key() -> str:
+    """Identify the client by its address.
+    remote_addr is the hop our own proxy saw (the app applies ProxyFix with
+    TRUSTED_PROXY_COUNT), never a client-supplied X-Forwarded-For entry; session
+    names are client-chosen too, so neither can be used to mint fresh buckets."""
+    return f"ip:{request.remote_addr}"
+
+def take_tokens(key: str, cost: float = 1.0, rate: float = ADMISSION_RATE,
+                burst: float = ADMISSION_BURST) -> Tuple[bool, float]:
+    """Take cost tokens from key's bucket; returns (allowed, seconds until enough tokens)"""
+    _, f, table = _open_state()
+    client = zlib.crc32(key.encode('utf-8')) | (len(key) << 32)
+    start = client % SLOTS
+    now = time.time()
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        slot, tokens, updated = None, burst, now
+        oldest = None
+        for probe in range(PROBES):
+            index = (start + probe) % SLOTS
+            entry_client, entry_tokens, entry_updated = _ENTRY.unpack_from(table, index * _ENTRY.size)
+            if entry_client == client:
+                slot, tokens, updated = index, entry_tokens, entry_updated
+                break
+            if oldest is None or entry_updated < oldest[1]:
+                oldest = (index, entry_updated)
+        if slot is None:
+            # New client takes the stalest slot in its probe range with a full bucket
+            slot = oldest[0]
+
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        _ENTRY.pack_into(table, slot * _ENTRY.size, client, tokens, now)
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+def _reject(status: int, message: str, retry_after: float) -> Response:
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def _acquire_slot() -> Optional[float]:
+    """Take a concurrency slot, or return the suggested retry delay if the request should be shed"""
+    # Shed up front when the queue ahead already exceeds the budget
+    queued = max(0, _in_flight - ADMISSION_MAX_CONCURRENT + 1)
+    expected_wait_ms = queued * _avg_service_ms / ADMISSION_MAX_CONCURRENT
+    if expected_wait_ms > ADMISSION_BUDGET_MS:
+        return expected_wait_ms / 1000
+    if not _semaphore().acquire(timeout=ADMISSION_BUDGET_MS / 1000):
+        return max(expected_wait_ms, ADMISSION_BUDGET_MS) / 1000
+    return None
+
+def _release_slot(start: float) -> None:
+    global _in_flight, _avg_service_ms
+    _in_flight -= 1
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _avg_service_ms = elapsed_ms if _avg_service_ms == 0 else 0.9 * _avg_service_ms + 0.1 * elapsed_ms
+    _semaphore().release()
+
+def admit(cost: float = 1.0, concurrency: bool = True):
+    """Gate a CPU-heavy view behind the client's token bucket and the worker's concurrency cap.
+    Views that batch their work internally pass concurrency=False and only use the bucket."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            global _in_flight
+            try:
+                allowed, retry_after = take_tokens(client_key(), cost)
+            except OSError as e:
+                # Never fail requests because the limiter state is unavailable
+                logger.error(f"Admission state unavailable: {str(e)}")
+                allowed, retry_after = True, 0.0
+            if not allowed:
+                _counts['throttled'] += 1
+                return _reject(429, 'Too many requests', retry_after)
+            if not concurrency:
+                _counts['admitted'] += 1
+                return view(*args, **kwargs)
+
+            _in_flight += 1
+            retry_after = _acquire_slot()
+            if retry_after is not None:
+                _in_flight -= 1
+                _counts['shed'] += 1
+                return _reject(503, 'Server busy, try again shortly', retry_after)
+
+            _counts['admitted'] += 1
+            start = time.perf_counter()
+            try:
+                result = view(*args, **kwargs)
+            except Exception:
+                _release_slot(start)
+                raise
+            if isinstance(result, Response) and result.is_streamed:
+                # Streamed bodies do their work while being sent; hold the slot until then
+                result.call_on_close(lambda: _release_slot(start))
+            else:
+                _release_slot(start)
+            return result
+        return wrapper
+    return decorator
+
+def stats() -> dict:
+    """Admission counters for this worker"""
+    return {
+        **_counts,
+        'in_flight': _in_flight,
+        'max_concurrent': ADMISSION_MAX_CONCURRENT,
+        'avg_service_ms': round(_avg_service_ms, 2)
+    }
@@ -1,18 +1,33 @@
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+from flask import Flask, render_template, jsonify, request, session, redirect, url_for, Response
 import json
 from team_simulator import TeamSimulator, Player
-from models import DailyChallenge
+from models import CHALLENGE_DIR, DailyChallenge, get_challenge
+import challenge_scheduler
+import challenge_manifest
+import user_history
+import leaderboard_rollups
+import challenge_bundle
+from response_cache import cached_json, bump_generation
+import json_provider
+import batch_simulator
+import micro_batcher
+import job_queue
+from admission import admit
+import metrics
+import gc_policy
+import request_profiler
+import warmup
 import os
+import sys
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta
 import random
 import logging
-from player_pool import PlayerPool
+import logging_config
 from data_fetcher import NBADataFetcher
 import time
-import gc
 from dotenv import load_dotenv
-from gevent.pool import Pool
 from player_stats import get_player_stats, get_all_player_stats, get_player_3_season_avg
 from team_builder import TeamBuilder
 from static_player_pool import get_static_player_pool
@@ -20,17 +35,16 @@ from static_player_pool import get_static_player_pool
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging once for the whole app
+logging_config.configure()
 logger = logging.getLogger(__name__)
 
-# Initialize connection pool
-pool = Pool(100)  # Limit concurrent operations
-
 app = Flask(__name__)
+# Client addresses come from the X-Forwarded-For entries our own proxies appended;
+# set TRUSTED_PROXY_COUNT=0 when clients connect directly
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
 CORS(app, resources={
     r"/api/*": {
         "origins": [
@@ -45,6 +59,10 @@ CORS(app, resources={
     }
 })
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+json_provider.init_app(app)
+metrics.init_app(app)
+gc_policy.init_app(app)
+request_profiler.init_app(app)
 
 # Ensure data directories exist
 os.makedirs('data/challenges', exist_ok=True)
@@ -52,7 +70,6 @@ os.makedirs('cache', exist_ok=True)
 
 # Initialize services with connection pooling
 data_fetcher = NBADataFetcher()
-player_pool = PlayerPool()
 simulator = TeamSimulator()
 
 # Initialize team builder and simulator
@@ -74,6 +91,7 @@ def get_cached_player_pool():
             logger.info("Refreshing player pool cache...")
             _player_pool_cache = get_static_player_pool()
             _last_cache_update = current_time
+            bump_generation()
             logger.info(f"Successfully cached {len(_player_pool_cache)} players")
         except Exception as e:
             logger.error(f"Error refreshing player pool cache: {str(e)}")
@@ -82,11 +100,30 @@ def get_cached_player_pool():
     
     return _player_pool_cache
 
+def load_challenge(date=None):
+    """Load a challenge for a request; only today's may be generated on demand"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    date = date or today
+    return get_challenge(date, generate=(date == today))
+
+def requested_challenge(date=None):
+    """The challenge a request names (default: today's), or None if the date is
+    malformed, in the future or has no challenge"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    if date is not None:
+        try:
+            datetime.strptime(str(date), '%Y-%m-%d')
+        except ValueError:
+            return None
+        if date > today:
+            return None
+    challenge = load_challenge(date)
+    return challenge if challenge.players else None
+
 @app.route('/')
 def index():
     # Get the current challenge
-    today = datetime.now().strftime('%Y-%m-%d')
-    challenge = DailyChallenge(today)
+    challenge = load_challenge()
     
     # Check if user has already submitted for today
     player_name = session.get('player_name')
@@ -113,7 +150,20 @@ def logout():
     session.pop('player_name', None)
     return redirect(url_for('index'))
 
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics of all workers"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    """Readiness: 503 until this worker has warmed up"""
+    if not warmup.is_ready():
+        return jsonify({'ready': False}), 503
+    return jsonify({'ready': True})
+
 @app.route('/api/player-pool', methods=['GET'])
+@cached_json(max_age=300, sources=['tiered_player_pool.json'])
 def get_player_pool():
     try:
         # Load the tiered player pool
@@ -125,7 +175,7 @@ def get_player_pool():
             if len(player_pool[tier]) != 5:
                 raise ValueError(f"Expected 5 players in {tier} tier, got {len(player_pool[tier])}")
         
-        return jsonify(player_pool)
+        return player_pool
     except Exception as e:
         logger.error(f"Error getting player pool: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -148,6 +198,7 @@ def create_team():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/simulate', methods=['POST'])
+@admit()
 def simulate_game():
     try:
         data = request.get_json()
@@ -161,53 +212,46 @@ def simulate_game():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/player/<player_name>', methods=['GET'])
+@cached_json(max_age=300)
 def get_player(player_name):
     try:
         player_data = get_player_stats(player_name)
         if not player_data:
             return jsonify({'error': 'Player not found'}), 404
-        return jsonify(player_data)
+        return player_data
     except Exception as e:
         logger.error(f"Error in get_player: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/simulate-team', methods=['POST'])
+@admit(concurrency=False)
 def simulate_team():
+    """Simulate a lineup's season against the roster of a challenge (default: today's)"""
     try:
         data = request.get_json()
         if not data or 'players' not in data:
             return jsonify({'error': 'Invalid request data'}), 400
-            
-        # Create team simulator
-        team = TeamSimulator()
         
-        # Add players to team
-        for player_data in data['players']:
-            try:
-                player = Player(
-                    name=player_data['name'],
-                    stats=player_data['stats']
-                )
-                team.add_player(player)
-            except ValueError as e:
-                return jsonify({'error': str(e)}), 400
-                
-        # Simulate season
-        wins, losses = team.simulate_season()
+        challenge = requested_challenge(data.get('date'))
+        if challenge is None:
+            return jsonify({'error': 'Challenge not found'}), 404
+            
+        # Simulate season, batched with other concurrent requests in this worker
+        pool = batch_simulator.get_roster_index(challenge)
+        result = micro_batcher.simulate_season(batch_simulator.lineup_names(data['players']), pool)
+        if 'error' in result:
+            return jsonify({'error': result['error']}), 400
         
-        return jsonify({
-            'wins': wins,
-            'losses': losses,
-            'win_probability': team.win_probability,
-            'team_stats': team.get_team_stats()
-        })
+        return jsonify(result)
         
     except Exception as e:
         logger.error(f"Error simulating team: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
-    finally:
-        # Force garbage collection
-        gc.collect()
+
+@app.route('/api/simulate/batcher', methods=['GET'])
+def get_batcher_stats():
+    """Batch sizes and latencies of this worker's simulation batcher"""
+    return jsonify(micro_batcher.get_season_batcher().stats())
 
 @app.route('/api/validate-team', methods=['POST'])
 def validate_team():
@@ -216,21 +260,15 @@ def validate_team():
         if not data or 'players' not in data:
             return jsonify({'error': 'No players provided'}), 400
         
-        # Load the tiered player pool
-        with open('tiered_player_pool.json', 'r') as f:
-            player_pool = json.load(f)
-        
-        # Validate each player exists in the pool
+        # Validate each player against today's challenge roster
+        challenge = load_challenge()
+        costs = {p['name']: int(str(p.get('cost', '$1')).replace('$', '')) for p in challenge.players}
         total_cost = 0
         for player in data['players']:
-            found = False
-            for tier in ['$5', '$4', '$3', '$2', '$1']:
-                if any(p['name'] == player['name'] for p in player_pool[tier]):
-                    total_cost += int(tier.replace('$', ''))
-                    found = True
-                    break
-            if not found:
-                return jsonify({'error': f'Player {player["name"]} not found in pool'}), 400
+            name = player.get('name') if isinstance(player, dict) else player
+            if name not in costs:
+                return jsonify({'error': f'Player {name} not found in pool'}), 400
+            total_cost += costs[name]
         
         # Check budget constraint
         if total_cost > 15:
@@ -249,18 +287,49 @@ def validate_team():
         logger.error(f"Error validating team: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/submit', methods=['POST'])
+@admit()
+def submit_team():
+    """Submit a lineup for today's challenge; its season is simulated on the server"""
+    data = request.get_json(silent=True)
+    player_name = (data or {}).get('player_name') or session.get('player_name')
+    if not data or not player_name or not isinstance(data.get('players'), list):
+        return jsonify({'error': 'player_name and players are required'}), 400
+    
+    try:
+        challenge = load_challenge()
+        if challenge.get_player_submission(player_name):
+            return jsonify({'error': 'Already submitted for today'}), 409
+        
+        names = batch_simulator.lineup_names(data['players'])
+        # A lineup submitted before reuses its season instead of simulating a new one
+        record = challenge.get_lineup_record(names)
+        if record is None:
+            result = micro_batcher.simulate_season(names, batch_simulator.get_roster_index(challenge))
+            if 'error' in result:
+                return jsonify({'error': result['error']}), 400
+            record = {'wins': result['wins'], 'losses': result['losses']}
+        
+        submission = challenge.submit_team(player_name, names, record)
+        if not submission:
+            # Another request may have stored this player's submission since the check above
+            if DailyChallenge(challenge.date, generate=False).get_player_submission(player_name):
+                return jsonify({'error': 'Already submitted for today'}), 409
+            return jsonify({'error': 'Invalid team for this challenge'}), 400
+        
+        return jsonify({'success': True, 'date': challenge.date, 'lineup': submission.get('lineup'),
+                        'record': submission['record']})
+    except Exception as e:
+        logger.error(f"Error submitting team: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/leaderboard')
 def leaderboard():
     # Check if a date parameter is provided
     date = request.args.get('date')
     
-    if date:
-        # Load the challenge for the specified date
-        challenge = DailyChallenge(date)
-    else:
-        # Get the current challenge
-        today = datetime.now().strftime('%Y-%m-%d')
-        challenge = DailyChallenge(today)
+    # Load the challenge for the specified date or today
+    challenge = load_challenge(date)
     
     leaderboard_data = challenge.get_leaderboard()
     
@@ -282,6 +351,23 @@ def leaderboard():
                           player_percentile=player_percentile,
                           challenge_date=challenge.date)
 
+@app.route('/api/leaderboard')
+def get_period_leaderboard():
+    period = request.args.get('period', 'all')
+    if period not in leaderboard_rollups.PERIODS:
+        return jsonify({'error': f"Invalid period: {period}"}), 400
+    
+    key = request.args.get('key')
+    if key and not leaderboard_rollups.is_valid_key(period, key):
+        return jsonify({'error': f"Invalid key for period {period}: {key}"}), 400
+    
+    try:
+        limit = request.args.get('limit', leaderboard_rollups.ROLLUP_TOP_K, type=int)
+        return jsonify(leaderboard_rollups.get_period_leaderboard(period, key, limit))
+    except Exception as e:
+        logger.error(f"Error getting {period} leaderboard: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/check_submission')
 def check_submission():
     player_name = request.args.get('player_name')
@@ -291,8 +377,7 @@ def check_submission():
         return jsonify({'error': 'Missing player name'}), 400
     
     # Get the challenge for the specified date or today
-    today = datetime.now().strftime('%Y-%m-%d')
-    challenge = DailyChallenge(date) if date else DailyChallenge(today)
+    challenge = load_challenge(date)
     
     submission = challenge.get_player_submission(player_name)
     return jsonify({
@@ -309,8 +394,7 @@ def get_submitted_team():
         return jsonify({'error': 'Missing player name'}), 400
     
     # Get the challenge for the specified date or today
-    today = datetime.now().strftime('%Y-%m-%d')
-    challenge = DailyChallenge(date) if date else DailyChallenge(today)
+    challenge = load_challenge(date)
     
     submission = challenge.get_player_submission(player_name)
     if not submission:
@@ -320,30 +404,104 @@ def get_submitted_team():
 
 @app.route('/api/available_dates')
 def get_available_dates():
-    challenge = DailyChallenge(datetime.now().strftime('%Y-%m-%d'))
-    dates = challenge.get_available_dates()
-    return jsonify(dates)
+    try:
+        limit = request.args.get('limit', type=int)
+        dates = challenge_manifest.list_dates(
+            before=request.args.get('before'),
+            after=request.args.get('after'),
+            limit=limit,
+            include_summary=request.args.get('summary', '').lower() in ('1', 'true')
+        )
+        return jsonify(dates)
+    except Exception as e:
+        logger.error(f"Error getting available dates: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/users/<player_name>/history')
+def get_user_history(player_name):
+    try:
+        history = user_history.get_history(player_name)
+        if not history:
+            return jsonify({'error': 'No submissions found'}), 404
+        
+        days = [{'date': date, **entry} for date, entry in sorted(history['days'].items(), reverse=True)]
+        return jsonify({
+            'player_name': history['player_name'],
+            'days': days,
+            'stats': user_history.get_lifetime_stats(history)
+        })
+    except Exception as e:
+        logger.error(f"Error getting history for {player_name}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _challenge_sources(date):
+    """Files /api/challenge/<date> is served from"""
+    return [challenge_scheduler.artifact_path(date, 'challenge.json'), os.path.join(CHALLENGE_DIR, f"{date}.json")]
 
 @app.route('/api/challenge/<date>')
+@cached_json(max_age=3600, sources=_challenge_sources)
 def get_challenge_by_date(date):
-    challenge = DailyChallenge(date)
+    # Future challenges are generated ahead of time but must not be revealed
+    if date > datetime.now().strftime('%Y-%m-%d'):
+        return jsonify({'error': 'Challenge not found'}), 404
+    
+    payload = challenge_scheduler.load_challenge_payload(date)
+    if payload is not None:
+        return payload
+    
+    challenge = load_challenge(date)
     if not challenge.players:
         return jsonify({'error': 'Challenge not found'}), 404
     
-    return jsonify({
+    return {
         'date': challenge.date,
         'players': challenge.players
+    }
+
+@app.route('/api/challenge/<date>/bundle')
+def get_challenge_bundle(date):
+    """Roster, leaderboard, distribution and the viewer's submission and rank in one response"""
+    if date > datetime.now().strftime('%Y-%m-%d'):
+        return jsonify({'error': 'Challenge not found'}), 404
+    
+    try:
+        challenge = load_challenge(date)
+        if not challenge.players:
+            return jsonify({'error': 'Challenge not found'}), 404
+        
+        player_name = request.args.get('player_name') or session.get('player_name')
+        body = challenge_bundle.render_bundle(challenge, player_name)
+        return Response(body, mimetype='application/json', headers={'Cache-Control': 'private, no-cache'})
+    except Exception as e:
+        logger.error(f"Error building challenge bundle for {date}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/challenge/<date>/lineups')
+def get_popular_lineups(date):
+    if date > datetime.now().strftime('%Y-%m-%d'):
+        return jsonify({'error': 'Challenge not found'}), 404
+    
+    challenge = load_challenge(date)
+    if not challenge.players:
+        return jsonify({'error': 'Challenge not found'}), 404
+    
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify({
+        'date': challenge.date,
+        'unique_lineups': len(challenge.lineups),
+        'lineups': challenge.get_popular_lineups(limit)
     })
 
 @app.route('/api/players', methods=['GET'])
+@cached_json(max_age=300)
 def get_players():
     """Get all players with their stats"""
     try:
         players = get_all_player_stats()
-        return jsonify({
+        return {
             'success': True,
             'data': players
-        })
+        }
     except Exception as e:
         logger.error(f"Error getting players: {str(e)}")
         return jsonify({
@@ -379,6 +537,7 @@ def get_player_stats_endpoint(player_name: str):
         }), 500
 
 @app.route('/api/simulate/season', methods=['POST'])
+@admit()
 def simulate_season():
     try:
         data = request.get_json()
@@ -411,6 +570,101 @@ def simulate_season():
         logger.error(f"Error simulating season: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/simulate/batch', methods=['POST'])
+@admit(cost=10)
+def simulate_batch():
+    """Simulate a season for many lineups against a challenge's roster (default: today's),
+    streamed back as NDJSON in request order"""
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('lineups'), list):
+        return jsonify({'error': 'No lineups provided'}), 400
+    
+    lineups = data['lineups']
+    if len(lineups) > batch_simulator.MAX_BATCH_LINEUPS:
+        return jsonify({'error': f"At most {batch_simulator.MAX_BATCH_LINEUPS} lineups per request"}), 400
+    
+    try:
+        games = int(data.get('games', batch_simulator.GAMES_PER_SEASON))
+        seed = data.get('seed')
+        seed = int(seed) if seed is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'games and seed must be integers'}), 400
+    if not 1 <= games <= 1000:
+        return jsonify({'error': 'games must be between 1 and 1000'}), 400
+    
+    challenge = requested_challenge(data.get('date'))
+    if challenge is None:
+        return jsonify({'error': 'Challenge not found'}), 404
+    pool = batch_simulator.get_roster_index(challenge)
+    
+    def generate():
+        lines = []
+        try:
+            for result in batch_simulator.simulate_batch(lineups, pool, games, seed):
+                lines.append(json_provider.dumps_bytes(result))
+                if len(lines) >= batch_simulator.CHUNK_SIZE:
+                    yield b'\n'.join(lines) + b'\n'
+                    lines = []
+        except Exception as e:
+            logger.error(f"Error in batch simulation: {str(e)}")
+            lines.append(json_provider.dumps_bytes({'error': 'Internal server error'}))
+        if lines:
+            yield b'\n'.join(lines) + b'\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/jobs', methods=['POST'])
+@admit(cost=5)
+def submit_job():
+    """Queue a long simulation (seasons, tournament or replay) and return its job id"""
+    data = request.get_json(silent=True)
+    if not data or 'type' not in data:
+        return jsonify({'error': 'Job type is required'}), 400
+    
+    params = data.get('params', {})
+    try:
+        error = job_queue.validate_params(data['type'], params)
+    except (TypeError, ValueError):
+        error = 'Invalid job parameters'
+    if error:
+        return jsonify({'error': error}), 400
+    
+    job = job_queue.submit_job(data['type'], params)
+    return jsonify({'id': job['id'], 'status': job['status'], 'url': url_for('get_job', job_id=job['id'])}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status, progress and (once done) result of a job"""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """Stream a job's status as NDJSON, one line per change, until it finishes"""
+    if job_queue.get_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        last = None
+        deadline = time.time() + 600
+        while time.time() < deadline:
+            job = job_queue.get_job(job_id)
+            if job is None:
+                break
+            state = (job['status'], job['progress'].get('done'))
+            if state != last:
+                last = state
+                if job['status'] not in job_queue.FINISHED:
+                    job = {key: job[key] for key in ('id', 'status', 'progress')}
+                yield json_provider.dumps_bytes(job) + b'\n'
+            if job['status'] in job_queue.FINISHED:
+                break
+            time.sleep(job_queue.JOB_POLL_INTERVAL)
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @app.route('/api/player/stats/summary/<player_name>', methods=['GET'])
 def get_player_stats_summary(player_name: str):
     """Get a comprehensive stats summary for a player"""
@@ -434,5 +688,9 @@ def get_player_stats_summary(player_name: str):
         }), 500
 
 if __name__ == '__main__':
+    # gunicorn warms workers in post_worker_init; the dev server warms up here
+    warmup.warm_up(sys.modules[__name__])
+    if challenge_scheduler.SCHEDULER_ENABLED:
+        challenge_scheduler.start_background_scheduler()
     port = int(os.environ.get('PORT', 10000))
     app.run(host='0.0.0.0', port=port) 
\ No newline at end of file
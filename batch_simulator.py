@@ -0,0 +1,119 @@
+"""
+Vectorized season simulation for many lineups at once.
+Lineups are resolved against an index of a challenge's roster (cached per
+challenge date), and every game of every season is simulated in a single numpy pass
+using the same model as TeamSimulator.simulate_game: team rating plus uniform
+noise against a randomly drawn $15 opponent (one player from each cost tier).
+"""
+
+import logging
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from team_simulator import Player
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_LINEUPS = 5000
+CHUNK_SIZE = 1000
+GAMES_PER_SEASON = 82
+TEAM_SIZE = 5
+RATING_NOISE = 5.0  # Same +/-5 swing as TeamSimulator.simulate_game
+MAX_ROSTER_INDEXES = 8  # Challenge dates whose roster index is kept
+
+class PoolIndex:
+    """Player pool arrays for vectorized lookups"""
+
+    def __init__(self, players: List[Dict]):
+        self.names = [p['name'] for p in players]
+        self.index = {name.lower(): i for i, name in enumerate(self.names)}
+        self.ratings = np.array([Player(p['name'], p.get('stats', {})).get_rating() for p in players])
+        self.costs = np.array([int(str(p.get('cost', '$1')).replace('$', '')) for p in players])
+        # Opponents take one player per cost tier; an empty tier draws from the whole pool
+        self.tier_ratings = []
+        for cost in (5, 4, 3, 2, 1):
+            tier = self.ratings[self.costs == cost]
+            self.tier_ratings.append(tier if len(tier) else self.ratings)
+
+    def resolve(self, lineup: List[str]) -> Tuple[Optional[List[int]], Optional[str]]:
+        """Map player names to pool indices, or return an error message"""
+        if len(lineup) != TEAM_SIZE:
+            return None, f"Lineup must have {TEAM_SIZE} players, got {len(lineup)}"
+        indices = []
+        for name in lineup:
+            i = self.index.get(str(name).lower())
+            if i is None:
+                return None, f"Player {name} not found in pool"
+            indices.append(i)
+        return indices, None
+
+_roster_indexes = OrderedDict()  # challenge date -> (roster names, PoolIndex)
+
+def get_roster_index(challenge) -> PoolIndex:
+    """Index of a challenge's roster, built on first use and cached per challenge date
+    (rebuilt if the date's roster changed)"""
+    names = tuple(p['name'] for p in challenge.players)
+    entry = _roster_indexes.get(challenge.date)
+    if entry is None or entry[0] != names:
+        entry = _roster_indexes[challenge.date] = (names, PoolIndex(challenge.players))
+        logger.info(f"Built roster index for {challenge.date} with {len(names)} players")
+        while len(_roster_indexes) > MAX_ROSTER_INDEXES:
+            _roster_indexes.popitem(last=False)
+    _roster_indexes.move_to_end(challenge.date)
+    return entry[1]
+
+def simulate_seasons(team_ratings: np.ndarray, pool: PoolIndex, games: int = GAMES_PER_SEASON,
+                     rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Wins of each team rating over a season against random $15 opponents"""
+    rng = rng or np.random.default_rng()
+    shape = (len(team_ratings), games)
+    opponents = np.zeros(shape)
+    for tier in pool.tier_ratings:
+        opponents += rng.choice(tier, size=shape)
+    team = team_ratings[:, None] + rng.uniform(-RATING_NOISE, RATING_NOISE, size=shape)
+    opponents += rng.uniform(-RATING_NOISE, RATING_NOISE, size=shape)
+    return (team > opponents).sum(axis=1)
+
+def lineup_names(lineup) -> List[str]:
+    """Accept a lineup as a list of names, player dicts, or {'players': [...]}"""
+    if isinstance(lineup, dict):
+        lineup = lineup.get('players', [])
+    return [p.get('name') if isinstance(p, dict) else p for p in lineup]
+
+def simulate_batch(lineups: List, pool: PoolIndex, games: int = GAMES_PER_SEASON, seed: Optional[int] = None):
+    """Simulate a season for every lineup against pool (a challenge's roster index),
+    yielding one result dict per lineup in order"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, len(lineups), CHUNK_SIZE):
+        chunk = lineups[start:start + CHUNK_SIZE]
+        resolved = []
+        errors = {}
+        for offset, lineup in enumerate(chunk):
+            indices, error = pool.resolve(lineup_names(lineup))
+            if error:
+                errors[offset] = error
+            else:
+                resolved.append((offset, indices))
+
+        results = {}
+        if resolved:
+            index_matrix = np.array([indices for _, indices in resolved])
+            team_ratings = pool.ratings[index_matrix].sum(axis=1)
+            total_costs = pool.costs[index_matrix].sum(axis=1)
+            wins = simulate_seasons(team_ratings, pool, games, rng)
+            for row, (offset, _) in enumerate(resolved):
+                results[offset] = {
+                    'wins': int(wins[row]),
+                    'losses': games - int(wins[row]),
+                    'win_probability': round(float(wins[row]) / games, 3),
+                    'team_rating': round(float(team_ratings[row]), 1),
+                    'total_cost': int(total_costs[row])
+                }
+
+        for offset in range(len(chunk)):
+            result = {'index': start + offset}
+            if offset in errors:
+                result['error'] = errors[offset]
+            else:
+                result.update(results[offset])
+            yield result
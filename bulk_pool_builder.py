@@ -0,0 +1,169 @@
+"""
+Builds the game's player pool from one bulk leaguedashplayerstats payload.
+The payload (cache/player_stats.json by default) already holds a row per
+player for the whole league, so the pool is computed column-wise with numpy
+in a single pass instead of two API calls per player:
+
+- season totals from the per-game columns (PerMode=PerGame payloads are scaled by GP)
+- TS% and the rating, with the same formulas as player_scraper
+- cost tiers from rating percentiles: 95/80/60/30, as in NBADataFetcher
+- positions and 3-season averages joined by name from the existing pool
+  (the current season stands in for players who have no 3-season data; such
+  stand-ins are never joined back, so a later build picks up fresh stats)
+
+The result is written atomically in the tier-keyed layout the app loads.
+
+Usage:
+    python bulk_pool_builder.py
+    python bulk_pool_builder.py --source cache/player_stats.json --out player_pool.json
+"""
+
+import argparse
+import time
+import logging
+import logging_config
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import json_provider
+from file_store import atomic_write_json
+from static_player_pool import get_static_player_pool
+
+logger = logging.getLogger(__name__)
+
+SOURCE_FILE = 'cache/player_stats.json'
+OUTPUT_FILE = 'player_pool.json'
+TIERS = ['$5', '$4', '$3', '$2', '$1']
+TIER_PERCENTILES = [95, 80, 60, 30]  # Lower bound of each tier above $1
+COUNTING_COLUMNS = ['PTS', 'AST', 'REB', 'STL', 'BLK', 'TOV', 'FGA', 'FTA']
+RATE_COLUMNS = ['FG_PCT', 'FG3_PCT', 'FT_PCT']
+
+def load_rows(source: str = SOURCE_FILE) -> List[Dict]:
+    """Player rows of a cached payload: {'data': [rows]} or a raw stats.nba.com response"""
+    with open(source, 'rb') as f:
+        payload = json_provider.load(f)
+    if isinstance(payload, dict) and 'data' in payload:
+        return payload['data']
+    result_set = (payload.get('resultSets') or [payload.get('resultSet')])[0]
+    headers = result_set['headers']
+    return [dict(zip(headers, row)) for row in result_set['rowSet']]
+
+def _column(rows: List[Dict], name: str) -> np.ndarray:
+    return np.array([row.get(name) or 0 for row in rows], dtype=np.float64)
+
+def compute_columns(rows: List[Dict], per_game: bool = True) -> Dict[str, np.ndarray]:
+    """Season totals, percentages, TS%, rating, percentile and tier index for every row"""
+    gp = _column(rows, 'GP')
+    scale = gp if per_game else np.ones_like(gp)
+    cols = {'GP': gp}
+    for name in COUNTING_COLUMNS:
+        cols[name] = np.round(_column(rows, name) * scale, 1)
+    for name in RATE_COLUMNS:
+        cols[name] = _column(rows, name)
+
+    # player_scraper.calculate_ts_pct
+    attempts = 2 * (cols['FGA'] + 0.44 * cols['FTA'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cols['TS_PCT'] = np.where(attempts > 0, np.round(cols['PTS'] / attempts * 100, 1), 0.0)
+
+    # player_scraper.calculate_player_rating
+    cols['RATING'] = np.round(
+        cols['PTS'] * 0.35 + cols['AST'] * 0.15 + cols['REB'] * 0.15 + cols['STL'] * 0.1 + cols['BLK'] * 0.1
+        + cols['FG_PCT'] * 100 * 0.075 + cols['FG3_PCT'] * 100 * 0.075, 1)
+
+    # Share of players rated strictly lower, as in NBADataFetcher.calculate_player_cost
+    ratings = cols['RATING']
+    cols['PERCENTILE'] = np.searchsorted(np.sort(ratings), ratings, side='left') / max(len(ratings), 1) * 100
+    # 0 for $5 ... 4 for $1
+    cols['TIER'] = np.searchsorted(-np.array(TIER_PERCENTILES, dtype=np.float64), -cols['PERCENTILE'], side='left')
+    return cols
+
+def load_join_data(pool_files: List[str]) -> Tuple[Dict[str, str], Dict[str, Dict]]:
+    """Positions and 3-season averages by player name from existing pool files.
+    An average equal to the player's own stats is a stand-in from an earlier build and is skipped.
+    The static pool fills in positions only: its averages are per game, the pool's are season totals."""
+    positions, season_avgs = {}, {}
+    for path in pool_files:
+        try:
+            with open(path, 'rb') as f:
+                pool = json_provider.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping join file {path}: {str(e)}")
+            continue
+        players = pool['players'] if 'players' in pool else [p for tier in TIERS for p in pool.get(tier, [])]
+        for player in players:
+            name = player.get('name')
+            if player.get('position'):
+                positions.setdefault(name, player['position'])
+            if player.get('3_season_avg') and player['3_season_avg'] != player.get('stats'):
+                season_avgs.setdefault(name, player['3_season_avg'])
+    for tier in get_static_player_pool().values():
+        for player in tier:
+            positions.setdefault(player['name'], player.get('position', ''))
+    return positions, season_avgs
+
+def build_pool(rows: List[Dict], positions: Dict[str, str], season_avgs: Dict[str, Dict],
+               per_game: bool = True) -> Dict[str, List[Dict]]:
+    """Tier-keyed pool, best rated first within each tier"""
+    rows = [row for row in rows if row.get('GP')]
+    cols = compute_columns(rows, per_game)
+    # Python floats once per column rather than numpy scalars per value
+    values = {name: column.tolist() for name, column in cols.items()}
+    pool = {tier: [] for tier in TIERS}
+    for i in np.argsort(-cols['RATING'], kind='stable').tolist():
+        name = rows[i]['PLAYER_NAME']
+        stats = {
+            'pts': values['PTS'][i],
+            'ast': values['AST'][i],
+            'reb': values['REB'][i],
+            'stl': values['STL'][i],
+            'blk': values['BLK'][i],
+            'fg_pct': round(values['FG_PCT'][i] * 100, 1),
+            'ts_pct': values['TS_PCT'][i],
+            'gp': int(values['GP'][i]),
+            '3pt_pct': round(values['FG3_PCT'][i] * 100, 1),
+            'ft_pct': round(values['FT_PCT'][i] * 100, 1),
+            'tov': values['TOV'][i]
+        }
+        tier = TIERS[int(values['TIER'][i])]
+        pool[tier].append({
+            'name': name,
+            'position': positions.get(name, ''),
+            'team': rows[i].get('TEAM_ABBREVIATION', ''),
+            'cost': tier,
+            'rating': values['RATING'][i],
+            'stats': stats,
+            '3_season_avg': season_avgs.get(name, stats)
+        })
+    unmatched = sum(1 for row in rows if not positions.get(row['PLAYER_NAME']))
+    if unmatched:
+        logger.warning(f"{unmatched} of {len(rows)} players have no position in the join data")
+    return pool
+
+def rebuild(source: str = SOURCE_FILE, out: str = OUTPUT_FILE, join_files: Optional[List[str]] = None,
+            per_game: bool = True) -> Dict[str, List[Dict]]:
+    """Rebuild the pool file from a bulk payload and return the pool"""
+    rows = load_rows(source)
+    positions, season_avgs = load_join_data(join_files if join_files is not None else [out])
+    pool = build_pool(rows, positions, season_avgs, per_game)
+    atomic_write_json(out, pool, pretty=True)
+    return pool
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the player pool from a bulk league stats payload')
+    parser.add_argument('--source', default=SOURCE_FILE, help='cached leaguedashplayerstats payload')
+    parser.add_argument('--out', default=OUTPUT_FILE, help='pool file to write')
+    parser.add_argument('--join', nargs='*', help='pool files to take positions and 3-season averages from '
+                                                  '(default: the current output file)')
+    parser.add_argument('--per-mode', choices=['PerGame', 'Totals'], default='PerGame',
+                        help='how the payload was fetched; PerGame rows are scaled to season totals')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pool = rebuild(args.source, args.out, args.join, args.per_mode == 'PerGame')
+    counts = ', '.join(f"{tier}: {len(players)}" for tier, players in pool.items())
+    logger.info(f"Wrote {sum(len(p) for p in pool.values())} players to {args.out} "
+                f"in {(time.perf_counter() - start) * 1000:.0f}ms ({counts})")
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
@@ -0,0 +1,183 @@
+"""
+Monthly archives for historical challenges.
+A closed month is packed into data/archive/YYYY-MM.gz, one gzip member per day,
+with an index of byte offsets in YYYY-MM.index.json. A single day is read by
+seeking to its member and decompressing only that frame.
+Archiving a date that is already in the archive rewrites the month file without
+its old frame. Frames then move, so a reader whose cached index no longer matches
+the file (its frame does not decompress to that date) reloads the index once.
+
+Archive closed months: python challenge_archive.py [--before YYYY-MM]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import zlib
+import logging
+import logging_config
+from datetime import datetime
+from typing import Dict, List, Optional
+from file_store import atomic_write_bytes, atomic_write_json, file_lock, file_stamp
+import json_provider
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'data/archive'
+
+# Cache of loaded month indexes: month -> {date: [offset, length, raw_size]}
+_index_cache = {}
+
+def _archive_path(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"{month}.gz")
+
+def _index_path(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"{month}.index.json")
+
+def get_month_index(month: str) -> Dict:
+    """Get the offset index for a month, or an empty dict if it is not archived"""
+    if month in _index_cache:
+        return _index_cache[month]
+    try:
+        with open(_index_path(month), 'r') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return {}
+    _index_cache[month] = index
+    return index
+
+def get_frame_info(date: str) -> Optional[List[int]]:
+    """Get [offset, length, raw_size] of a day's frame, if the day is archived"""
+    month = date[:7]
+    frame = get_month_index(month).get(date)
+    if frame is None and month in _index_cache:
+        # The month may have been extended by another worker since its index was cached
+        del _index_cache[month]
+        frame = get_month_index(month).get(date)
+    return frame
+
+def _read_frame(date: str, frame: List[int]) -> Optional[Dict]:
+    """A day's data from its frame, or None if the frame is not that day's (stale index)"""
+    offset, length = frame[0], frame[1]
+    with open(_archive_path(date[:7]), 'rb') as f:
+        f.seek(offset)
+        raw = f.read(length)
+    try:
+        data = json_provider.loads(gzip.decompress(raw))
+    except (EOFError, OSError, ValueError, zlib.error):
+        return None
+    return data if isinstance(data, dict) and data.get('date', date) == date else None
+
+def archive_stamp(date: str) -> Optional[tuple]:
+    """Version of an archived day: (mtime_ns of its month file, uncompressed size), or None"""
+    frame = get_frame_info(date)
+    stamp = file_stamp(_archive_path(date[:7])) if frame else None
+    return (stamp[0], frame[2]) if stamp else None
+
+def read_archived_day(date: str) -> Optional[Dict]:
+    """Read a single archived day by seeking to its frame"""
+    frame = get_frame_info(date)
+    if frame is None:
+        return None
+    data = _read_frame(date, frame)
+    if data is None:
+        # The month was rewritten since its index was cached
+        _index_cache.pop(date[:7], None)
+        frame = get_frame_info(date)
+        data = _read_frame(date, frame) if frame else None
+        if data is None:
+            logger.error(f"Archived frame of {date} does not match the index")
+    return data
+
+def archived_months() -> List[str]:
+    """List archived months"""
+    if not os.path.exists(ARCHIVE_DIR):
+        return []
+    return sorted(name[:-len('.index.json')] for name in os.listdir(ARCHIVE_DIR)
+                  if name.endswith('.index.json'))
+
+def archived_dates() -> List[str]:
+    """List all archived dates"""
+    dates = []
+    for month in archived_months():
+        dates.extend(get_month_index(month))
+    return sorted(dates)
+
+def archive_month(month: str) -> int:
+    """Pack a month's challenge files into its archive and remove the loose files.
+    The month file is rewritten from the frames it keeps plus the new ones, so a
+    date archived again replaces its old frame instead of leaving it behind."""
+    from models import CHALLENGE_DIR
+    from challenge_scheduler import ARTIFACT_DIR
+
+    with file_lock(os.path.join(ARCHIVE_DIR, '.archive.lock')):
+        files = sorted(name for name in os.listdir(CHALLENGE_DIR)
+                       if name.startswith(month) and name.endswith('.json'))
+        if not files:
+            return 0
+        replaced = {filename.replace('.json', '') for filename in files}
+
+        # Read the index from disk: another worker may have rewritten the month since it was cached
+        _index_cache.pop(month, None)
+        old_index = get_month_index(month)
+        existing = b''
+        if old_index:
+            with open(_archive_path(month), 'rb') as f:
+                existing = f.read()
+
+        index, frames, offset = {}, [], 0
+        for date, (start, length, raw_size) in sorted(old_index.items(), key=lambda item: item[1][0]):
+            if date in replaced:
+                continue
+            index[date] = [offset, length, raw_size]
+            frames.append(existing[start:start + length])
+            offset += length
+        for filename in files:
+            date = filename.replace('.json', '')
+            with open(os.path.join(CHALLENGE_DIR, filename), 'rb') as f:
+                data = json_provider.load(f)
+            raw = json_provider.dumps_bytes(data)
+            frame = gzip.compress(raw, compresslevel=9, mtime=0)
+            index[date] = [offset, len(frame), len(raw)]
+            frames.append(frame)
+            offset += len(frame)
+
+        # Data is written before the index so readers never see offsets past the end of the file
+        atomic_write_bytes(_archive_path(month), b''.join(frames))
+        atomic_write_json(_index_path(month), index)
+        _index_cache[month] = index
+
+        for filename in files:
+            date = filename.replace('.json', '')
+            os.remove(os.path.join(CHALLENGE_DIR, filename))
+            lock_path = os.path.join(CHALLENGE_DIR, f".{date}.lock")
+            if os.path.exists(lock_path):
+                os.remove(lock_path)
+            shutil.rmtree(os.path.join(ARTIFACT_DIR, date), ignore_errors=True)
+
+    logger.info(f"Archived {len(files)} challenge(s) into {_archive_path(month)}")
+    return len(files)
+
+def archive_closed_months(before: Optional[str] = None) -> int:
+    """Archive every month with loose challenge files before the given month (default: current month)"""
+    from models import CHALLENGE_DIR
+
+    before = before or datetime.now().strftime('%Y-%m')
+    if not os.path.exists(CHALLENGE_DIR):
+        return 0
+    months = sorted({name[:7] for name in os.listdir(CHALLENGE_DIR)
+                     if name.endswith('.json') and not name.startswith('.') and name[:7] < before})
+    return sum(archive_month(month) for month in months)
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive challenges of closed months')
+    parser.add_argument('--before', help='archive months before this one (YYYY-MM), defaults to the current month')
+    args = parser.parse_args()
+    count = archive_closed_months(args.before)
+    print(f"Archived {count} challenge(s)")
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
@@ -0,0 +1,89 @@
+"""
+Everything the daily game page needs in one response.
+The bundle for a date holds the roster, the leaderboard top-k, the win
+distribution and, for the requesting player, their submission, rank and
+percentile. The parts shared by every viewer are built from the loaded
+challenge once per date and kept serialized; they are rebuilt only when the
+challenge gets a new submission. Per request only the viewer's fields are
+looked up and spliced into the cached body.
+"""
+
+import os
+import logging
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+import json_provider
+from metrics import cache_counters
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_TOP_K = int(os.environ.get('BUNDLE_TOP_K', 10))
+BUNDLE_CACHE_SIZE = int(os.environ.get('BUNDLE_CACHE_SIZE', 32))
+
+_bundle_cache = OrderedDict()  # date -> _Shared
+_cache_hits, _cache_misses = cache_counters('bundle')
+
+def _sort_key(submission: Dict):
+    record = submission['record']
+    return (record['wins'], -record['losses'])
+
+def win_distribution(submissions: List[Dict]) -> List[Dict]:
+    """Number of submissions per season win total, ascending"""
+    counts = Counter(s['record']['wins'] for s in submissions)
+    return [{'wins': wins, 'count': count} for wins, count in sorted(counts.items())]
+
+class _Shared:
+    """Viewer-independent part of a date's bundle"""
+    __slots__ = ('challenge', 'submission_count', 'body', 'ranks')
+
+    def __init__(self, challenge):
+        submissions = [s for s in challenge.submissions
+                       if isinstance(s.get('record'), dict) and 'wins' in s['record']]
+        # Same order as DailyChallenge.get_leaderboard
+        ordered = sorted(submissions, key=_sort_key, reverse=True)
+        self.challenge = challenge
+        self.submission_count = len(challenge.submissions)
+        self.ranks = {s['player_name']: i + 1 for i, s in enumerate(ordered)}
+        self.body = json_provider.dumps_bytes({
+            'date': challenge.date,
+            'players': challenge.players,
+            'leaderboard': [challenge._rehydrate(s) for s in ordered[:BUNDLE_TOP_K]],
+            'submission_count': len(ordered),
+            'distribution': win_distribution(ordered)
+        })
+
+    def viewer(self, player_name: Optional[str]) -> Dict:
+        if not player_name:
+            return {'player_name': None, 'submission': None, 'rank': None, 'percentile': None}
+        submission = self.challenge.get_player_submission(player_name)
+        rank = self.ranks.get(player_name)
+        percentile = None
+        if rank is not None:
+            total = len(self.ranks)
+            percentile = 100 if total <= 1 else round(100 - ((rank - 1) / (total - 1)) * 100, 1)
+        return {'player_name': player_name, 'submission': submission, 'rank': rank, 'percentile': percentile}
+
+def _get_shared(challenge) -> _Shared:
+    shared = _bundle_cache.get(challenge.date)
+    # Submissions are only ever appended to a loaded challenge; a reload from disk is a new object
+    if shared is not None and shared.challenge is challenge and shared.submission_count == len(challenge.submissions):
+        _bundle_cache.move_to_end(challenge.date)
+        _cache_hits.value += 1
+        return shared
+    _cache_misses.value += 1
+    shared = _bundle_cache[challenge.date] = _Shared(challenge)
+    _bundle_cache.move_to_end(challenge.date)
+    while len(_bundle_cache) > BUNDLE_CACHE_SIZE:
+        _bundle_cache.popitem(last=False)
+    return shared
+
+def render_bundle(challenge, player_name: Optional[str] = None) -> bytes:
+    """Serialized bundle of a loaded challenge for one viewer"""
+    shared = _get_shared(challenge)
+    viewer = json_provider.dumps_bytes(shared.viewer(player_name))
+    # The shared body is a JSON object; append the viewer field before its closing brace
+    return shared.body[:-1] + b',"viewer":' + viewer + b'}'
+
+def clear_cache():
+    """Clear the cached bundles"""
+    _bundle_cache.clear()
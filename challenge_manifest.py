@@ -0,0 +1,153 @@
+"""
+Manifest of challenge dates with per-date summaries.
+A date's entry is added when its challenge is created, so listing the archive
+never has to scan data/challenges or open challenge files. Each accepted
+submission updates its date's count and best record in place, and the summary
+is recomputed from the full challenge once more when the day closes
+(leaderboard_rollups).
+"""
+
+import json
+import os
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional
+from file_store import atomic_write_json, file_lock, file_stamp
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'data/challenge_manifest.json'
+MANIFEST_LOCK = 'data/.challenge_manifest.lock'
+
+# In-memory copy of the manifest, revalidated by file stat
+_manifest = None
+_manifest_stamp = None
+_sorted_dates = []  # ascending
+
+def summarize_submissions(submissions: List[Dict]) -> Dict:
+    """Summary fields stored for a date: submission count and best record"""
+    top = None
+    for submission in submissions:
+        record = submission.get('record')
+        if not isinstance(record, dict) or 'wins' not in record:
+            continue
+        if top is None or (record['wins'], -record['losses']) > (top['record']['wins'], -top['record']['losses']):
+            top = submission
+    return {
+        'submission_count': len(submissions),
+        'top_record': top['record'] if top else None,
+        'top_player': top['player_name'] if top else None
+    }
+
+def _set_manifest(manifest: Dict) -> None:
+    global _manifest, _manifest_stamp, _sorted_dates
+    _manifest = manifest
+    _manifest_stamp = file_stamp(MANIFEST_FILE)
+    _sorted_dates = sorted(manifest['dates'])
+
+def _read_manifest() -> Dict:
+    with open(MANIFEST_FILE, 'r') as f:
+        return json.load(f)
+
+def _load() -> Dict:
+    """Get the manifest, rebuilding it from the challenge files if it does not exist yet"""
+    if _manifest is not None and file_stamp(MANIFEST_FILE) == _manifest_stamp:
+        return _manifest
+    try:
+        _set_manifest(_read_manifest())
+    except FileNotFoundError:
+        rebuild()
+    except Exception as e:
+        logger.error(f"Error reading challenge manifest: {str(e)}")
+        rebuild()
+    return _manifest
+
+def record_challenge(date: str, submissions: List[Dict]) -> None:
+    """Add or update a date's entry: when its challenge is created and when the day closes"""
+    try:
+        with file_lock(MANIFEST_LOCK):
+            if os.path.exists(MANIFEST_FILE):
+                manifest = _read_manifest()
+            else:
+                manifest = _scan()
+            manifest['dates'][date] = summarize_submissions(submissions)
+            atomic_write_json(MANIFEST_FILE, manifest)
+        _set_manifest(manifest)
+    except Exception as e:
+        logger.error(f"Error updating challenge manifest for {date}: {str(e)}")
+
+def record_submission(date: str, submission: Dict) -> None:
+    """Count a newly stored submission in its date's summary"""
+    try:
+        with file_lock(MANIFEST_LOCK):
+            if not os.path.exists(MANIFEST_FILE):
+                # The scan reads the challenge file, which already holds the submission
+                manifest = _scan()
+            else:
+                manifest = _read_manifest()
+                summary = manifest['dates'].get(date) or summarize_submissions([])
+                # The stored leader keeps its place on a tie, as the earlier submission
+                leader = [{'player_name': summary['top_player'], 'record': summary['top_record']}] \
+                    if summary['top_record'] else []
+                manifest['dates'][date] = {**summarize_submissions(leader + [submission]),
+                                           'submission_count': summary['submission_count'] + 1}
+            atomic_write_json(MANIFEST_FILE, manifest)
+        _set_manifest(manifest)
+    except Exception as e:
+        logger.error(f"Error updating challenge manifest for {date}: {str(e)}")
+
+def _scan() -> Dict:
+    """Build a manifest by reading every challenge file and archived day"""
+    from models import CHALLENGE_DIR
+    import challenge_archive
+    manifest = {'dates': {}}
+    for date in challenge_archive.archived_dates():
+        try:
+            data = challenge_archive.read_archived_day(date)
+            manifest['dates'][date] = summarize_submissions(data.get('submissions', []))
+        except Exception as e:
+            logger.error(f"Error reading archived challenge {date} for manifest: {str(e)}")
+    if not os.path.exists(CHALLENGE_DIR):
+        return manifest
+    for filename in os.listdir(CHALLENGE_DIR):
+        if not filename.endswith('.json') or filename.startswith('.'):
+            continue
+        date = filename.replace('.json', '')
+        try:
+            with open(os.path.join(CHALLENGE_DIR, filename), 'r') as f:
+                data = json.load(f)
+            manifest['dates'][date] = summarize_submissions(data.get('submissions', []))
+        except Exception as e:
+            logger.error(f"Error reading challenge {date} for manifest: {str(e)}")
+    return manifest
+
+def rebuild() -> Dict:
+    """Rebuild the manifest from the challenge files"""
+    with file_lock(MANIFEST_LOCK):
+        manifest = _scan()
+        atomic_write_json(MANIFEST_FILE, manifest)
+    _set_manifest(manifest)
+    logger.info(f"Rebuilt challenge manifest with {len(manifest['dates'])} dates")
+    return manifest
+
+def get_summary(date: str) -> Optional[Dict]:
+    """Get the summary for a single date"""
+    return _load()['dates'].get(date)
+
+def list_dates(before: Optional[str] = None, after: Optional[str] = None,
+               limit: Optional[int] = None, include_summary: bool = False) -> List:
+    """List challenge dates, newest first.
+    Dates after today (challenges generated ahead of time) are never listed."""
+    manifest = _load()
+    today = datetime.now().strftime('%Y-%m-%d')
+    hi = bisect_right(_sorted_dates, today)
+    if before:
+        hi = min(hi, bisect_left(_sorted_dates, before))
+    lo = bisect_right(_sorted_dates, after) if after else 0
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    dates = _sorted_dates[lo:hi][::-1]
+    if include_summary:
+        return [{'date': date, **manifest['dates'][date]} for date in dates]
+    return dates
@@ -0,0 +1,132 @@
+"""
+Ahead-of-time generation of daily challenges.
+Generates the next N days' challenges together with their pre-serialized
+/api/challenge payload, so that request handlers only ever read them.
+Inside the app the scheduler runs in one gunicorn worker at a time: every
+worker tries to take SCHEDULER_LOCK_FILE and only the holder runs it; the
+others keep retrying, so another worker takes over when the holder exits.
+
+Run once:    python challenge_scheduler.py --days 7
+Run as loop: python challenge_scheduler.py --days 7 --loop --interval 3600
+"""
+
+import argparse
+import fcntl
+import logging
+import logging_config
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+from models import DailyChallenge
+from file_store import atomic_write_bytes
+import json_provider
+import leaderboard_rollups
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = 'data/challenge_artifacts'
+DEFAULT_DAYS_AHEAD = int(os.environ.get('CHALLENGE_DAYS_AHEAD', 7))
+DEFAULT_INTERVAL = int(os.environ.get('CHALLENGE_SCHEDULER_INTERVAL', 3600))
+SCHEDULER_ENABLED = os.environ.get('CHALLENGE_SCHEDULER_ENABLED', '').lower() in ('1', 'true', 'yes')
+SCHEDULER_LOCK_FILE = 'data/.challenge_scheduler.lock'
+
+_scheduler_started = False
+
+def artifact_path(date: str, name: str) -> str:
+    """Path of one of a date's derived artifacts"""
+    return os.path.join(ARTIFACT_DIR, date, name)
+
+def write_challenge_artifacts(challenge: DailyChallenge) -> None:
+    """Write the derived artifacts for a generated challenge"""
+    payload = json_provider.dumps_bytes({
+        'date': challenge.date,
+        'players': challenge.players
+    })
+    atomic_write_bytes(artifact_path(challenge.date, 'challenge.json'), payload)
+
+def load_challenge_payload(date: str) -> Optional[bytes]:
+    """Get the pre-serialized challenge payload for a date, if it was generated ahead of time"""
+    try:
+        with open(artifact_path(date, 'challenge.json'), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def pregenerate(days_ahead: int = DEFAULT_DAYS_AHEAD, start: Optional[datetime] = None) -> List[str]:
+    """Generate challenges and artifacts for today and the following days"""
+    start = start or datetime.now()
+    generated = []
+    for offset in range(days_ahead):
+        date = (start + timedelta(days=offset)).strftime('%Y-%m-%d')
+        try:
+            challenge = DailyChallenge(date)
+            if not challenge.players:
+                logger.error(f"Challenge for {date} has no players, skipping artifacts")
+                continue
+            if load_challenge_payload(date) is None:
+                write_challenge_artifacts(challenge)
+                generated.append(date)
+        except Exception as e:
+            logger.error(f"Error pre-generating challenge for {date}: {str(e)}")
+    if generated:
+        logger.info(f"Pre-generated challenges for {', '.join(generated)}")
+    return generated
+
+def run_forever(days_ahead: int = DEFAULT_DAYS_AHEAD, interval: int = DEFAULT_INTERVAL) -> None:
+    """Keep the next days' challenges generated and finished days closed"""
+    while True:
+        pregenerate(days_ahead)
+        try:
+            leaderboard_rollups.close_pending_days()
+        except Exception as e:
+            logger.error(f"Error closing finished challenge days: {str(e)}")
+        time.sleep(interval)
+
+def _run_when_elected(days_ahead: int, interval: int) -> None:
+    """Wait until this process holds the scheduler lock, then run the scheduler.
+    The lock file stays open for the life of the process, so the lock is released
+    only when the process exits."""
+    os.makedirs(os.path.dirname(SCHEDULER_LOCK_FILE) or '.', exist_ok=True)
+    lock_file = open(SCHEDULER_LOCK_FILE, 'a')
+    while True:
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            time.sleep(interval)
+    logger.info(f"Process {os.getpid()} runs the challenge scheduler ({days_ahead} days ahead, every {interval}s)")
+    run_forever(days_ahead, interval)
+
+def start_background_scheduler(days_ahead: int = DEFAULT_DAYS_AHEAD, interval: int = DEFAULT_INTERVAL) -> None:
+    """Run the scheduler inside a server process, as a greenlet when gevent is available.
+    Call it once the process serves requests (gunicorn's post_worker_init, or the
+    dev server's __main__), never at import: with preload_app the import happens in
+    the master, and every worker would inherit the scheduler."""
+    global _scheduler_started
+    if _scheduler_started:
+        return
+    _scheduler_started = True
+    try:
+        import gevent
+        gevent.spawn(_run_when_elected, days_ahead, interval)
+    except ImportError:
+        import threading
+        threading.Thread(target=_run_when_elected, args=(days_ahead, interval), daemon=True).start()
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-generate daily challenges')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS_AHEAD, help='number of days to generate, starting today')
+    parser.add_argument('--loop', action='store_true', help='keep running and regenerate every interval')
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL, help='seconds between runs with --loop')
+    args = parser.parse_args()
+
+    if args.loop:
+        run_forever(args.days, args.interval)
+    else:
+        generated = pregenerate(args.days)
+        print(f"Generated {len(generated)} challenge(s)")
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
@@ -1,23 +1,17 @@
-from nba_api.stats.endpoints import leaguedashplayerstats
 import pandas as pd
 import numpy as np
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-import time
 from requests.exceptions import RequestException
-import random
 import json
 import os
-import gc
-from .static_player_pool import get_static_player_pool, get_players_by_cost, get_all_players
-from .player_stats import get_player_stats, get_all_player_stats, get_player_3_season_avg, get_all_player_3_season_avg
+from static_player_pool import get_static_player_pool, get_players_by_cost, get_all_players
+from player_stats import get_player_stats, get_all_player_stats, get_player_3_season_avg, get_all_player_3_season_avg
+from json_provider import dumps_bytes, loads
+from file_store import atomic_write_bytes
+from http_session import NBA_STATS_BASE_URL, HTTP_MAX_RETRIES, LEAGUE_DASH_PARAMS, current_season, request_json, result_rows
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class NBADataFetcher:
@@ -25,8 +19,8 @@ class NBADataFetcher:
         self.cache_dir = os.path.join(os.path.dirname(__file__), 'cache')
         self.cache_duration = timedelta(hours=24)
         os.makedirs(self.cache_dir, exist_ok=True)
-        self.max_retries = 5
-        self.retry_delay = 10
+        self.base_url = NBA_STATS_BASE_URL
+        self.max_retries = HTTP_MAX_RETRIES
         self.timeout = 60
         
     def _get_cost_from_percentile(self, percentile: float) -> str:
@@ -42,74 +36,70 @@ class NBADataFetcher:
         else:                   # Bottom 30%
             return '$1'
             
-    def _get_from_cache(self, cache_key):
+    def _read_cache_entry(self, cache_key) -> Optional[Dict]:
+        """Cached entry regardless of age: timestamp, data and the response's validators"""
         try:
             cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
             if os.path.exists(cache_file):
-                with open(cache_file, 'r') as f:
-                    cached_data = json.load(f)
-                    if datetime.fromisoformat(cached_data['timestamp']) + self.cache_duration > datetime.now():
-                        return cached_data['data']
+                with open(cache_file, 'rb') as f:
+                    return loads(f.read())
             return None
         except Exception as e:
             logger.error(f"Error reading from cache: {str(e)}")
             return None
 
-    def _set_cache(self, cache_key, data):
+    def _get_from_cache(self, cache_key):
+        cached_data = self._read_cache_entry(cache_key)
+        if cached_data and datetime.fromisoformat(cached_data['timestamp']) + self.cache_duration > datetime.now():
+            return cached_data['data']
+        return None
+
+    def _set_cache(self, cache_key, data, validators: Optional[Dict] = None):
         try:
             cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-            with open(cache_file, 'w') as f:
-                json.dump({
-                    'timestamp': datetime.now().isoformat(),
-                    'data': data
-                }, f)
+            entry = {
+                'timestamp': datetime.now().isoformat(),
+                'data': data
+            }
+            if validators:
+                entry['validators'] = validators
+            # Readers (and the bulk pool builder) never see a half-written payload
+            atomic_write_bytes(cache_file, dumps_bytes(entry))
         except Exception as e:
             logger.error(f"Error writing to cache: {str(e)}")
         
-    def _make_api_call(self, func, *args, **kwargs):
-        """Make API call with retry logic"""
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'x-nba-stats-origin': 'stats',
-            'x-nba-stats-token': 'true',
-            'Referer': 'https://stats.nba.com/',
-            'Connection': 'keep-alive',
-            'Host': 'stats.nba.com'
-        }
+    def _make_api_call(self, endpoint: str, params: Optional[Dict] = None,
+                       validators: Optional[Dict] = None) -> Tuple[Optional[Dict], Dict]:
+        """GET a stats endpoint through the shared pooled session.
+        Returns (response JSON, validators); the JSON is None when the data is unchanged
+        since the validators were issued (304). Raises RequestException on failure,
+        immediately while the upstream's circuit breaker is open."""
+        return request_json(f"{self.base_url}/{endpoint}", params=params, validators=validators,
+                            timeout=self.timeout, max_retries=self.max_retries)
+
+    def get_league_player_stats(self, season: Optional[str] = None, refresh: bool = False) -> List[Dict]:
+        """Per-game leaguedashplayerstats rows for every player (cached as cache/player_stats.json).
+        A refresh of unchanged data costs a 304; if the upstream fails the cached rows are kept."""
+        cached = self._read_cache_entry('player_stats')
+        if cached and not refresh and self._get_from_cache('player_stats') is not None:
+            return cached['data']
+        
+        params = dict(LEAGUE_DASH_PARAMS, Season=season or current_season())
+        try:
+            response, validators = self._make_api_call('leaguedashplayerstats', params,
+                                                       cached.get('validators') if cached else None)
+        except RequestException as e:
+            logger.error(f"Error fetching league player stats: {str(e)}")
+            return cached['data'] if cached else []
         
-        for attempt in range(self.max_retries):
-            try:
-                # Add random delay between retries
-                if attempt > 0:
-                    delay = self.retry_delay * (2 ** attempt)  # Exponential backoff
-                    time.sleep(delay + random.uniform(1, 3))
-                    
-                # Add headers to kwargs
-                if 'headers' in kwargs:
-                    kwargs['headers'].update(headers)
-                else:
-                    kwargs['headers'] = headers
-                    
-                # Add timeout to kwargs
-                if 'timeout' not in kwargs:
-                    kwargs['timeout'] = self.timeout
-                    
-                response = func(*args, **kwargs)
-                if response is None:
-                    raise RequestException("Empty response from API")
-                return response
-            except RequestException as e:
-                if attempt == self.max_retries - 1:
-                    logger.error(f"API call failed after {self.max_retries} attempts: {str(e)}")
-                    raise
-                logger.warning(f"API call failed (attempt {attempt + 1}/{self.max_retries}): {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error in API call: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    raise
+        if response is None:
+            logger.info("League player stats unchanged upstream")
+            rows = cached['data']
+        else:
+            rows = result_rows(response, 'LeagueDashPlayerStats')
+            logger.info(f"Fetched league player stats for {len(rows)} players")
+        self._set_cache('player_stats', rows, validators)
+        return rows
         
     def get_active_players(self) -> List[Dict]:
         """Get a list of active NBA players with their stats and costs"""
@@ -279,26 +269,15 @@ class NBADataFetcher:
                 '$1': []
             }
             
-            # Process players in chunks
-            chunk_size = 100
-            for i in range(0, len(players), chunk_size):
-                chunk = players[i:i + chunk_size]
-                for player in chunk:
-                    cost = player.get('cost', '$1')
-                    if cost in categorized_players:
-                        # Only store essential data
-                        categorized_players[cost].append({
-                            'name': player['name'],
-                            'id': player['id'],
-                            'stats': player['stats']
-                        })
-            
-                # Force garbage collection after each chunk
-                del chunk
-                gc.collect()
-                
-                # Add small delay between chunks
-                time.sleep(0.1)
+            for player in players:
+                cost = player.get('cost', '$1')
+                if cost in categorized_players:
+                    # Only store essential data
+                    categorized_players[cost].append({
+                        'name': player['name'],
+                        'id': player['id'],
+                        'stats': player['stats']
+                    })
             
             # Store the categorized players
             cache_file = os.path.join(self.cache_dir, 'categorized_players.json')
@@ -309,9 +288,6 @@ class NBADataFetcher:
             
         except Exception as e:
             logger.error(f"Error storing categorized players: {str(e)}")
-        finally:
-            # Force garbage collection
-            gc.collect()
 
     def get_categorized_players(self) -> Dict[str, List[Dict]]:
         """Get players from the categorized cache"""
@@ -0,0 +1,50 @@
+"""
+Small helpers for the JSON files the app keeps on local disk.
+Writes go through a temp file and os.replace so readers never see a partial file,
+and file_lock serializes writers across gunicorn workers.
+"""
+
+import os
+import tempfile
+import fcntl
+from contextlib import contextmanager
+from typing import Optional
+import json_provider
+
+def atomic_write_json(path: str, data, pretty: bool = False) -> None:
+    """Write JSON to path atomically (compact unless pretty)"""
+    atomic_write_bytes(path, json_provider.dumps_bytes(data, pretty))
+
+def file_stamp(path: str) -> Optional[tuple]:
+    """Cheap version of a file for cache validation: (mtime_ns, size), or None if missing.
+    Atomic writes replace the file, so every write changes the stamp."""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def atomic_write_bytes(path: str, payload: bytes) -> None:
+    """Write raw bytes to path atomically"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive advisory lock on path for the duration of the block"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,101 @@
+"""
+Garbage collection policy for the gunicorn workers.
+The master collects and freezes the preloaded heap before forking, so the
+collector never touches (and copies) those shared pages in the workers. Workers
+raise the generation thresholds so automatic full collections are rare, and a
+background loop runs collections while the worker has no request in flight.
+Every collection's pause is recorded in the metrics registry.
+
+Set GC_POLICY=default to keep the interpreter's stock behaviour.
+"""
+
+import gc
+import os
+import time
+import logging
+from metrics import histogram, counter
+
+logger = logging.getLogger(__name__)
+
+GC_POLICY = os.environ.get('GC_POLICY', 'managed')
+GC_THRESHOLDS = tuple(int(x) for x in os.environ.get('GC_THRESHOLDS', '50000,20,1000').split(','))
+GC_IDLE_CHECK_INTERVAL = float(os.environ.get('GC_IDLE_CHECK_INTERVAL', 1.0))  # Seconds between idle checks
+GC_IDLE_GRACE = float(os.environ.get('GC_IDLE_GRACE', 0.2))  # Quiet time before a worker counts as idle
+GC_FULL_INTERVAL = float(os.environ.get('GC_FULL_INTERVAL', 60))  # Seconds between idle full collections
+
+GC_PAUSE = histogram('budget_gm_gc_pause_seconds', 'Garbage collection pause by generation', ('generation',),
+                     buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+GC_COLLECTED = counter('budget_gm_gc_collected_objects_total', 'Objects freed by the collector', ('generation',))
+
+_in_flight = 0
+_last_request_end = 0.0
+_pause_start = 0.0
+_pause_children = [GC_PAUSE.labels(str(generation)) for generation in range(3)]
+_collected_children = [GC_COLLECTED.labels(str(generation)) for generation in range(3)]
+_worker_configured = False
+
+def _record_pause(phase: str, info: dict) -> None:
+    global _pause_start
+    if phase == 'start':
+        _pause_start = time.perf_counter()
+    else:
+        generation = info.get('generation', 2)
+        _pause_children[generation].observe(time.perf_counter() - _pause_start)
+        _collected_children[generation].value += info.get('collected', 0)
+
+def freeze_preloaded_heap() -> None:
+    """In the gunicorn master after preload: collect once, then move every object to the permanent generation"""
+    if GC_POLICY != 'managed':
+        return
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Froze {gc.get_freeze_count()} preloaded objects")
+
+def _idle_loop() -> None:
+    try:
+        import gevent
+        sleep = gevent.sleep
+    except ImportError:
+        sleep = time.sleep
+    last_full = time.monotonic()
+    while True:
+        sleep(GC_IDLE_CHECK_INTERVAL)
+        if _in_flight or time.monotonic() - _last_request_end < GC_IDLE_GRACE:
+            continue
+        if time.monotonic() - last_full >= GC_FULL_INTERVAL:
+            gc.collect(2)
+            last_full = time.monotonic()
+        elif gc.get_count()[0] > GC_THRESHOLDS[0] // 2:
+            gc.collect(1)
+
+def configure_worker() -> None:
+    """In each worker after fork: raise thresholds, record pauses and start the idle collector"""
+    global _worker_configured
+    if _worker_configured:
+        return
+    _worker_configured = True
+    gc.callbacks.append(_record_pause)
+    if GC_POLICY != 'managed':
+        return
+    gc.set_threshold(*GC_THRESHOLDS)
+    try:
+        import gevent
+        gevent.spawn(_idle_loop)
+    except ImportError:
+        import threading
+        threading.Thread(target=_idle_loop, daemon=True).start()
+    logger.info(f"Managed GC enabled in worker {os.getpid()} (thresholds {GC_THRESHOLDS})")
+
+def init_app(app) -> None:
+    """Track in-flight requests so collections only run between them"""
+
+    @app.before_request
+    def _request_started():
+        global _in_flight
+        _in_flight += 1
+
+    @app.teardown_request
+    def _request_finished(exc=None):
+        global _in_flight, _last_request_end
+        _in_flight = max(0, _in_flight - 1)
+        _last_request_end = time.monotonic()
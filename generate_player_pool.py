@@ -1,13 +1,9 @@
 from data_fetcher import NBADataFetcher
 import json
 import logging
+import logging_config
 from datetime import datetime
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 def main():
@@ -45,4 +41,5 @@ def main():
     logger.info("Saved fallback player pool")
 
 if __name__ == '__main__':
+    logging_config.configure()
     main() 
\ No newline at end of file
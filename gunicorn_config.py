@@ -45,4 +45,32 @@ certfile = None
 
 # Memory management
 max_requests = 1000
-max_requests_jitter = 50 
\ No newline at end of file
+max_requests_jitter = 50 
+
+# Garbage collection: freeze the preloaded heap in the master so workers keep
+# sharing its pages, then let each worker collect between requests
+def when_ready(server):
+    import gc_policy
+    import job_queue
+    gc_policy.freeze_preloaded_heap()
+    # Jobs are files on this machine's disk, so their worker runs next to the web workers
+    if job_queue.JOB_WORKER_IN_WEB:
+        server.job_worker = job_queue.spawn_worker_process()
+
+def on_exit(server):
+    job_worker = getattr(server, 'job_worker', None)
+    if job_worker is not None and job_worker.poll() is None:
+        job_worker.terminate()
+        job_worker.wait(timeout=30)
+
+# Warm caches before the worker accepts its first connection
+def post_worker_init(worker):
+    import challenge_scheduler
+    import gc_policy
+    import warmup
+    import app
+    gc_policy.configure_worker()
+    warmup.warm_up(app)
+    # Every worker offers to run the scheduler; a lock file lets only one run it at a time
+    if challenge_scheduler.SCHEDULER_ENABLED:
+        challenge_scheduler.start_background_scheduler()
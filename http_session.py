@@ -0,0 +1,228 @@
+"""
+HTTP access to stats.nba.com (or NBA_STATS_BASE_URL) shared by the data fetchers.
+One keep-alive requests.Session per process pools connections to the upstream.
+request_json sends If-None-Match/If-Modified-Since from the validators of the
+last response, so unchanged data comes back as a bodiless 304. Retries use
+capped, fully jittered backoff through time.sleep, which yields to other
+greenlets under gevent. A circuit breaker per upstream opens after repeated
+failures; while it is open, calls fail immediately instead of tying up a
+worker on an upstream that is down.
+"""
+
+import os
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import (ChunkedEncodingError, ConnectionError, ContentDecodingError, HTTPError,
+                                 RequestException, Timeout)
+
+logger = logging.getLogger(__name__)
+
+NBA_STATS_BASE_URL = os.environ.get('NBA_STATS_BASE_URL', 'https://stats.nba.com/stats').rstrip('/')
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 4))
+HTTP_BACKOFF_BASE = float(os.environ.get('HTTP_BACKOFF_BASE', 0.5))  # Seconds before the first retry, at most
+HTTP_BACKOFF_CAP = float(os.environ.get('HTTP_BACKOFF_CAP', 8))
+HTTP_BREAKER_THRESHOLD = int(os.environ.get('HTTP_BREAKER_THRESHOLD', 5))  # Consecutive failures that open it
+HTTP_BREAKER_COOLDOWN = float(os.environ.get('HTTP_BREAKER_COOLDOWN', 30))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Transport errors worth retrying; other request errors are raised at once
+RETRY_ERRORS = (ConnectionError, Timeout, ChunkedEncodingError, ContentDecodingError)
+
+NBA_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate',
+    'x-nba-stats-origin': 'stats',
+    'x-nba-stats-token': 'true',
+    'Referer': 'https://www.nba.com/',
+    'Origin': 'https://www.nba.com'
+}
+
+# Query stats.nba.com expects for leaguedashplayerstats (the same defaults nba_api sends)
+LEAGUE_DASH_PARAMS = {
+    'College': '', 'Conference': '', 'Country': '', 'DateFrom': '', 'DateTo': '', 'Division': '',
+    'DraftPick': '', 'DraftYear': '', 'GameScope': '', 'GameSegment': '', 'Height': '', 'LastNGames': 0,
+    'LeagueID': '00', 'Location': '', 'MeasureType': 'Base', 'Month': 0, 'OpponentTeamID': 0, 'Outcome': '',
+    'PORound': 0, 'PaceAdjust': 'N', 'PerMode': 'PerGame', 'Period': 0, 'PlayerExperience': '',
+    'PlayerPosition': '', 'PlusMinus': 'N', 'Rank': 'N', 'SeasonSegment': '', 'SeasonType': 'Regular Season',
+    'ShotClockRange': '', 'StarterBench': '', 'TeamID': 0, 'TwoWay': 0, 'VsConference': '', 'VsDivision': '',
+    'Weight': ''
+}
+
+def current_season(today: Optional[datetime] = None) -> str:
+    """Season string like 2024-25; seasons start in October"""
+    today = today or datetime.now()
+    start = today.year if today.month >= 10 else today.year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+def result_rows(response: Dict, name: Optional[str] = None) -> list:
+    """Rows of a named result set (default: the first) as dicts keyed by header"""
+    result_sets = response.get('resultSets') or response.get('resultSet') or []
+    if isinstance(result_sets, dict):
+        result_sets = [result_sets]
+    if not result_sets:
+        return []
+    chosen = next((r for r in result_sets if r.get('name') == name), result_sets[0])
+    headers = chosen['headers']
+    return [dict(zip(headers, row)) for row in chosen['rowSet']]
+
+_session = None
+_session_pid = None
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+class CircuitOpenError(RequestException):
+    """Raised without a request while the upstream's circuit breaker is open"""
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open after threshold failures,
+    half-open after the cooldown (one trial request), closed again on success.
+    Fetch threads share one breaker, so state is read and changed under a lock:
+    otherwise several threads could each claim the half-open trial."""
+
+    def __init__(self, name: str, threshold: int = HTTP_BREAKER_THRESHOLD, cooldown: float = HTTP_BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        opened_at = self.opened_at
+        if opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - opened_at >= self.cooldown else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit for {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.opened_at is None and self.failures >= self.threshold):
+                logger.warning(f"Circuit for {self.name} open for {self.cooldown:.0f}s after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker for an upstream"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+def get_session() -> requests.Session:
+    """The process's pooled session, created on first use (and again after a fork)"""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        # Retries are ours (with backoff and the breaker), not urllib3's
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(NBA_HEADERS)
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+def backoff_delay(attempt: int, base: float = HTTP_BACKOFF_BASE, cap: float = HTTP_BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def _validators(response: requests.Response, previous: Optional[Dict]) -> Dict[str, str]:
+    validators = dict(previous or {})
+    if response.headers.get('ETag'):
+        validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['last_modified'] = response.headers['Last-Modified']
+    return validators
+
+def request_json(url: str, params: Optional[Dict] = None, validators: Optional[Dict] = None,
+                 timeout: float = 30, max_retries: int = HTTP_MAX_RETRIES,
+                 breaker: Optional[CircuitBreaker] = None, backoff_base: float = HTTP_BACKOFF_BASE,
+                 backoff_cap: float = HTTP_BACKOFF_CAP) -> Tuple[Optional[Dict], Dict[str, str]]:
+    """GET url and parse its JSON body.
+    Returns (data, validators); data is None when the server answered 304 to the
+    validators passed in. Raises CircuitOpenError while the breaker is open and the
+    last error once retries are exhausted."""
+    breaker = breaker or get_breaker(urlparse(url).netloc)
+    headers = {}
+    if validators and validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators and validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    error = None
+    for attempt in range(max_retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit for {breaker.name} is open") from error
+        retry_after = None
+        try:
+            response = get_session().get(url, params=params, headers=headers, timeout=timeout)
+        except RETRY_ERRORS as e:
+            breaker.record_failure()
+            error = e
+        except BaseException:
+            # Any other error (TooManyRedirects, InvalidURL, ...) is not retried, but is still
+            # recorded: a half-open trial that is never reported would keep the circuit open
+            breaker.record_failure()
+            raise
+        else:
+            if response.status_code in RETRY_STATUSES:
+                breaker.record_failure()
+                retry_after = _retry_after(response)
+                error = HTTPError(f"{response.status_code} from {url}", response=response)
+            else:
+                # Anything else means the upstream is up, even a 4xx
+                breaker.record_success()
+                if response.status_code == 304:
+                    return None, _validators(response, validators)
+                response.raise_for_status()
+                return response.json(), _validators(response, None)
+
+        if attempt == max_retries:
+            break
+        delay = min(backoff_cap, max(retry_after or 0.0, backoff_delay(attempt, backoff_base, backoff_cap)))
+        logger.warning(f"Request to {url} failed (attempt {attempt + 1}/{max_retries + 1}): {str(error)}; "
+                       f"retrying in {delay:.2f}s")
+        time.sleep(delay)
+    raise error
@@ -0,0 +1,128 @@
+"""
+Offline benchmark of the player data refresh paths against nba_stub_server.
+Phases:
+  bulk refresh     - NBADataFetcher.get_league_player_stats plus bulk_pool_builder
+  bulk revalidate  - the same refresh again, answered with a 304
+  player ingest    - player_ingest over every player (or --players N), two requests each
+Each phase reports its wall time and the requests the server saw, by endpoint
+and status. By default the stand-in runs in this process; --url targets one
+started separately (python nba_stub_server.py ...).
+
+Usage:
+    python ingestion_benchmark.py --workers 8 --latency-ms 40
+    python ingestion_benchmark.py --players 100 --workers 1 --rate 0 --json seq.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+import requests
+
+def _server_stats(url: str) -> Dict:
+    return requests.get(url.rsplit('/stats', 1)[0] + '/stub/stats', timeout=10).json()
+
+def _diff(before: Dict, after: Dict) -> Dict:
+    requests_by_endpoint = {}
+    for endpoint, statuses in after['requests'].items():
+        for status, count in statuses.items():
+            delta = count - before['requests'].get(endpoint, {}).get(status, 0)
+            if delta:
+                requests_by_endpoint.setdefault(endpoint, {})[status] = delta
+    return {'requests': after['total'] - before['total'], 'by_endpoint': requests_by_endpoint}
+
+def run(url: str, workers: int, rate: float, burst: float, players: Optional[int], scratch: str) -> Dict:
+    # Imported after NBA_STATS_BASE_URL is set so module defaults pick up the stand-in
+    import bulk_pool_builder
+    import player_ingest
+    from data_fetcher import NBADataFetcher
+
+    fetcher = NBADataFetcher()
+    fetcher.base_url = url
+    fetcher.cache_dir = scratch
+    positions, season_avgs = bulk_pool_builder.load_join_data(['player_pool.json'])
+    phases = {}
+
+    def phase(name, work):
+        before = _server_stats(url)
+        start = time.perf_counter()
+        detail = work()
+        phases[name] = {'seconds': round(time.perf_counter() - start, 3), **_diff(before, _server_stats(url)), **detail}
+
+    def bulk_refresh():
+        rows = fetcher.get_league_player_stats(refresh=True)
+        pool = bulk_pool_builder.build_pool(rows, positions, season_avgs)
+        return {'players': sum(len(tier) for tier in pool.values())}
+
+    def player_ingest_run():
+        http_fetcher = player_ingest.HttpFetcher(url)
+        active = http_fetcher.active_players()
+        if players:
+            active = active[:players]
+        checkpoint = player_ingest.Checkpoint(os.path.join(scratch, 'players.jsonl'))
+        counts = player_ingest.ingest(http_fetcher, active, checkpoint, player_ingest.RateLimiter(rate, burst),
+                                      workers=workers)
+        return {'players': len(active), 'statuses': counts}
+
+    phase('bulk refresh', bulk_refresh)
+    phase('bulk revalidate', bulk_refresh)
+    phase('player ingest', player_ingest_run)
+    for result in phases.values():
+        result['players_per_s'] = round(result['players'] / result['seconds'], 1) if result['seconds'] else 0.0
+    return phases
+
+def print_report(phases: Dict) -> None:
+    header = f"{'phase':<18}{'seconds':>9}{'players':>9}{'players/s':>11}{'requests':>10}  by endpoint/status"
+    print(header)
+    print('-' * len(header))
+    for name, row in phases.items():
+        print(f"{name:<18}{row['seconds']:>9.3f}{row['players']:>9}{row['players_per_s']:>11.1f}"
+              f"{row['requests']:>10}  {row['by_endpoint']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark player data ingestion against the local stand-in')
+    parser.add_argument('--url', help='base URL of a running nba_stub_server, e.g. http://127.0.0.1:8765/stats')
+    parser.add_argument('--players', type=int, help='only ingest the first N players')
+    parser.add_argument('--workers', type=int, default=8, help='player ingest workers')
+    parser.add_argument('--rate', type=float, default=0, help='player ingest request rate (0: unlimited)')
+    parser.add_argument('--burst', type=float, default=1, help='player ingest burst')
+    parser.add_argument('--latency-ms', type=float, default=20, help='in-process stand-in: latency per response')
+    parser.add_argument('--jitter-ms', type=float, default=5, help='in-process stand-in: latency jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='in-process stand-in: fraction of 500s')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='in-process stand-in: requests/s before 429s')
+    parser.add_argument('--seed', type=int, default=1, help='in-process stand-in: seed')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, source_dir)
+    os.chdir(source_dir)
+    server = None
+    url = args.url
+    if not url:
+        from nba_stub_server import StubServer
+        server = StubServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                            rate_limit=args.rate_limit, seed=args.seed).start()
+        url = server.url
+    os.environ['NBA_STATS_BASE_URL'] = url
+
+    scratch = tempfile.mkdtemp(prefix='budget-gm-ingest-')
+    try:
+        phases = run(url, args.workers, args.rate, args.burst, args.players, scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if server is not None:
+            server.stop()
+
+    print_report(phases)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'url': url, 'config': vars(args), 'phases': phases}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+"""
+Background jobs for long simulations.
+The API writes a job file and a queue marker; a separate worker process claims
+markers (an atomic rename, so several workers can share the queue), runs the
+job on a bounded process pool and records progress and the result in the job
+file. Web workers only ever read job files, so job size does not affect request
+latency and jobs survive web worker restarts.
+
+Layout under data/jobs:
+    <id>.json             job state: type, params, status, progress, result
+    queue/<ts>-<id>       waiting to be claimed
+    running/<ts>-<id>     claimed by a worker
+
+Run the worker: python job_queue.py --workers 2
+
+The queue is plain files on local disk, so the worker must run on the same
+machine and filesystem as the web process. Hosts that give every service its
+own disk (a separate worker service would never see the web service's
+data/jobs) run it inside the web service instead: with JOB_WORKER_IN_WEB set
+(the default), gunicorn's master starts it as a child process when it is
+ready and stops it on exit.
+
+A job process that dies (killed, out of memory) breaks the whole process pool:
+every job in flight on it fails with BrokenProcessPool, and which of them killed
+it is unknown. The worker starts a new pool and puts those jobs back on the
+queue to run one at a time, so the next crash is pinned on the job that caused
+it; a job that crashes its pool JOB_MAX_ATTEMPTS times on its own fails.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+import logging
+import logging_config
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from file_store import atomic_write_json, file_lock
+
+logger = logging.getLogger(__name__)
+
+JOB_DIR = 'data/jobs'
+QUEUE_DIR = os.path.join(JOB_DIR, 'queue')
+RUNNING_DIR = os.path.join(JOB_DIR, 'running')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 0.5))
+JOB_TTL_DAYS = int(os.environ.get('JOB_TTL_DAYS', 7))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))  # Runs before a job that keeps crashing fails
+JOB_WORKER_IN_WEB = os.environ.get('JOB_WORKER_IN_WEB', '1').lower() in ('1', 'true', 'yes')
+PROGRESS_INTERVAL = 0.5  # Minimum seconds between progress writes
+FINISHED = ('done', 'failed')
+
+MAX_SEASONS = 10000
+MAX_GAMES = 82
+MAX_TOURNAMENT_TEAMS = 64
+MAX_REPLAY_LIMIT = 1000
+MAX_REPORTED_SKIPS = 100
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+def _job_lock(job_id: str) -> str:
+    return os.path.join(JOB_DIR, f".{job_id}.lock")
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Current state of a job, or None if there is no such job"""
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        with open(_job_path(job_id), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _update_job(job_id: str, **fields) -> Optional[Dict]:
+    """Update a job's fields; returns None if the job file is gone (e.g. purged)"""
+    with file_lock(_job_lock(job_id)):
+        job = get_job(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        atomic_write_json(_job_path(job_id), job)
+    return job
+
+def _marker_job_id(marker: str) -> str:
+    return marker.split('-', 1)[-1]
+
+# Job types. Each handler takes the job params and a progress callback
+# progress(done, total) and returns the JSON-serializable result.
+
+def _resolve_lineup(pool, names: List[str]) -> List[int]:
+    from batch_simulator import lineup_names
+    indices, error = pool.resolve(lineup_names(names))
+    if error:
+        raise ValueError(error)
+    return indices
+
+def _roster_index(params: Dict):
+    """Roster index of the challenge the job names (default: today's)"""
+    from batch_simulator import get_roster_index
+    from models import get_challenge
+    date = params.get('date') or datetime.now().strftime('%Y-%m-%d')
+    challenge = get_challenge(date, generate=False)
+    if not challenge.players:
+        raise ValueError(f"No challenge for {date}")
+    return get_roster_index(challenge)
+
+def run_seasons(params: Dict, progress: Callable) -> Dict:
+    """Simulate many seasons of one lineup and summarize the win distribution"""
+    from batch_simulator import simulate_seasons, GAMES_PER_SEASON
+    pool = _roster_index(params)
+    indices = _resolve_lineup(pool, params['players'])
+    seasons = int(params.get('seasons', 1000))
+    games = int(params.get('games', GAMES_PER_SEASON))
+    rng = np.random.default_rng(params.get('seed'))
+    team_rating = pool.ratings[indices].sum()
+
+    wins = []
+    for start in range(0, seasons, 500):
+        count = min(500, seasons - start)
+        wins.append(simulate_seasons(np.full(count, team_rating), pool, games, rng))
+        progress(start + count, seasons)
+    wins = np.concatenate(wins)
+    return {
+        'seasons': seasons,
+        'games': games,
+        'team_rating': round(float(team_rating), 1),
+        'avg_wins': round(float(wins.mean()), 2),
+        'min_wins': int(wins.min()),
+        'max_wins': int(wins.max()),
+        'percentiles': {str(p): float(np.percentile(wins, p)) for p in (10, 50, 90)}
+    }
+
+def run_tournament(params: Dict, progress: Callable) -> Dict:
+    """Round robin between lineups, each pairing playing a series of games"""
+    from batch_simulator import RATING_NOISE
+    pool = _roster_index(params)
+    lineups = params['lineups']
+    games = int(params.get('games', 7))
+    rng = np.random.default_rng(params.get('seed'))
+    ratings = np.array([pool.ratings[_resolve_lineup(pool, lineup)].sum() for lineup in lineups])
+
+    teams = len(lineups)
+    wins = np.zeros(teams, dtype=int)
+    for i in range(teams):
+        others = np.arange(i + 1, teams)
+        if len(others):
+            team = ratings[i] + rng.uniform(-RATING_NOISE, RATING_NOISE, size=(len(others), games))
+            opponents = ratings[others][:, None] + rng.uniform(-RATING_NOISE, RATING_NOISE, size=(len(others), games))
+            won = (team > opponents).sum(axis=1)
+            wins[i] += won.sum()
+            wins[others] += games - won
+        progress(i + 1, teams)
+
+    played = games * (teams - 1)
+    standings = sorted(range(teams), key=lambda i: wins[i], reverse=True)
+    return {
+        'games_per_series': games,
+        'standings': [{
+            'rank': rank + 1,
+            'index': i,
+            'players': lineups[i],
+            'wins': int(wins[i]),
+            'losses': int(played - wins[i]),
+            'team_rating': round(float(ratings[i]), 1)
+        } for rank, i in enumerate(standings)]
+    }
+
+def run_replay(params: Dict, progress: Callable) -> Dict:
+    """Re-simulate every submission of a challenge day against that day's roster"""
+    from batch_simulator import PoolIndex, simulate_seasons, GAMES_PER_SEASON
+    from models import DailyChallenge
+    challenge = DailyChallenge(params['date'], generate=False)
+    if not challenge.players:
+        raise ValueError(f"No challenge for {params['date']}")
+    pool = PoolIndex(challenge.players)
+    rng = np.random.default_rng(params.get('seed'))
+    submissions = [challenge._rehydrate(s) for s in challenge.submissions]
+    limit = int(params.get('limit', 100))
+
+    results = []
+    skipped = []  # Legacy teams with players that are not on the roster (e.g. renamed since)
+    for start in range(0, len(submissions), 1000):
+        chunk, indices = [], []
+        for submission in submissions[start:start + 1000]:
+            names = [p.get('name', '') if isinstance(p, dict) else p for p in submission.get('team', [])]
+            if len(names) != 5 or any(name.lower() not in pool.index for name in names):
+                skipped.append(submission.get('player_name'))
+                continue
+            chunk.append(submission)
+            indices.append([pool.index[name.lower()] for name in names])
+        if chunk:
+            wins = simulate_seasons(pool.ratings[np.array(indices)].sum(axis=1), pool, GAMES_PER_SEASON, rng)
+            for submission, won in zip(chunk, wins):
+                results.append({
+                    'player_name': submission['player_name'],
+                    'original': submission['record'],
+                    'replayed': {'wins': int(won), 'losses': GAMES_PER_SEASON - int(won)}
+                })
+        progress(min(start + 1000, len(submissions)), len(submissions))
+
+    if skipped:
+        logger.warning(f"Replay of {challenge.date} skipped {len(skipped)} submission(s) not matching the roster")
+    results.sort(key=lambda r: r['replayed']['wins'], reverse=True)
+    return {
+        'date': challenge.date,
+        'submissions': len(results),
+        'skipped': len(skipped),
+        'skipped_players': skipped[:MAX_REPORTED_SKIPS],
+        'leaderboard': results[:limit]
+    }
+
+JOB_TYPES = {
+    'seasons': run_seasons,
+    'tournament': run_tournament,
+    'replay': run_replay
+}
+
+def validate_params(job_type: str, params: Dict) -> Optional[str]:
+    """Error message for a bad submission, or None"""
+    if job_type not in JOB_TYPES:
+        return f"Unknown job type: {job_type}"
+    if not isinstance(params, dict):
+        return 'params must be an object'
+    if params.get('date') is not None or job_type == 'replay':
+        try:
+            datetime.strptime(str(params.get('date')), '%Y-%m-%d')
+        except ValueError:
+            return 'date must be YYYY-MM-DD'
+    if job_type == 'seasons':
+        if not isinstance(params.get('players'), list):
+            return 'players is required'
+        if not 1 <= int(params.get('seasons', 1000)) <= MAX_SEASONS:
+            return f"seasons must be between 1 and {MAX_SEASONS}"
+        if not 1 <= int(params.get('games', MAX_GAMES)) <= MAX_GAMES:
+            return f"games must be between 1 and {MAX_GAMES}"
+    elif job_type == 'tournament':
+        lineups = params.get('lineups')
+        if not isinstance(lineups, list) or not 2 <= len(lineups) <= MAX_TOURNAMENT_TEAMS:
+            return f"lineups must hold between 2 and {MAX_TOURNAMENT_TEAMS} lineups"
+        if not 1 <= int(params.get('games', 7)) <= MAX_GAMES:
+            return f"games must be between 1 and {MAX_GAMES}"
+    elif job_type == 'replay':
+        if not 1 <= int(params.get('limit', 100)) <= MAX_REPLAY_LIMIT:
+            return f"limit must be between 1 and {MAX_REPLAY_LIMIT}"
+    return None
+
+def submit_job(job_type: str, params: Dict) -> Dict:
+    """Create a queued job and return its state"""
+    job_id = uuid.uuid4().hex
+    created = time.time()
+    job = {
+        'id': job_id,
+        'type': job_type,
+        'params': params,
+        'status': 'queued',
+        'progress': {'done': 0, 'total': None},
+        'result': None,
+        'error': None,
+        'created_at': datetime.fromtimestamp(created).isoformat(),
+        'started_at': None,
+        'finished_at': None
+    }
+    atomic_write_json(_job_path(job_id), job)
+    os.makedirs(QUEUE_DIR, exist_ok=True)
+    # Marker names sort by submission time so the oldest job is claimed first
+    open(os.path.join(QUEUE_DIR, f"{int(created * 1000):015d}-{job_id}"), 'w').close()
+    logger.info(f"Queued {job_type} job {job_id}")
+    return job
+
+def execute_job(job_id: str) -> str:
+    """Run a claimed job to completion in the current process; returns its final status"""
+    job = _update_job(job_id, status='running', started_at=datetime.now().isoformat())
+    if job is None:
+        logger.warning(f"Job {job_id} was removed before it ran")
+        return 'failed'
+    last_write = [0.0]
+
+    def progress(done: int, total: int) -> None:
+        now = time.time()
+        if now - last_write[0] >= PROGRESS_INTERVAL or done >= total:
+            last_write[0] = now
+            _update_job(job_id, progress={'done': done, 'total': total})
+
+    try:
+        result = JOB_TYPES[job['type']](job['params'], progress)
+        _update_job(job_id, status='done', result=result, finished_at=datetime.now().isoformat())
+        logger.info(f"Finished {job['type']} job {job_id}")
+        return 'done'
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        _update_job(job_id, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+        return 'failed'
+
+def _claim_next(skip: set) -> Optional[str]:
+    """Move the oldest queue marker to running; returns the marker name or None"""
+    try:
+        markers = sorted(os.listdir(QUEUE_DIR))
+    except FileNotFoundError:
+        return None
+    os.makedirs(RUNNING_DIR, exist_ok=True)
+    for marker in markers:
+        if marker in skip or marker.startswith('.'):
+            continue
+        try:
+            os.rename(os.path.join(QUEUE_DIR, marker), os.path.join(RUNNING_DIR, marker))
+            return marker
+        except FileNotFoundError:
+            continue  # Claimed by another worker
+    return None
+
+def _pid_alive(pid) -> bool:
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except (OSError, TypeError, ValueError):
+        return False
+
+def requeue_orphans() -> int:
+    """Put jobs whose worker process died back on the queue"""
+    try:
+        markers = os.listdir(RUNNING_DIR)
+    except FileNotFoundError:
+        return 0
+    requeued = 0
+    for marker in markers:
+        job = get_job(_marker_job_id(marker))
+        if job is None or job['status'] in FINISHED:
+            os.remove(os.path.join(RUNNING_DIR, marker))
+        elif not _pid_alive(job.get('worker_pid')):
+            _update_job(job['id'], status='queued', progress={'done': 0, 'total': None})
+            os.rename(os.path.join(RUNNING_DIR, marker), os.path.join(QUEUE_DIR, marker))
+            requeued += 1
+    if requeued:
+        logger.info(f"Requeued {requeued} orphaned job(s)")
+    return requeued
+
+def purge_finished(max_age_days: int = JOB_TTL_DAYS) -> int:
+    """Delete finished jobs older than max_age_days"""
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+    purged = 0
+    for name in os.listdir(JOB_DIR) if os.path.isdir(JOB_DIR) else []:
+        if not name.endswith('.json') or name.startswith('.'):
+            continue
+        job = get_job(name[:-5])
+        if job and job['status'] in FINISHED and (job.get('finished_at') or '') < cutoff:
+            os.remove(_job_path(job['id']))
+            lock_path = _job_lock(job['id'])
+            if os.path.exists(lock_path):
+                os.remove(lock_path)
+            purged += 1
+    return purged
+
+def _remove_marker(marker: str) -> None:
+    try:
+        os.remove(os.path.join(RUNNING_DIR, marker))
+    except FileNotFoundError:
+        pass
+
+def _isolated(marker: str) -> bool:
+    """Whether a job is suspected of crashing its pool, and so runs on an otherwise idle pool"""
+    return (get_job(_marker_job_id(marker)) or {}).get('isolate', False)
+
+def _requeue_crashed(marker: str, error: str, alone: bool) -> None:
+    """Put a job whose process pool broke under it back on the queue to run alone, or
+    fail it once it has crashed the pool by itself JOB_MAX_ATTEMPTS times"""
+    job_id = _marker_job_id(marker)
+    job = get_job(job_id)
+    if job is None:
+        _remove_marker(marker)
+        return
+    # A job that shared the broken pool may be a bystander: only a crash while alone counts
+    attempts = job.get('attempts', 0) + (1 if alone else 0)
+    if attempts >= JOB_MAX_ATTEMPTS:
+        logger.error(f"Job {job_id} crashed its process {attempts} times, giving up")
+        _update_job(job_id, status='failed', attempts=attempts, error=error, finished_at=datetime.now().isoformat())
+        _remove_marker(marker)
+        return
+    _update_job(job_id, status='queued', attempts=attempts, isolate=True, progress={'done': 0, 'total': None})
+    os.rename(os.path.join(RUNNING_DIR, marker), os.path.join(QUEUE_DIR, marker))
+    logger.warning(f"Requeued job {job_id} after its process pool broke (attempt {attempts}/{JOB_MAX_ATTEMPTS})")
+
+def _reap(running: Dict) -> bool:
+    """Record the jobs whose processes finished; returns True if the process pool broke"""
+    finished = [f for f in running if f.done()]
+    if any(isinstance(f.exception(), BrokenProcessPool) for f in finished):
+        # Every job still on a broken pool fails with it; collect them all before starting a new pool
+        wait(list(running))
+        finished = list(running)
+    crashed = [f for f in finished if isinstance(f.exception(), BrokenProcessPool)]
+    for future in finished:
+        marker = running.pop(future)
+        error = future.exception()
+        if future in crashed:
+            _requeue_crashed(marker, str(error) or 'job process died', alone=len(crashed) == 1)
+            continue
+        if error is not None:
+            logger.error(f"Job process for {marker} crashed: {str(error)}")
+            _update_job(_marker_job_id(marker), status='failed', error=str(error),
+                        finished_at=datetime.now().isoformat())
+        _remove_marker(marker)
+    return bool(crashed)
+
+def _fill(executor: ProcessPoolExecutor, running: Dict, workers: int) -> bool:
+    """Claim as many jobs as the pool can start right away, leaving the rest to other
+    workers; returns True if the pool is broken"""
+    if any(_isolated(marker) for marker in running.values()):
+        return False
+    while len(running) < workers:
+        marker = _claim_next(set(running.values()))
+        if marker is None:
+            break
+        job_id = _marker_job_id(marker)
+        job = _update_job(job_id, worker_pid=os.getpid())
+        if job is None:
+            _remove_marker(marker)
+            continue
+        if job.get('isolate') and running:
+            # Wait for the pool to drain; the job keeps its place at the head of the queue
+            os.rename(os.path.join(RUNNING_DIR, marker), os.path.join(QUEUE_DIR, marker))
+            break
+        try:
+            running[executor.submit(execute_job, job_id)] = marker
+        except BrokenProcessPool:
+            # A pool process died while idle; the job never started, so it keeps its place
+            os.rename(os.path.join(RUNNING_DIR, marker), os.path.join(QUEUE_DIR, marker))
+            return True
+        if job.get('isolate'):
+            break
+    return False
+
+def run_worker(workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL) -> None:
+    """Claim and run queued jobs on a pool of worker processes, forever"""
+    os.makedirs(QUEUE_DIR, exist_ok=True)
+    os.makedirs(RUNNING_DIR, exist_ok=True)
+    requeue_orphans()
+    logger.info(f"Job worker started with {workers} process(es)")
+    running = {}  # future -> marker
+    last_purge = 0.0
+    broken = False
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            if _reap(running) or broken:
+                logger.error("Job process pool broke, starting a new one")
+                executor.shutdown(wait=True)
+                executor = ProcessPoolExecutor(max_workers=workers)
+            broken = _fill(executor, running, workers)
+
+            if time.time() - last_purge > 3600:
+                last_purge = time.time()
+                purge_finished()
+            time.sleep(poll_interval)
+    finally:
+        executor.shutdown(wait=True)
+
+def spawn_worker_process(workers: int = JOB_WORKERS) -> subprocess.Popen:
+    """Start the job worker as a child process, e.g. of the web server"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_queue.py')
+    process = subprocess.Popen([sys.executable, script, '--workers', str(workers)])
+    logger.info(f"Started job worker process {process.pid}")
+    return process
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued simulation jobs')
+    parser.add_argument('--workers', type=int, default=JOB_WORKERS, help='number of job processes')
+    parser.add_argument('--poll', type=float, default=JOB_POLL_INTERVAL, help='seconds between queue polls')
+    args = parser.parse_args()
+    run_worker(args.workers, args.poll)
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
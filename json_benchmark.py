@@ -0,0 +1,94 @@
+"""
+Benchmark JSON encoding and decoding on our real payloads.
+Compares the stdlib json module with the json_provider backend (orjson when
+installed) on player_pool.json, cache/player_stats.json and a synthetic
+challenge with 10k submissions, reporting encode/decode time and size.
+
+Usage: python json_benchmark.py [--repeat 20]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+import json_provider
+from models import load_pool_players
+from lineups import lineup_id
+
+def _best_time(func: Callable, repeat: int) -> float:
+    """Best wall time of func over repeat runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def synthetic_challenge(submission_count: int = 10000, seed: int = 42) -> Dict:
+    """A challenge in the stored format with submission_count submissions"""
+    rng = random.Random(seed)
+    players = load_pool_players()
+    roster = []
+    for cost in ['$5', '$4', '$3', '$2', '$1']:
+        tier = [p for p in players if p['cost'] == cost]
+        roster.extend(rng.sample(tier, min(5, len(tier))))
+    lineups = {}
+    submissions = []
+    for i in range(submission_count):
+        slots = sorted(rng.sample(range(len(roster)), 5))
+        lineup = lineup_id(slots)
+        entry = lineups.setdefault(lineup, {'slots': slots, 'count': 0, 'rating': 0.0})
+        entry['count'] += 1
+        wins = rng.randint(10, 72)
+        submissions.append({
+            'player_name': f'user{i}',
+            'record': {'wins': wins, 'losses': 82 - wins},
+            'timestamp': datetime(2025, 1, 1).isoformat(),
+            'lineup': lineup
+        })
+    return {'date': '2025-01-01', 'players': roster, 'lineups': lineups, 'submissions': submissions}
+
+def load_payloads() -> Dict[str, object]:
+    payloads = {}
+    with open('player_pool.json', 'r') as f:
+        payloads['player_pool.json'] = json.load(f)
+    with open('cache/player_stats.json', 'r') as f:
+        payloads['cache/player_stats.json'] = json.load(f)
+    payloads['challenge (10k submissions)'] = synthetic_challenge()
+    return payloads
+
+def benchmark(payloads: Dict[str, object], repeat: int) -> List[Dict]:
+    results = []
+    for name, data in payloads.items():
+        pretty = json.dumps(data, indent=2).encode('utf-8')
+        compact = json_provider.dumps_bytes(data)
+        results.append({
+            'payload': name,
+            'stdlib_encode_ms': _best_time(lambda: json.dumps(data, indent=2), repeat),
+            'stdlib_decode_ms': _best_time(lambda: json.loads(pretty), repeat),
+            'provider_encode_ms': _best_time(lambda: json_provider.dumps_bytes(data), repeat),
+            'provider_decode_ms': _best_time(lambda: json_provider.loads(compact), repeat),
+            'pretty_bytes': len(pretty),
+            'compact_bytes': len(compact)
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding on real payloads')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    print(f"Provider backend: {json_provider.BACKEND}")
+    header = f"{'payload':<30}{'stdlib enc':>12}{'stdlib dec':>12}{'prov enc':>10}{'prov dec':>10}{'pretty KB':>11}{'compact KB':>12}"
+    print(header)
+    print('-' * len(header))
+    for row in benchmark(load_payloads(), args.repeat):
+        print(f"{row['payload']:<30}"
+              f"{row['stdlib_encode_ms']:>10.2f}ms{row['stdlib_decode_ms']:>10.2f}ms"
+              f"{row['provider_encode_ms']:>8.2f}ms{row['provider_decode_ms']:>8.2f}ms"
+              f"{row['pretty_bytes'] / 1024:>11.1f}{row['compact_bytes'] / 1024:>12.1f}")
+
+if __name__ == '__main__':
+    main()
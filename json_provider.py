@@ -0,0 +1,114 @@
+"""
+JSON encoding used by the API and by everything we persist.
+Uses orjson when it is installed and falls back to the stdlib json module.
+Output is always compact unless pretty=True is asked for.
+"""
+
+import json
+import logging
+from typing import Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND = 'orjson' if orjson else 'json'
+
+if orjson:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj):
+    """Fallback for types neither encoder handles natively (e.g. numpy scalars under stdlib json)"""
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _orjson_option(kwargs: Dict) -> Optional[int]:
+    """orjson option flags for json.dumps keyword arguments, or None if one has no
+    orjson equivalent (or orjson is not installed)"""
+    if not orjson:
+        return None
+    option = _ORJSON_OPTIONS
+    indent = kwargs.get('indent')
+    for name, value in kwargs.items():
+        if name == 'sort_keys':
+            option |= orjson.OPT_SORT_KEYS if value else 0
+        elif name == 'indent':
+            if value not in (None, 2):
+                return None
+            option |= orjson.OPT_INDENT_2 if value else 0
+        elif name == 'separators':
+            if value is not None and tuple(value) != ((',', ': ') if indent else (',', ':')):
+                return None
+        elif name == 'ensure_ascii':
+            # orjson always writes UTF-8
+            if value:
+                return None
+        elif name != 'default':
+            return None
+    return option
+
+def dumps_bytes(obj, pretty: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson:
+        options = _ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=_default, option=options)
+    return dumps(obj, pretty).encode('utf-8')
+
+def dumps(obj, pretty: bool = False) -> str:
+    """Serialize to a JSON string"""
+    if orjson:
+        return dumps_bytes(obj, pretty).decode('utf-8')
+    if pretty:
+        return json.dumps(obj, indent=2, default=_default, ensure_ascii=False)
+    return json.dumps(obj, separators=(',', ':'), default=_default, ensure_ascii=False)
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def load(f):
+    """Parse JSON from a file object opened in text or binary mode"""
+    return loads(f.read())
+
+def dump(obj, f, pretty: bool = False) -> None:
+    """Write JSON to a file object opened in binary mode"""
+    f.write(dumps_bytes(obj, pretty))
+
+def init_app(app) -> None:
+    """Route Flask's jsonify and request parsing through this module (Flask 2.2+)"""
+    try:
+        from flask.json.provider import DefaultJSONProvider
+    except ImportError:
+        # Older Flask has no provider hook, jsonify keeps using the stdlib encoder
+        logger.info("Flask JSON provider hook not available, using stdlib json for responses")
+        return
+
+    class FastJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            if not kwargs:
+                return dumps(obj)
+            option = _orjson_option(kwargs)
+            if option is None:
+                # Options orjson cannot express go through Flask's stdlib provider
+                return super().dumps(obj, **kwargs)
+            return orjson.dumps(obj, default=kwargs.get('default') or _default, option=option).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+    app.json = FastJSONProvider(app)
+    logger.info(f"Using {BACKEND} for JSON responses")
@@ -0,0 +1,148 @@
+"""
+Multi-day leaderboards maintained incrementally as days close.
+Each ISO week, month and the all-time period has a rollup file holding per-user
+aggregates and a precomputed top-k, so period leaderboards cost the same no
+matter how many days are in the archive.
+Each rollup lists the days folded into it, and a day is only folded into rollups
+that do not list it yet, so closing a day again after a crash halfway through
+never counts it twice. closed_days.json, written last, is the index of days that
+are closed everywhere.
+
+Close finished days: python leaderboard_rollups.py
+"""
+
+import argparse
+import json
+import os
+import re
+import logging
+import logging_config
+from datetime import datetime
+from typing import Dict, List, Optional
+from file_store import atomic_write_json, file_lock, file_stamp
+import user_history
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_DIR = 'data/rollups'
+ROLLUP_LOCK = os.path.join(ROLLUP_DIR, '.lock')
+CLOSED_DAYS_FILE = os.path.join(ROLLUP_DIR, 'closed_days.json')
+ROLLUP_TOP_K = int(os.environ.get('ROLLUP_TOP_K', 100))
+PERIODS = ['week', 'month', 'all']
+# Format of the keys period_key produces; anything else never names a rollup file
+PERIOD_KEY_PATTERNS = {
+    'week': re.compile(r'\d{4}-W\d{2}'),
+    'month': re.compile(r'\d{4}-\d{2}'),
+    'all': re.compile(r'all')
+}
+
+# Loaded rollups, revalidated by file stat: path -> (stamp, rollup)
+_rollup_cache = {}
+
+def period_key(period: str, date: str) -> str:
+    """Key of the period a date belongs to"""
+    day = datetime.strptime(date, '%Y-%m-%d')
+    if period == 'week':
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == 'month':
+        return date[:7]
+    if period == 'all':
+        return 'all'
+    raise ValueError(f"Unknown period: {period}")
+
+def is_valid_key(period: str, key: str) -> bool:
+    """Whether key has the format of period's keys (and so is safe to put in a path)"""
+    pattern = PERIOD_KEY_PATTERNS.get(period)
+    return pattern is not None and isinstance(key, str) and pattern.fullmatch(key) is not None
+
+def _rollup_path(period: str, key: str) -> str:
+    return os.path.join(ROLLUP_DIR, f"{period}-{key}.json" if period != 'all' else 'all.json')
+
+def _read_json(path: str, default):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+def _top(users: Dict[str, Dict], limit: int = ROLLUP_TOP_K) -> List[Dict]:
+    ranked = sorted(users.items(), key=lambda item: (item[1]['wins'], -item[1]['losses']), reverse=True)
+    return [{'rank': i + 1, 'player_name': name, **totals} for i, (name, totals) in enumerate(ranked[:limit])]
+
+def close_day(date: str, submissions: List[Dict]) -> bool:
+    """Fold a finished day's submissions into every period rollup; returns False if already closed"""
+    with file_lock(ROLLUP_LOCK):
+        closed = set(_read_json(CLOSED_DAYS_FILE, []))
+        if date in closed:
+            return False
+        for period in PERIODS:
+            key = period_key(period, date)
+            path = _rollup_path(period, key)
+            rollup = _read_json(path, {'period': period, 'key': key, 'days': 0, 'users': {}})
+            if date in rollup.setdefault('closed_days', []):
+                continue
+            for submission in submissions:
+                record = submission.get('record')
+                if not isinstance(record, dict) or 'wins' not in record:
+                    continue
+                totals = rollup['users'].setdefault(submission['player_name'], {'wins': 0, 'losses': 0, 'days': 0})
+                totals['wins'] += record['wins']
+                totals['losses'] += record['losses']
+                totals['days'] += 1
+            rollup['days'] += 1
+            rollup['closed_days'].append(date)
+            rollup['top'] = _top(rollup['users'])
+            atomic_write_json(path, rollup)
+        closed.add(date)
+        atomic_write_json(CLOSED_DAYS_FILE, sorted(closed))
+    user_history.refresh_day(date, submissions)
+    logger.info(f"Closed challenge day {date} ({len(submissions)} submissions)")
+    return True
+
+def close_pending_days() -> List[str]:
+    """Close every day before today that has not been folded into the rollups yet"""
+    import challenge_manifest
+    from models import DailyChallenge, challenge_lock
+
+    today = datetime.now().strftime('%Y-%m-%d')
+    closed = set(_read_json(CLOSED_DAYS_FILE, []))
+    newly_closed = []
+    for date in sorted(challenge_manifest.list_dates(before=today)):
+        if date in closed:
+            continue
+        # The manifest gets the day's final summary under the lock its submissions were written under
+        with challenge_lock(date):
+            challenge = DailyChallenge(date, generate=False)
+            challenge_manifest.record_challenge(date, challenge.submissions)
+        if close_day(date, challenge.submissions):
+            newly_closed.append(date)
+    return newly_closed
+
+def get_period_leaderboard(period: str, key: Optional[str] = None, limit: int = ROLLUP_TOP_K) -> Dict:
+    """Get the precomputed leaderboard of a period (defaults to the current one)"""
+    key = key or period_key(period, datetime.now().strftime('%Y-%m-%d'))
+    if not is_valid_key(period, key):
+        raise ValueError(f"Invalid {period} key: {key}")
+    limit = max(1, min(limit, ROLLUP_TOP_K))
+    path = _rollup_path(period, key)
+    stamp = file_stamp(path)
+    if stamp is None:
+        return {'period': period, 'key': key, 'days': 0, 'leaderboard': []}
+    cached = _rollup_cache.get(path)
+    if cached is None or cached[0] != stamp:
+        rollup = _read_json(path, {})
+        cached = (stamp, {'period': period, 'key': key, 'days': rollup.get('days', 0), 'top': rollup.get('top', [])})
+        _rollup_cache[path] = cached
+    rollup = cached[1]
+    return {'period': period, 'key': key, 'days': rollup['days'], 'leaderboard': rollup['top'][:limit]}
+
+def main():
+    parser = argparse.ArgumentParser(description='Close finished challenge days into the period leaderboards')
+    parser.parse_args()
+    closed = close_pending_days()
+    print(f"Closed {len(closed)} day(s)")
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
@@ -0,0 +1,28 @@
+"""
+Canonical lineup ids.
+A lineup is a set of challenge roster slots; its id is the hex of the bitmask of
+those slots, so every user who picks the same five players shares one id.
+A challenge keeps one entry per id with the lineup's slots, reference count,
+rating and simulated season record; later submissions of the lineup reuse
+that record instead of simulating it again.
+"""
+
+from typing import Dict, List
+
+def lineup_id(slots: List[int]) -> str:
+    """Canonical id of a set of roster slots"""
+    mask = 0
+    for slot in slots:
+        mask |= 1 << slot
+    return f"{mask:07x}"
+
+def lineup_slots(lineup: str) -> List[int]:
+    """Roster slots of a lineup id, in ascending order"""
+    mask = int(lineup, 16)
+    return [slot for slot in range(mask.bit_length()) if mask >> slot & 1]
+
+def lineup_rating(players: List[Dict], slots: List[int]) -> float:
+    """Team rating of a lineup, using the simulator's player rating formula"""
+    from team_simulator import Player
+    return round(sum(Player(players[slot]['name'], players[slot].get('stats', {})).get_rating()
+                     for slot in slots), 1)
@@ -0,0 +1,246 @@
+"""
+Load generator replaying the game's main flow with synthetic users.
+Each user fetches today's challenge, picks a lineup within the $15 budget from
+its roster, validates it, simulates it, submits it, then checks the
+leaderboards. Users and lineups come from a seeded RNG, so runs with the same
+settings issue the same requests.
+
+In-process mode (the default) runs the Flask app in this process against a
+scratch copy of the data files, fully offline and starting from an empty
+challenge state every run; today's roster is generated from the same seed, so
+runs are comparable. Users are spread over --clients client addresses, which
+go through the app's real admission limits. --url targets a running server
+instead, where every user shares this machine's address.
+
+Usage:
+    python load_test.py --users 200 --concurrency 16
+    python load_test.py --url http://localhost:10000 --users 500 --rate 50 --json run.json
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+BUDGET = 15
+SANDBOX_FILES = ['player_pool.json', 'fallback_player_pool.json', 'full_player_pool.json']
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class InProcessClient:
+    """Calls the app through Flask's test client"""
+
+    def __init__(self):
+        from app import app
+        self._app = app
+        # The app logs every save and simulation at INFO, too much for a load run
+        logging.getLogger().setLevel(logging.WARNING)
+
+    def request(self, method: str, path: str, body: Optional[Dict], headers: Dict,
+                client_address: str) -> Tuple[int, object]:
+        client = self._app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers,
+                               environ_base={'REMOTE_ADDR': client_address})
+        payload = response.get_data()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            payload = gzip.decompress(payload)
+        try:
+            return response.status_code, json.loads(payload)
+        except ValueError:
+            return response.status_code, None
+
+class HttpClient:
+    """Calls a running server over HTTP, one keep-alive session per thread"""
+
+    def __init__(self, base_url: str):
+        import requests
+        self._requests = requests
+        self._base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Optional[Dict], headers: Dict,
+                client_address: str) -> Tuple[int, object]:
+        # Requests leave from this machine; client_address cannot be chosen over the network
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.request(method, self._base_url + path, json=body, headers=headers, timeout=60)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+def pick_lineup(rng: random.Random, roster: List[Dict]) -> List[str]:
+    """Random five-player lineup within the budget"""
+    cost = lambda p: int(str(p.get('cost', '$1')).replace('$', ''))
+    for _ in range(100):
+        lineup = rng.sample(roster, 5)
+        if sum(cost(p) for p in lineup) <= BUDGET:
+            return [p['name'] for p in lineup]
+    return [p['name'] for p in sorted(roster, key=cost)[:5]]
+
+class LoadTest:
+    def __init__(self, client, users: int, concurrency: int, rate: float, seed: int, run_id: str,
+                 clients: int = 0):
+        self.client = client
+        self.users = users
+        self.clients = clients or users
+        self.concurrency = concurrency
+        self.rate = rate
+        self.seed = seed
+        self.run_id = run_id
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        self.latencies = defaultdict(list)  # route -> seconds
+        self.statuses = defaultdict(lambda: defaultdict(int))  # route -> status -> count
+        self._lock = threading.Lock()
+
+    def _call(self, route: str, method: str, path: str, headers: Dict, client_address: str,
+              body: Optional[Dict] = None):
+        start = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, body, headers, client_address)
+        except Exception:
+            status, data = 0, None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][status] += 1
+        return status, data
+
+    def user_flow(self, index: int) -> None:
+        rng = random.Random(self.seed * 1000003 + index)
+        player_name = f"load-{self.run_id}-{index}"
+        client = index % self.clients
+        address = f"10.{client // 65536 % 256}.{client // 256 % 256}.{client % 256}"
+        headers = {'Accept-Encoding': 'gzip'}
+
+        status, challenge = self._call('challenge', 'GET', f"/api/challenge/{self.today}", headers, address)
+        if status != 200 or not challenge:
+            return
+        lineup = pick_lineup(rng, challenge['players'])
+        self._call('validate', 'POST', '/api/validate-team', headers, address,
+                   {'players': [{'name': n} for n in lineup]})
+        self._call('simulate', 'POST', '/api/simulate-team', headers, address, {'players': lineup})
+        self._call('submit', 'POST', '/api/submit', headers, address, {'player_name': player_name, 'players': lineup})
+        self._call('check_submission', 'GET', f"/api/check_submission?player_name={player_name}", headers, address)
+        period = rng.choice(['week', 'month', 'all'])
+        self._call('leaderboard', 'GET', f"/api/leaderboard?period={period}", headers, address)
+
+    def run(self) -> Dict:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = []
+            for index in range(self.users):
+                if self.rate > 0:
+                    # Open loop: users arrive at a fixed rate regardless of response times
+                    delay = start + index / self.rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append(executor.submit(self.user_flow, index))
+            for future in futures:
+                future.result()
+        return self.report(time.perf_counter() - start)
+
+    def report(self, duration: float) -> Dict:
+        routes = {}
+        total = 0
+        for route, values in self.latencies.items():
+            total += len(values)
+            statuses = dict(self.statuses[route])
+            routes[route] = {
+                'requests': len(values),
+                'errors': sum(count for status, count in statuses.items() if status == 0 or status >= 500),
+                'statuses': {str(status): count for status, count in sorted(statuses.items())},
+                'p50_ms': round(_percentile(values, 50) * 1000, 2),
+                'p95_ms': round(_percentile(values, 95) * 1000, 2),
+                'p99_ms': round(_percentile(values, 99) * 1000, 2),
+                'max_ms': round(max(values) * 1000, 2)
+            }
+        return {
+            'run_id': self.run_id,
+            'started_at': datetime.now().isoformat(),
+            'config': {'users': self.users, 'clients': self.clients, 'concurrency': self.concurrency,
+                       'rate': self.rate, 'seed': self.seed},
+            'duration_s': round(duration, 3),
+            'requests': total,
+            'throughput_rps': round(total / duration, 1) if duration else 0.0,
+            'users_per_s': round(self.users / duration, 1) if duration else 0.0,
+            'routes': routes
+        }
+
+def prepare_sandbox(source_dir: str) -> str:
+    """Scratch working directory holding copies of the data files the app reads"""
+    sandbox = tempfile.mkdtemp(prefix='budget-gm-load-')
+    for name in SANDBOX_FILES:
+        path = os.path.join(source_dir, name)
+        if os.path.exists(path):
+            shutil.copy(path, sandbox)
+    if os.path.isdir(os.path.join(source_dir, 'cache')):
+        shutil.copytree(os.path.join(source_dir, 'cache'), os.path.join(sandbox, 'cache'))
+    return sandbox
+
+def seed_challenge(seed: int) -> None:
+    """Generate today's challenge in the sandbox from the run's seed, so every run gets the same roster"""
+    from models import get_challenge
+    random.seed(seed)
+    get_challenge(datetime.now().strftime('%Y-%m-%d'))
+
+def print_report(report: Dict) -> None:
+    print(f"{report['requests']} requests in {report['duration_s']}s: "
+          f"{report['throughput_rps']} req/s, {report['users_per_s']} users/s")
+    header = f"{'route':<18}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses"
+    print(header)
+    print('-' * len(header))
+    for route, row in report['routes'].items():
+        print(f"{route:<18}{row['requests']:>7}{row['errors']:>8}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+              f"{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}  {row['statuses']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay synthetic user flows against the app')
+    parser.add_argument('--url', help='base URL of a running server (default: run the app in-process)')
+    parser.add_argument('--users', type=int, default=200, help='number of synthetic users')
+    parser.add_argument('--concurrency', type=int, default=16, help='users in flight at once')
+    parser.add_argument('--rate', type=float, default=0, help='user arrivals per second (0: as fast as possible)')
+    parser.add_argument('--clients', type=int, default=0,
+                        help='client addresses the users share in-process (default: one per user)')
+    parser.add_argument('--seed', type=int, default=1, help="seed for user names, lineups and today's roster")
+    parser.add_argument('--run-id', default=None, help='tag for synthetic user names (default: timestamp)')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        source_dir = os.path.dirname(os.path.abspath(__file__))
+        sys.path.insert(0, source_dir)
+        os.chdir(prepare_sandbox(source_dir))
+        os.environ.setdefault('ADMISSION_STATE_FILE', os.path.join(os.getcwd(), 'admission.state'))
+        os.environ.setdefault('METRICS_DIR', os.path.join(os.getcwd(), 'metrics'))
+        client = InProcessClient()
+        seed_challenge(args.seed)
+
+    run_id = args.run_id or datetime.now().strftime('%Y%m%d%H%M%S')
+    report = LoadTest(client, args.users, args.concurrency, args.rate, args.seed, run_id, args.clients).run()
+    print_report(report)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
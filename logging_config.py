@@ -0,0 +1,170 @@
+"""
+Logging setup shared by the app and the command line tools.
+configure() installs a handler on the root logger that only appends records to
+an in-memory queue; a background OS thread formats and writes them, so logging
+from a request (or a gevent greenlet) never blocks on the output stream.
+INFO and DEBUG records are rate limited per logger so a hot path cannot flood
+the output, and records are written as one JSON object per line unless
+LOG_FORMAT=text.
+
+Modules only create their logger with logging.getLogger(__name__); entry
+points (the app, CLIs) call configure() once.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_RATE_LIMIT = float(os.environ.get('LOG_RATE_LIMIT', 50))  # INFO/DEBUG records per second per logger
+LOG_RATE_BURST = float(os.environ.get('LOG_RATE_BURST', 200))
+LOG_FLUSH_INTERVAL = 0.05  # Seconds between queue drains
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+try:
+    from gevent import monkey as _monkey
+    # Real OS thread and sleep even after gevent has patched the process
+    _start_new_thread = _monkey.get_original('_thread', 'start_new_thread')
+    _sleep = _monkey.get_original('time', 'sleep')
+except ImportError:
+    import _thread
+    _start_new_thread = _thread.start_new_thread
+    _sleep = time.sleep
+
+_pump = None
+_json_output = True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        suppressed = getattr(record, 'suppressed', None)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per logger for records below WARNING; dropped records are counted
+    and reported on the next record that gets through"""
+
+    def __init__(self, rate: float = LOG_RATE_LIMIT, burst: float = LOG_RATE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, list] = {}  # logger name -> [tokens, last refill, dropped]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        bucket = self._buckets.get(record.name)
+        now = record.created
+        if bucket is None:
+            bucket = self._buckets[record.name] = [self.burst, now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+class DequeHandler(logging.Handler):
+    """Appends records to a deque; formatting and I/O happen on the pump thread"""
+
+    def __init__(self, records: deque):
+        super().__init__()
+        self.records = records
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # No handler lock needed: deque.append is atomic
+        if self.filter(record):
+            self.emit(record)
+            return True
+        return False
+
+class _Pump:
+    """Drains the record deque into the real handlers on an OS thread"""
+
+    def __init__(self, handlers):
+        self.records = deque()
+        self.handlers = handlers
+        self.running = True
+        _start_new_thread(self._run, ())
+
+    def drain(self) -> None:
+        records = self.records
+        while records:
+            record = records.popleft()
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def _run(self) -> None:
+        while self.running:
+            try:
+                self.drain()
+            except Exception:
+                pass
+            _sleep(LOG_FLUSH_INTERVAL)
+
+def _output_handler(json_output: bool) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+def _install(level: int, json_output: bool) -> None:
+    global _pump, _json_output
+    _json_output = json_output
+    _pump = _Pump([_output_handler(json_output)])
+    queue_handler = DequeHandler(_pump.records)
+    queue_handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+def _after_fork_in_child() -> None:
+    # The pump thread does not survive fork; start a fresh one with an empty queue
+    if _pump is not None:
+        _install(logging.getLogger().level, _json_output)
+
+def flush() -> None:
+    """Write out everything queued so far"""
+    if _pump is not None:
+        _pump.drain()
+
+def configure(level: Optional[str] = None, json_output: Optional[bool] = None) -> None:
+    """Route all logging through the queue; later calls are no-ops"""
+    if _pump is not None:
+        return
+    level_value = getattr(logging, (level or LOG_LEVEL).upper(), logging.INFO)
+    _install(level_value, LOG_FORMAT != 'text' if json_output is None else json_output)
+    atexit.register(flush)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+    # Chatty third-party loggers
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    logging.getLogger('urllib3').setLevel(logging.WARNING)
@@ -0,0 +1,297 @@
+"""
+In-process metrics with a Prometheus text endpoint.
+Counters, gauges and fixed-bucket histograms are plain Python objects, so
+recording is a dict lookup and an add. Each worker periodically writes a
+snapshot to METRICS_DIR/<pid>.json; /metrics merges the snapshots of all
+workers. Counters and histograms of workers that have exited are folded into a
+single file so totals stay monotonic across worker restarts.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import time
+import logging
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+from file_store import atomic_write_json, file_lock
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'budget-gm-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+DEAD_WORKERS_FILE = os.path.join(METRICS_DIR, 'dead.json')
+# WSGI environ key marking internal requests (e.g. worker warm-up) that are not traffic
+UNCOUNTED_ENVIRON_KEY = 'budget_gm.uncounted'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}  # name -> metric
+_last_flush = 0.0
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        _registry[name] = self
+
+    def labels(self, *values):
+        """Child for one combination of label values (look it up once and keep it on hot paths)"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels()
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().value += amount
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+class Gauge(_Metric):
+    """Gauges are summed across live workers"""
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default().value = value
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return _registry.get(name) or Counter(name, documentation, labelnames)
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    return _registry.get(name) or Gauge(name, documentation, labelnames)
+
+def histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+    return _registry.get(name) or Histogram(name, documentation, labelnames, buckets)
+
+def timed(child: _HistogramChild):
+    """Decorator observing a function's wall time in seconds on a histogram child"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+# Metrics shared by the app's modules
+REQUEST_LATENCY = histogram('budget_gm_request_duration_seconds', 'Request latency by route', ('route', 'method'))
+REQUESTS = counter('budget_gm_requests_total', 'Requests by route and status', ('route', 'method', 'status'))
+SIMULATION_LATENCY = histogram('budget_gm_simulation_duration_seconds', 'TeamSimulator call latency', ('kind',))
+CHALLENGE_IO_LATENCY = histogram('budget_gm_challenge_io_duration_seconds', 'DailyChallenge load/save latency', ('op',))
+PLAYER_STATS_LATENCY = histogram('budget_gm_player_stats_duration_seconds', 'get_player_stats latency')
+CACHE_REQUESTS = counter('budget_gm_cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+
+def cache_counters(cache: str) -> Tuple[_CounterChild, _CounterChild]:
+    """(hit, miss) counter children for a named cache"""
+    return CACHE_REQUESTS.labels(cache, 'hit'), CACHE_REQUESTS.labels(cache, 'miss')
+
+# Snapshots and aggregation
+
+def snapshot() -> Dict:
+    """Current values of this process's metrics"""
+    metrics = {}
+    for name, metric in _registry.items():
+        samples = []
+        for labels, child in list(metric._children.items()):
+            if metric.kind == 'histogram':
+                samples.append([list(labels), list(child.counts), child.sum])
+            else:
+                samples.append([list(labels), child.value])
+        metrics[name] = {'kind': metric.kind, 'samples': samples}
+    return metrics
+
+def flush() -> None:
+    """Write this process's snapshot for other workers' /metrics"""
+    global _last_flush
+    _last_flush = time.monotonic()
+    try:
+        atomic_write_json(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), snapshot())
+    except OSError as e:
+        logger.error(f"Error writing metrics snapshot: {str(e)}")
+
+def maybe_flush() -> None:
+    """Flush if the last snapshot is older than METRICS_FLUSH_INTERVAL"""
+    if time.monotonic() - _last_flush >= METRICS_FLUSH_INTERVAL:
+        flush()
+
+def _read(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+def _merge(into: Dict, snap: Dict, include_gauges: bool = True) -> None:
+    for name, metric in snap.items():
+        if metric['kind'] == 'gauge' and not include_gauges:
+            continue
+        target = into.setdefault(name, {'kind': metric['kind'], 'samples': {}})['samples']
+        for sample in metric['samples']:
+            labels = tuple(sample[0])
+            if metric['kind'] == 'histogram':
+                counts, total = target.get(labels, ([0] * len(sample[1]), 0.0))
+                target[labels] = ([a + b for a, b in zip(counts, sample[1])], total + sample[2])
+            else:
+                target[labels] = target.get(labels, 0.0) + sample[1]
+
+def _to_snapshot(merged: Dict) -> Dict:
+    return {name: {'kind': m['kind'], 'samples': [
+        [list(labels), *(list(value) if m['kind'] == 'histogram' else [value])]
+        for labels, value in m['samples'].items()
+    ]} for name, m in merged.items()}
+
+def collect() -> Dict:
+    """Merge the snapshots of all workers, folding in those of exited workers"""
+    flush()
+    merged = {}
+    with file_lock(os.path.join(METRICS_DIR, '.lock')):
+        dead = _read(DEAD_WORKERS_FILE) or {}
+        dead_merged = {}
+        _merge(dead_merged, dead)
+        folded = False
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith('.json') or name == 'dead.json' or name.startswith('.'):
+                continue
+            pid = int(name[:-5])
+            snap = _read(os.path.join(METRICS_DIR, name))
+            if snap is None:
+                continue
+            if pid == os.getpid() or _pid_alive(pid):
+                _merge(merged, snap)
+            else:
+                _merge(dead_merged, snap, include_gauges=False)
+                os.remove(os.path.join(METRICS_DIR, name))
+                folded = True
+        if folded:
+            atomic_write_json(DEAD_WORKERS_FILE, _to_snapshot(dead_merged))
+    _merge(merged, _to_snapshot(dead_merged))
+    return merged
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Tuple[str, ...], values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def render() -> str:
+    """All workers' metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, data in sorted(collect().items()):
+        metric = _registry.get(name)
+        if metric is None:
+            continue
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(data['samples'].items()):
+            if metric.kind == 'histogram':
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(metric.buckets) + ['+Inf'], counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(metric.labelnames, labels, ('le', str(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(metric.labelnames, labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(metric.labelnames, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(metric.labelnames, labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+def init_app(app) -> None:
+    """Time every request by route and flush snapshots from the request path.
+    Requests whose environ carries UNCOUNTED_ENVIRON_KEY are not recorded."""
+    from flask import g, request
+
+    # Keep the last few seconds of a recycled worker's counts
+    atexit.register(flush)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None and not request.environ.get(UNCOUNTED_ENVIRON_KEY):
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(route, request.method).observe(time.perf_counter() - start)
+            REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        maybe_flush()
+        return response
@@ -0,0 +1,182 @@
+"""
+Micro-batching of concurrent simulation requests within a worker.
+The first request to arrive opens a batch and waits up to max_wait_ms for
+others to join (or until max_batch is reached), then runs the whole batch as
+one vectorized call and hands each caller its own result. Under gunicorn's
+gevent workers threading is monkeypatched, so waiting callers are greenlets.
+
+The wait shrinks when the p99 request latency goes over the configured budget
+and grows back towards max_wait_ms when there is headroom.
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SIM_BATCH_MAX_WAIT_MS = float(os.environ.get('SIM_BATCH_MAX_WAIT_MS', 2))
+SIM_BATCH_MAX_SIZE = int(os.environ.get('SIM_BATCH_MAX_SIZE', 64))
+SIM_BATCH_P99_BUDGET_MS = float(os.environ.get('SIM_BATCH_P99_BUDGET_MS', 50))
+LATENCY_WINDOW = 1000  # Requests kept for the percentile estimates
+ADJUST_EVERY = 50  # Batches between wait adjustments
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class _Pending:
+    __slots__ = ('item', 'result', 'error', 'done')
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class _Batch:
+    __slots__ = ('items', 'full')
+
+    def __init__(self):
+        self.items = []
+        self.full = threading.Event()
+
+class MicroBatcher:
+    """Collects items submitted concurrently and processes them in batches.
+    process_batch takes a list of items and returns a list of results in the same order."""
+
+    def __init__(self, process_batch: Callable[[List], List], max_wait_ms: float = SIM_BATCH_MAX_WAIT_MS,
+                 max_batch: int = SIM_BATCH_MAX_SIZE, p99_budget_ms: float = SIM_BATCH_P99_BUDGET_MS,
+                 name: str = 'batcher'):
+        self.process_batch = process_batch
+        self.max_wait_ms = max_wait_ms
+        self.max_batch = max(1, max_batch)
+        self.p99_budget_ms = p99_budget_ms
+        self.name = name
+        self.wait_ms = max_wait_ms
+        self._lock = threading.Lock()
+        self._open = None
+        self._request_ms = deque(maxlen=LATENCY_WINDOW)
+        self._batch_ms = deque(maxlen=LATENCY_WINDOW)
+        self._batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self._batches = 0
+        self._requests = 0
+
+    def submit(self, item):
+        """Process item as part of a batch and return its result (re-raising the batch's error)"""
+        start = time.perf_counter()
+        pending = _Pending(item)
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.items.append(pending)
+            if len(batch.items) >= self.max_batch:
+                # Close the batch so the next caller opens a new one
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            if self.wait_ms > 0:
+                batch.full.wait(self.wait_ms / 1000)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._run(batch.items)
+        else:
+            pending.done.wait()
+
+        self._request_ms.append((time.perf_counter() - start) * 1000)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self, pendings: List[_Pending]) -> None:
+        start = time.perf_counter()
+        try:
+            results = self.process_batch([p.item for p in pendings])
+            if len(results) != len(pendings):
+                raise RuntimeError(f"{self.name}: got {len(results)} results for {len(pendings)} items")
+            for pending, result in zip(pendings, results):
+                pending.result = result
+        except Exception as e:
+            logger.error(f"Error processing {self.name} batch of {len(pendings)}: {str(e)}")
+            for pending in pendings:
+                pending.error = e
+        finally:
+            for pending in pendings:
+                pending.done.set()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._batch_ms.append(elapsed_ms)
+        self._batch_sizes.append(len(pendings))
+        self._batches += 1
+        self._requests += len(pendings)
+        logger.debug(f"{self.name}: ran batch of {len(pendings)} in {elapsed_ms:.2f}ms")
+        if self._batches % ADJUST_EVERY == 0:
+            self._adjust_wait()
+
+    def _adjust_wait(self) -> None:
+        """Trade batching for latency when p99 is over budget, and back again when there is room"""
+        p99 = _percentile(list(self._request_ms), 99)
+        if p99 > self.p99_budget_ms and self.wait_ms > 0:
+            self.wait_ms = round(self.wait_ms / 2, 3) if self.wait_ms > 0.1 else 0.0
+            logger.info(f"{self.name}: p99 {p99:.1f}ms over budget, wait lowered to {self.wait_ms}ms")
+        elif p99 < self.p99_budget_ms / 2 and self.wait_ms < self.max_wait_ms:
+            self.wait_ms = min(self.max_wait_ms, max(self.wait_ms * 2, 0.1))
+
+    def stats(self) -> Dict:
+        """Configuration and recent latency/batch-size figures"""
+        request_ms = list(self._request_ms)
+        batch_ms = list(self._batch_ms)
+        sizes = list(self._batch_sizes)
+        return {
+            'name': self.name,
+            'max_wait_ms': self.max_wait_ms,
+            'current_wait_ms': self.wait_ms,
+            'max_batch': self.max_batch,
+            'p99_budget_ms': self.p99_budget_ms,
+            'batches': self._batches,
+            'requests': self._requests,
+            'avg_batch_size': round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            'max_batch_size': max(sizes) if sizes else 0,
+            'batch_ms_p50': round(_percentile(batch_ms, 50), 3),
+            'batch_ms_p99': round(_percentile(batch_ms, 99), 3),
+            'request_ms_p50': round(_percentile(request_ms, 50), 3),
+            'request_ms_p99': round(_percentile(request_ms, 99), 3)
+        }
+
+_season_batcher = None
+
+def _simulate_lineups(items: List) -> List[Dict]:
+    """Simulate (pool, lineup) items, one vectorized batch per roster index"""
+    import batch_simulator
+    groups = {}  # id(pool) -> (pool, positions of its items)
+    for position, (pool, _) in enumerate(items):
+        groups.setdefault(id(pool), (pool, []))[1].append(position)
+    results = [None] * len(items)
+    for pool, positions in groups.values():
+        lineups = [items[position][1] for position in positions]
+        for position, result in zip(positions, batch_simulator.simulate_batch(lineups, pool)):
+            results[position] = result
+    return results
+
+def get_season_batcher() -> MicroBatcher:
+    """Batcher for single-lineup season simulations, created on first use"""
+    global _season_batcher
+    if _season_batcher is None:
+        _season_batcher = MicroBatcher(_simulate_lineups, name='season')
+    return _season_batcher
+
+def simulate_season(lineup: List[str], pool) -> Dict:
+    """Simulate one lineup's season against pool (a challenge's roster index)
+    through the worker's shared batcher"""
+    result = get_season_batcher().submit((pool, lineup))
+    result.pop('index', None)
+    return result
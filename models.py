@@ -1,47 +1,190 @@
 import json
 import os
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Optional
 import logging
 import random
+from file_store import atomic_write_json, file_lock, file_stamp
+import json_provider
+import challenge_manifest
+import challenge_archive
+import user_history
+from lineups import lineup_id, lineup_slots, lineup_rating
+from metrics import CHALLENGE_IO_LATENCY, cache_counters, timed
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+CHALLENGE_DIR = 'data/challenges'
+PLAYER_POOL_FILE = 'player_pool.json'
+
+# Per-worker cache of loaded challenges, keyed by date and validated by file stat
+CHALLENGE_CACHE_SIZE = int(os.environ.get('CHALLENGE_CACHE_SIZE', 64))
+CHALLENGE_CACHE_MAX_BYTES = int(os.environ.get('CHALLENGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+_challenge_cache = OrderedDict()  # date -> (file stamp, DailyChallenge)
+_challenge_cache_bytes = 0
+_cache_hits, _cache_misses = cache_counters('challenge')
+
+def challenge_lock(date: str):
+    """Serialize writes of a date's challenge across workers.
+    Held on a sidecar file: atomic saves replace the challenge file itself."""
+    return file_lock(os.path.join(CHALLENGE_DIR, f".{date}.lock"))
+
+def load_pool_players(pool_file: str = PLAYER_POOL_FILE) -> List[Dict]:
+    """Load the pool as a flat player list (accepts both the flat and the tier-keyed layout)"""
+    with open(pool_file, 'rb') as f:
+        player_pool = json_provider.load(f)
+    if 'players' in player_pool:
+        return player_pool['players']
+    players = []
+    for tier in ['$5', '$4', '$3', '$2', '$1']:
+        players.extend(player_pool.get(tier, []))
+    return players
+
 class DailyChallenge:
-    def __init__(self, date: str):
+    def __init__(self, date: str, generate: bool = True):
         self.date = date
         self.players = []
         self.submissions = []
+        self._by_player = {}  # player name -> stored submission
+        self.lineups = {}  # lineup id -> {'slots', 'count', 'rating', 'record'}
+        self.archived = False
+        self._generate = generate
         self._load_challenge()
         
+    @property
+    def file_path(self) -> str:
+        return os.path.join(CHALLENGE_DIR, f"{self.date}.json")
+        
+    def exists(self) -> bool:
+        """Check if the challenge has been generated"""
+        return os.path.exists(self.file_path) or challenge_archive.get_frame_info(self.date) is not None
+        
+    @timed(CHALLENGE_IO_LATENCY.labels('load'))
     def _load_challenge(self):
         """Load challenge data from file"""
         try:
-            file_path = f"data/challenges/{self.date}.json"
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    self.players = data.get('players', [])
-                    self.submissions = data.get('submissions', [])
-            else:
+            if os.path.exists(self.file_path):
+                self._read_file()
+            elif self._read_archive():
+                pass
+            elif self._generate:
                 self._generate_new_challenge()
         except Exception as e:
             logger.error(f"Error loading challenge: {str(e)}")
-            self._generate_new_challenge()
+            if self._generate:
+                self._generate_new_challenge()
+            
+    def _read_file(self):
+        """Read players and submissions from the challenge file"""
+        with open(self.file_path, 'rb') as f:
+            self._apply_data(json_provider.load(f))
+            
+    def _read_archive(self) -> bool:
+        """Read the challenge from the monthly archive, if its month was archived"""
+        data = challenge_archive.read_archived_day(self.date)
+        if data is None:
+            return False
+        self._apply_data(data)
+        self.archived = True
+        return True
+            
+    def _apply_data(self, data: Dict):
+        self.players = data.get('players', [])
+        self.lineups = data.get('lineups', {})
+        self.submissions = [self._compact(sub) for sub in data.get('submissions', [])]
+        self._by_player = {}
+        for submission in self.submissions:
+            self._by_player.setdefault(submission.get('player_name'), submission)
+        
+    def _to_slots(self, team: List) -> Optional[List[int]]:
+        """Resolve a team (player dicts or names) to sorted slot indices in the challenge roster"""
+        slot_by_name = {player['name']: slot for slot, player in enumerate(self.players)}
+        slots = []
+        for player in team:
+            name = player.get('name') if isinstance(player, dict) else player
+            if name not in slot_by_name:
+                return None
+            slots.append(slot_by_name[name])
+        return sorted(slots)
+        
+    def _slot_cost(self, slot: int) -> int:
+        return int(str(self.players[slot].get('cost', '$1')).replace('$', ''))
+        
+    def _register_lineup(self, slots: List[int]) -> str:
+        """Get the canonical id of a lineup, adding a reference to its shared entry"""
+        lineup = lineup_id(slots)
+        entry = self.lineups.get(lineup)
+        if entry is None:
+            entry = {'slots': sorted(slots), 'count': 0, 'rating': lineup_rating(self.players, slots)}
+            self.lineups[lineup] = entry
+        entry['count'] += 1
+        return lineup
+        
+    def _compact(self, submission: Dict) -> Dict:
+        """Store a submission's team as a reference to a shared lineup instead of full player dicts"""
+        if 'lineup' in submission:
+            return submission
+        if 'slots' in submission:
+            slots = submission['slots']
+        elif 'team' in submission:
+            slots = self._to_slots(submission['team'])
+            if slots is None:
+                # Team does not match the roster (legacy data), keep it as is
+                return submission
+        else:
+            return submission
+        compact = {key: value for key, value in submission.items() if key not in ('team', 'slots')}
+        compact['lineup'] = self._register_lineup(slots)
+        return compact
+        
+    def _rehydrate(self, submission: Dict) -> Dict:
+        """Expand a stored submission back into the full team view"""
+        if 'lineup' not in submission:
+            return submission
+        entry = self.lineups.get(submission['lineup'])
+        slots = entry['slots'] if entry else lineup_slots(submission['lineup'])
+        hydrated = dict(submission)
+        hydrated['team'] = [self.players[slot] for slot in slots]
+        return hydrated
+        
+    def get_lineup_record(self, team: List) -> Optional[Dict]:
+        """Season record already simulated for this lineup, if anyone submitted it"""
+        slots = self._to_slots(team)
+        if slots is None:
+            return None
+        entry = self.lineups.get(lineup_id(slots))
+        return entry.get('record') if entry else None
+        
+    def get_popular_lineups(self, limit: int = 10) -> List[Dict]:
+        """Most submitted lineups with their shared rating"""
+        popular = sorted(self.lineups.items(), key=lambda item: item[1]['count'], reverse=True)[:limit]
+        return [{
+            'lineup': lineup,
+            'count': entry['count'],
+            'rating': entry['rating'],
+            'players': [self.players[slot]['name'] for slot in entry['slots']]
+        } for lineup, entry in popular]
             
     def _generate_new_challenge(self):
         """Generate a new daily challenge"""
+        # Generation is serialized across workers so concurrent first requests
+        # of a day all end up with the same challenge
+        with file_lock(os.path.join(CHALLENGE_DIR, '.generate.lock')):
+            if os.path.exists(self.file_path):
+                try:
+                    self._read_file()
+                    return
+                except Exception as e:
+                    logger.error(f"Error reading challenge generated by another worker: {str(e)}")
+            self._generate_locked()
+            
+    def _generate_locked(self):
         try:
-            logger.info("Starting to generate new challenge...")
+            logger.debug("Starting to generate new challenge...")
             # Load player pool
-            with open('player_pool.json', 'r') as f:
-                player_pool = json.load(f)
-                logger.info(f"Loaded player pool with {len(player_pool['players'])} players")
+            pool_players = load_pool_players()
+            logger.debug(f"Loaded player pool with {len(pool_players)} players")
                 
             # Select players from each category
             categories = ['5', '4', '3', '2', '1']
@@ -49,15 +192,15 @@ class DailyChallenge:
             
             # Group players by cost
             players_by_cost = {}
-            for player in player_pool['players']:
+            for player in pool_players:
                 cost = player['cost'].replace('$', '')
                 if cost not in players_by_cost:
                     players_by_cost[cost] = []
                 players_by_cost[cost].append(player)
             
-            logger.info("Players grouped by cost:")
+            logger.debug("Players grouped by cost:")
             for cost, players in players_by_cost.items():
-                logger.info(f"${cost}: {len(players)} players")
+                logger.debug(f"${cost}: {len(players)} players")
             
             # Select players from each category
             for category in categories:
@@ -65,15 +208,18 @@ class DailyChallenge:
                 if players:
                     selected = random.sample(players, min(5, len(players)))
                     selected_players.extend(selected)
-                    logger.info(f"Selected {len(selected)} players from ${category} category")
+                    logger.debug(f"Selected {len(selected)} players from ${category} category")
                     
             self.players = selected_players
             self.submissions = []
+            self._by_player = {}
+            self.lineups = {}
             
             logger.info(f"Generated challenge with {len(self.players)} total players")
             
-            # Save the new challenge
+            # Save the new challenge and list its date
             self._save_challenge()
+            challenge_manifest.record_challenge(self.date, self.submissions)
             logger.info(f"Challenge saved for date {self.date}")
             
         except Exception as e:
@@ -81,55 +227,85 @@ class DailyChallenge:
             logger.exception("Full traceback:")
             self.players = []
             self.submissions = []
+            self._by_player = {}
+            self.lineups = {}
             
+    @timed(CHALLENGE_IO_LATENCY.labels('save'))
     def _save_challenge(self):
         """Save challenge data to file"""
         try:
-            os.makedirs('data/challenges', exist_ok=True)
-            file_path = f"data/challenges/{self.date}.json"
-            
             data = {
                 'date': self.date,
                 'players': self.players,
+                'lineups': self.lineups,
                 'submissions': self.submissions
             }
             
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            atomic_write_json(self.file_path, data)
+            _remember_challenge(self)
                 
         except Exception as e:
             logger.error(f"Error saving challenge: {str(e)}")
+            raise
+            
+    def _append_submission(self, submission: Dict) -> Optional[Dict]:
+        """Append a submission to the stored challenge; returns it as stored, or None
+        if the player already submitted. The file is reloaded under the date's lock
+        and the new submission saved from that copy, so submissions from other
+        workers are never overwritten and loaded (cached) instances never change."""
+        with challenge_lock(self.date):
+            current = DailyChallenge(self.date, generate=False)
+            if not current.players:
+                raise IOError(f"Challenge for {self.date} could not be reloaded")
+            if current.get_player_submission(submission['player_name']):
+                logger.warning(f"{submission['player_name']} already submitted for {self.date}")
+                return None
+            stored = current._compact(submission)
+            entry = current.lineups.get(stored.get('lineup'))
+            if entry is not None and 'record' in stored:
+                # Identical lineups share the season simulated for the first of them
+                stored['record'] = entry.setdefault('record', stored['record'])
+            current.submissions.append(stored)
+            current._by_player[stored['player_name']] = stored
+            current._save_challenge()
+        # Derived indexes only once the submission is safely on disk
+        user_history.record_submission(self.date, stored, current.submissions)
+        challenge_manifest.record_submission(self.date, stored)
+        return stored
             
-    def submit_team(self, player_name: str, team: List[Dict], record: Dict) -> bool:
-        """Submit a team for the challenge"""
+    def submit_team(self, player_name: str, team: List[Dict], record: Dict) -> Optional[Dict]:
+        """Submit a team for the challenge; returns the stored submission, whose record is
+        the lineup's shared one if it was submitted before, or None if it was not accepted
+        (invalid, or the player already submitted)"""
         try:
             # Validate team
             if len(team) != 5:
                 logger.error(f"Invalid team size: {len(team)}")
-                return False
+                return None
+                
+            # Resolve players to roster slots
+            slots = self._to_slots(team)
+            if slots is None or len(set(slots)) != 5:
+                logger.error("Team contains players that are not in the challenge")
+                return None
                 
             # Calculate total cost
-            total_cost = sum(player.get('cost', 0) for player in team)
+            total_cost = sum(self._slot_cost(slot) for slot in slots)
             if total_cost > 15:  # $15 budget
                 logger.error(f"Team exceeds budget: ${total_cost}")
-                return False
+                return None
                 
-            # Add submission
-            submission = {
-                'player_name': player_name,
-                'team': team,
-                'record': record,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            self.submissions.append(submission)
-            self._save_challenge()
-            
-            return True
-            
         except Exception as e:
             logger.error(f"Error submitting team: {str(e)}")
-            return False
+            return None
+            
+        # Add submission; a failed save raises rather than reading as an invalid team
+        return self._append_submission({
+            'player_name': player_name,
+            'slots': slots,
+            'record': record,
+            'timestamp': datetime.now().isoformat()
+        })
             
     def get_leaderboard(self) -> List[Dict]:
         """Get the challenge leaderboard"""
@@ -141,7 +317,7 @@ class DailyChallenge:
                 reverse=True
             )
             
-            return sorted_submissions
+            return [self._rehydrate(submission) for submission in sorted_submissions]
             
         except Exception as e:
             logger.error(f"Error getting leaderboard: {str(e)}")
@@ -150,10 +326,8 @@ class DailyChallenge:
     def get_player_submission(self, player_name: str) -> Optional[Dict]:
         """Get a player's submission"""
         try:
-            for submission in self.submissions:
-                if submission['player_name'] == player_name:
-                    return submission
-            return None
+            submission = self._by_player.get(player_name)
+            return self._rehydrate(submission) if submission else None
             
         except Exception as e:
             logger.error(f"Error getting player submission: {str(e)}")
@@ -161,17 +335,14 @@ class DailyChallenge:
     
     def add_submission(self, player_name, team, record):
         """Add a player submission to the challenge"""
-        submission = {
+        submission = self._append_submission({
             'player_name': player_name,
             'team': team,
             'record': record,
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        self.submissions.append(submission)
-        self._save_challenge()
+        })
         
-        return submission
+        return self._rehydrate(submission) if submission else None
     
     def calculate_percentile(self, player_name, record):
         """Calculate the percentile rank of a player's submission"""
@@ -226,24 +397,63 @@ class DailyChallenge:
     
     def get_available_dates(self):
         """Get a list of all available challenge dates"""
-        challenge_dir = 'data/challenges'
-        if not os.path.exists(challenge_dir):
-            return []
-        
-        dates = []
-        for filename in os.listdir(challenge_dir):
-            if filename.endswith('.json'):
-                date = filename.replace('.json', '')
-                dates.append(date)
-        
-        return sorted(dates, reverse=True)
+        return challenge_manifest.list_dates()
     
     def get_challenge_by_date(self, date):
         """Get a challenge by date"""
-        challenge_file = f'data/challenges/{date}.json'
+        challenge_file = os.path.join(CHALLENGE_DIR, f'{date}.json')
         if not os.path.exists(challenge_file):
-            return None
+            return challenge_archive.read_archived_day(date)
         
         with open(challenge_file, 'r') as f:
             data = json.load(f)
-            return data 
\ No newline at end of file
+            return data
+
+def _challenge_stamp(challenge: DailyChallenge) -> Optional[tuple]:
+    """Version of a loaded challenge; archived days use their month file and frame size"""
+    if challenge.archived and not os.path.exists(challenge.file_path):
+        return challenge_archive.archive_stamp(challenge.date)
+    return file_stamp(challenge.file_path)
+
+def _forget_challenge(date: str) -> None:
+    global _challenge_cache_bytes
+    entry = _challenge_cache.pop(date, None)
+    if entry is not None:
+        _challenge_cache_bytes -= entry[0][1]
+
+def _remember_challenge(challenge: DailyChallenge) -> None:
+    """Store a loaded challenge in the cache, evicting least recently used entries over the caps"""
+    global _challenge_cache_bytes
+    stamp = _challenge_stamp(challenge)
+    _forget_challenge(challenge.date)
+    if stamp is None:
+        return
+    _challenge_cache[challenge.date] = (stamp, challenge)
+    _challenge_cache_bytes += stamp[1]
+    while _challenge_cache and (len(_challenge_cache) > CHALLENGE_CACHE_SIZE
+                                or _challenge_cache_bytes > CHALLENGE_CACHE_MAX_BYTES):
+        _forget_challenge(next(iter(_challenge_cache)))
+
+def get_challenge(date: str, generate: bool = True) -> DailyChallenge:
+    """Get a challenge through the per-worker cache.
+    Every date is revalidated with a stat of its file: past days still change when
+    a day is closed, restored or archived again, or edited by hand.
+    The returned instance is shared: treat it as read-only. Writes go through
+    submit_team/add_submission, which save a freshly loaded copy and cache that."""
+    entry = _challenge_cache.get(date)
+    if entry is not None:
+        stamp, challenge = entry
+        if _challenge_stamp(challenge) == stamp:
+            _challenge_cache.move_to_end(date)
+            _cache_hits.value += 1
+            return challenge
+    _cache_misses.value += 1
+    challenge = DailyChallenge(date, generate=generate)
+    _remember_challenge(challenge)
+    return challenge
+
+def clear_challenge_cache():
+    """Clear the challenge cache"""
+    global _challenge_cache_bytes
+    _challenge_cache.clear()
+    _challenge_cache_bytes = 0
@@ -0,0 +1,243 @@
+"""
+Local stand-in for the stats.nba.com endpoints the ingest tools use.
+Serves leaguedashplayerstats, commonallplayers, playercareerstats and
+commonplayerinfo in the upstream's resultSets format, built from the recorded
+league dump in cache/player_stats.json. Positions come from the existing pool.
+Responses carry an ETag and honour If-None-Match. Latency, error rate and a
+rate limit (429 with Retry-After) are configurable, and request counts per
+endpoint and status are served at /stub/stats.
+
+Run it and point the fetchers at it:
+    python nba_stub_server.py --port 8765 --latency-ms 40 --error-rate 0.02 --rate-limit 20
+    NBA_STATS_BASE_URL=http://127.0.0.1:8765/stats python player_ingest.py
+"""
+
+import argparse
+import hashlib
+import math
+import random
+import threading
+import time
+import logging
+import logging_config
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import json_provider
+from bulk_pool_builder import load_join_data, load_rows
+
+logger = logging.getLogger(__name__)
+
+SOURCE_FILE = 'cache/player_stats.json'
+DEFAULT_PORT = 8765
+SEASON_ID = '2024-25'  # Season of the recorded dump
+CAREER_HEADERS = ['PLAYER_ID', 'SEASON_ID', 'LEAGUE_ID', 'TEAM_ID', 'TEAM_ABBREVIATION', 'PLAYER_AGE', 'GP', 'GS',
+                  'MIN', 'FGM', 'FGA', 'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'FTM', 'FTA', 'FT_PCT', 'OREB', 'DREB',
+                  'REB', 'AST', 'STL', 'BLK', 'TOV', 'PF', 'PTS']
+# Per-game columns of the dump that playercareerstats reports as season totals
+TOTAL_COLUMNS = {'MIN', 'FGM', 'FGA', 'FG3M', 'FG3A', 'FTM', 'FTA', 'OREB', 'DREB', 'REB', 'AST', 'STL', 'BLK',
+                 'TOV', 'PF', 'PTS'}
+INFO_HEADERS = ['PERSON_ID', 'DISPLAY_FIRST_LAST', 'TEAM_ID', 'TEAM_ABBREVIATION', 'POSITION', 'ROSTERSTATUS']
+ALL_PLAYERS_HEADERS = ['PERSON_ID', 'DISPLAY_FIRST_LAST', 'ROSTERSTATUS', 'TEAM_ID', 'TEAM_ABBREVIATION']
+
+def _envelope(resource: str, parameters: Dict, name: str, headers: List[str], rows: List[List]) -> bytes:
+    return json_provider.dumps_bytes({
+        'resource': resource,
+        'parameters': parameters,
+        'resultSets': [{'name': name, 'headers': headers, 'rowSet': rows}]
+    })
+
+class RecordedData:
+    """Pre-built response bodies for every recorded player"""
+
+    def __init__(self, source: str = SOURCE_FILE, pool_files: Optional[List[str]] = None):
+        rows = load_rows(source)
+        positions, _ = load_join_data(pool_files if pool_files is not None else ['player_pool.json'])
+        self.rows = {row['PLAYER_ID']: row for row in rows}
+        league_headers = list(rows[0].keys()) if rows else []
+        self.league = _envelope('leaguedashplayerstats', {'PerMode': 'PerGame', 'Season': SEASON_ID},
+                                'LeagueDashPlayerStats', league_headers,
+                                [[row.get(h) for h in league_headers] for row in rows])
+        self.all_players = _envelope('commonallplayers', {'IsOnlyCurrentSeason': 1}, 'CommonAllPlayers',
+                                     ALL_PLAYERS_HEADERS,
+                                     [[row['PLAYER_ID'], row['PLAYER_NAME'], 1, row.get('TEAM_ID'),
+                                       row.get('TEAM_ABBREVIATION')] for row in rows])
+        self.career = {}
+        self.info = {}
+        for player_id, row in self.rows.items():
+            season = dict(row, SEASON_ID=SEASON_ID, LEAGUE_ID='00', PLAYER_AGE=row.get('AGE'), GS=0)
+            values = [round((season.get(h) or 0) * (row.get('GP') or 0), 1) if h in TOTAL_COLUMNS else season.get(h)
+                      for h in CAREER_HEADERS]
+            self.career[player_id] = _envelope('playercareerstats', {'PlayerID': player_id, 'PerMode': 'Totals'},
+                                               'SeasonTotalsRegularSeason', CAREER_HEADERS, [values])
+            self.info[player_id] = _envelope('commonplayerinfo', {'PlayerID': player_id}, 'CommonPlayerInfo',
+                                             INFO_HEADERS,
+                                             [[player_id, row['PLAYER_NAME'], row.get('TEAM_ID'),
+                                               row.get('TEAM_ABBREVIATION'), positions.get(row['PLAYER_NAME'], ''), 1]])
+        self.empty_career = _envelope('playercareerstats', {}, 'SeasonTotalsRegularSeason', CAREER_HEADERS, [])
+
+    def body(self, endpoint: str, query: Dict[str, List[str]]) -> Optional[bytes]:
+        if endpoint == 'leaguedashplayerstats':
+            return self.league
+        if endpoint == 'commonallplayers':
+            return self.all_players
+        try:
+            player_id = int(query.get('PlayerID', [''])[0])
+        except ValueError:
+            return None
+        if endpoint == 'playercareerstats':
+            return self.career.get(player_id, self.empty_career)
+        if endpoint == 'commonplayerinfo':
+            return self.info.get(player_id)
+        return None
+
+class StubServer:
+    """Threaded HTTP stand-in; start() it in-process or run this module"""
+
+    def __init__(self, data: Optional[RecordedData] = None, host: str = '127.0.0.1', port: int = 0,
+                 latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0.0,
+                 rate_limit: float = 0.0, burst: Optional[float] = None, seed: Optional[int] = None):
+        self.data = data or RecordedData()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst if burst is not None else max(1.0, rate_limit)
+        self.counts = Counter()  # (endpoint, status) -> requests
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._etags = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/stats"
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            requests = {}
+            for (endpoint, status), count in sorted(self.counts.items()):
+                requests.setdefault(endpoint, {})[str(status)] = count
+            return {'total': sum(self.counts.values()), 'requests': requests}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+
+    def _admit(self) -> Tuple[bool, int]:
+        """Take a rate-limit token; returns (allowed, seconds to retry after)"""
+        if self.rate_limit <= 0:
+            return True, 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate_limit)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True, 0
+            return False, max(1, math.ceil((1 - self._tokens) / self.rate_limit))
+
+    def _count(self, endpoint: str, status: int) -> None:
+        with self._lock:
+            self.counts[(endpoint, status)] += 1
+
+    def _etag(self, body: bytes) -> str:
+        etag = self._etags.get(id(body))
+        if etag is None:
+            etag = self._etags[id(body)] = '"' + hashlib.sha1(body).hexdigest() + '"'
+        return etag
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real upstream
+            # Headers and body go out in separate writes; without this, Nagle plus delayed ACKs add ~40ms each
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b'', headers: Optional[Dict] = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == '/stub/stats':
+                    return self._send(200, json_provider.dumps_bytes(stub.stats()),
+                                      {'Content-Type': 'application/json'})
+                if parsed.path == '/stub/reset':
+                    stub.reset()
+                    return self._send(204)
+
+                endpoint = parsed.path.rsplit('/', 1)[-1].lower()
+                allowed, retry_after = stub._admit()
+                if not allowed:
+                    stub._count(endpoint, 429)
+                    return self._send(429, headers={'Retry-After': str(retry_after)})
+                delay = stub.latency_ms + (stub._rng.uniform(-stub.jitter_ms, stub.jitter_ms) if stub.jitter_ms else 0)
+                if delay > 0:
+                    time.sleep(delay / 1000)
+                if stub.error_rate and stub._rng.random() < stub.error_rate:
+                    stub._count(endpoint, 500)
+                    return self._send(500)
+
+                body = stub.data.body(endpoint, parse_qs(parsed.query))
+                if body is None:
+                    stub._count(endpoint, 404)
+                    return self._send(404)
+                etag = stub._etag(body)
+                if self.headers.get('If-None-Match') == etag:
+                    stub._count(endpoint, 304)
+                    return self._send(304, headers={'ETag': etag})
+                stub._count(endpoint, 200)
+                self._send(200, body, {'Content-Type': 'application/json', 'ETag': etag})
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded NBA stats responses locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--source', default=SOURCE_FILE, help='recorded leaguedashplayerstats dump')
+    parser.add_argument('--latency-ms', type=float, default=0, help='added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='uniform +/- jitter on the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests per second before 429s (0: none)')
+    parser.add_argument('--burst', type=float, help='requests allowed at once (default: one second of rate)')
+    parser.add_argument('--seed', type=int, help='seed for latency jitter and injected errors')
+    args = parser.parse_args()
+
+    server = StubServer(RecordedData(args.source), args.host, args.port, args.latency_ms, args.jitter_ms,
+                        args.error_rate, args.rate_limit, args.burst, args.seed)
+    logger.info(f"Serving {len(server.data.rows)} recorded players at {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
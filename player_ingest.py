@@ -0,0 +1,264 @@
+"""
+Concurrent, rate limited and resumable refresh of per-player NBA stats.
+A bounded pool of worker threads fetches each active player's career totals
+and player info. All workers share one token bucket, so the combined request
+rate never goes over INGEST_RATE. Every finished player is appended to a JSONL
+checkpoint right away. An interrupted run picks up exactly where it stopped,
+and failed players are retried on the next run. The player pool file is
+rewritten from the checkpoint at the end.
+
+Where the data comes from is pluggable: anything with active_players(),
+career_stats(player_id) and player_info(player_id) returning stats.nba.com
+style JSON will do. With --base-url (or NBA_STATS_BASE_URL) set, requests go
+straight to that server through the shared pooled session (HttpFetcher), e.g.
+the local stand-in in nba_stub_server.py; otherwise through nba_api.
+
+Usage:
+    python player_ingest.py --workers 8 --rate 4
+    python player_ingest.py --fresh --out raw_player_pool.json
+    python player_ingest.py --base-url http://127.0.0.1:8765/stats
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import logging
+import logging_config
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from file_store import atomic_write_json
+from player_scraper import build_player_record
+from http_session import HTTP_MAX_RETRIES, current_season, request_json, result_rows
+
+logger = logging.getLogger(__name__)
+
+INGEST_RATE = float(os.environ.get('INGEST_RATE', 4))  # Requests per second across all workers
+INGEST_BURST = float(os.environ.get('INGEST_BURST', 1))
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 8))
+INGEST_MAX_RETRIES = int(os.environ.get('INGEST_MAX_RETRIES', 3))
+INGEST_TIMEOUT = 30
+CHECKPOINT_FILE = 'data/ingest/players.jsonl'
+OUTPUT_FILE = 'raw_player_pool.json'
+DONE_STATUSES = ('ok', 'empty')  # 'failed' players are fetched again on the next run
+
+class RateLimiter:
+    """Token bucket shared by all worker threads.
+    Callers reserve a token and sleep until it is theirs, so requests go out in
+    arrival order and never faster than rate per second after the initial burst."""
+
+    def __init__(self, rate: float = INGEST_RATE, burst: float = INGEST_BURST):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+class NBAApiFetcher:
+    """Fetches from stats.nba.com through nba_api"""
+
+    def __init__(self, timeout: int = INGEST_TIMEOUT):
+        self.timeout = timeout
+
+    def active_players(self) -> List[Dict]:
+        import nba_api.stats.static.players as nba_players
+        return nba_players.get_active_players()
+
+    def career_stats(self, player_id: int) -> Dict:
+        from nba_api.stats.endpoints import playercareerstats
+        return playercareerstats.PlayerCareerStats(player_id=player_id, timeout=self.timeout).get_dict()
+
+    def player_info(self, player_id: int) -> Dict:
+        from nba_api.stats.endpoints import commonplayerinfo
+        return commonplayerinfo.CommonPlayerInfo(player_id=player_id, timeout=self.timeout).get_dict()
+
+class HttpFetcher:
+    """Fetches the stats endpoints directly through the shared pooled session"""
+
+    def __init__(self, base_url: str, timeout: int = INGEST_TIMEOUT, season: Optional[str] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.season = season or current_season()
+
+    def _get(self, endpoint: str, params: Dict, max_retries: int = 0) -> Dict:
+        # Per-player requests are retried by fetch_player, which takes a rate-limit token per attempt
+        data, _ = request_json(f"{self.base_url}/{endpoint}", params=params, timeout=self.timeout,
+                               max_retries=max_retries)
+        return data
+
+    def active_players(self) -> List[Dict]:
+        rows = result_rows(self._get('commonallplayers', {'LeagueID': '00', 'Season': self.season,
+                                                          'IsOnlyCurrentSeason': 1}, HTTP_MAX_RETRIES))
+        return [{'id': row['PERSON_ID'], 'full_name': row['DISPLAY_FIRST_LAST']}
+                for row in rows if row.get('ROSTERSTATUS', 1)]
+
+    def career_stats(self, player_id: int) -> Dict:
+        return self._get('playercareerstats', {'PlayerID': player_id, 'PerMode': 'Totals', 'LeagueID': '00'})
+
+    def player_info(self, player_id: int) -> Dict:
+        return self._get('commonplayerinfo', {'PlayerID': player_id, 'LeagueID': ''})
+
+class Checkpoint:
+    """Append-only JSONL log of finished players; the last entry per player wins"""
+
+    def __init__(self, path: str = CHECKPOINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[int, Dict]:
+        entries = {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by an interrupted write
+                        continue
+                    entries[entry['player_id']] = entry
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def reset(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def record(self, entry: Dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._file = open(self.path, 'a')
+                # Never append onto a partial line left by a killed run
+                if self._file.tell() > 0:
+                    with open(self.path, 'rb') as existing:
+                        existing.seek(-1, os.SEEK_END)
+                        if existing.read(1) != b'\n':
+                            self._file.write('\n')
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def fetch_player(fetcher, limiter: RateLimiter, player: Dict, max_retries: int = INGEST_MAX_RETRIES) -> Dict:
+    """Checkpoint entry for one player; transient errors are retried with backoff"""
+    entry = {'player_id': player['id'], 'full_name': player.get('full_name')}
+    for attempt in range(max_retries + 1):
+        try:
+            limiter.acquire()
+            career_df = pd.DataFrame(result_rows(fetcher.career_stats(player['id']), 'SeasonTotalsRegularSeason'))
+            if career_df.empty:
+                # No season played: nothing to build, and no need for the info request
+                entry.update(status='empty', player=None)
+                break
+            limiter.acquire()
+            info_df = pd.DataFrame(result_rows(fetcher.player_info(player['id']), 'CommonPlayerInfo'))
+            entry.update(status='ok', player=build_player_record(career_df, info_df))
+            break
+        except Exception as e:
+            if attempt == max_retries:
+                logger.error(f"Giving up on {player.get('full_name')} ({player['id']}): {str(e)}")
+                entry.update(status='failed', error=str(e))
+            else:
+                time.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random()))
+    entry['fetched_at'] = datetime.now().isoformat()
+    return entry
+
+def ingest(fetcher, players: Iterable[Dict], checkpoint: Checkpoint, limiter: Optional[RateLimiter] = None,
+           workers: int = INGEST_WORKERS, max_retries: int = INGEST_MAX_RETRIES) -> Dict[str, int]:
+    """Fetch every player not yet done in the checkpoint; returns counts by status"""
+    limiter = limiter or RateLimiter()
+    done = checkpoint.load()
+    players = list(players)
+    pending = [p for p in players if done.get(p['id'], {}).get('status') not in DONE_STATUSES]
+    counts = {'skipped': len(players) - len(pending), 'ok': 0, 'empty': 0, 'failed': 0}
+    logger.info(f"Fetching {len(pending)} players with {workers} workers at {limiter.rate} req/s "
+                f"({counts['skipped']} already done)")
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = [executor.submit(fetch_player, fetcher, limiter, player, max_retries) for player in pending]
+    recorded = set()
+    try:
+        for finished, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            checkpoint.record(entry)
+            recorded.add(future)
+            counts[entry['status']] += 1
+            if finished % 25 == 0:
+                elapsed = time.perf_counter() - start
+                logger.info(f"{finished}/{len(pending)} players in {elapsed:.0f}s")
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; players in flight are finished and checkpointed, the rest on the next run")
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        for future in futures:
+            if future not in recorded and not future.cancelled() and future.exception() is None:
+                checkpoint.record(future.result())
+        raise
+    finally:
+        executor.shutdown(wait=True)
+        checkpoint.close()
+    return counts
+
+def write_pool(players: List[Dict], checkpoint: Checkpoint, out: str = OUTPUT_FILE) -> int:
+    """Write the fetched player entries, in active-player order, to the pool file"""
+    done = checkpoint.load()
+    pool = [done[p['id']]['player'] for p in players
+            if done.get(p['id'], {}).get('status') == 'ok' and done[p['id']].get('player')]
+    atomic_write_json(out, pool, pretty=True)
+    return len(pool)
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh per-player NBA stats concurrently and resumably')
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS, help='concurrent fetches')
+    parser.add_argument('--rate', type=float, default=INGEST_RATE, help='requests per second across all workers')
+    parser.add_argument('--burst', type=float, default=INGEST_BURST, help='requests allowed at once after idling')
+    parser.add_argument('--retries', type=int, default=INGEST_MAX_RETRIES, help='retries per player')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help='JSONL checkpoint to resume from')
+    parser.add_argument('--out', default=OUTPUT_FILE, help='player pool file to write')
+    parser.add_argument('--limit', type=int, help='only the first N active players')
+    parser.add_argument('--fresh', action='store_true', help='discard the checkpoint and fetch everything')
+    parser.add_argument('--base-url', default=os.environ.get('NBA_STATS_BASE_URL'),
+                        help='stats server to fetch from directly instead of through nba_api')
+    args = parser.parse_args()
+
+    fetcher = HttpFetcher(args.base_url) if args.base_url else NBAApiFetcher()
+    players = fetcher.active_players()
+    if args.limit:
+        players = players[:args.limit]
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.fresh:
+        checkpoint.reset()
+
+    start = time.perf_counter()
+    counts = ingest(fetcher, players, checkpoint, RateLimiter(args.rate, args.burst), args.workers, args.retries)
+    written = write_pool(players, checkpoint, args.out)
+    logger.info(f"Done in {time.perf_counter() - start:.1f}s: {counts}; wrote {written} players to {args.out}")
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
@@ -6,6 +6,9 @@ import json
 import random
 import os
 from datetime import datetime, timedelta
+from models import PLAYER_POOL_FILE, load_pool_players
+
+SNAPSHOT_FILE = 'static_pool_snapshot.json'  # Pool built from the static players when player_pool.json is missing
 
 class PlayerPool:
     def __init__(self):
@@ -16,32 +19,26 @@ class PlayerPool:
         
     def _load_player_pool(self):
         """
-        Load the player pool from JSON file.
-        If the file doesn't exist or is older than 24 hours, rebuild it.
+        Load the player pool from player_pool.json, in either the flat or the
+        tier-keyed layout. The file belongs to the pool builders (bulk_pool_builder,
+        player_ingest) and is never rewritten here; only if it is missing or
+        unreadable is a pool built from the static players.
         """
         try:
-            # Check if file exists and is from today
-            if os.path.exists('player_pool.json'):
-                file_timestamp = datetime.fromtimestamp(os.path.getmtime('player_pool.json'))
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                
-                if file_timestamp >= today:
-                    print("Using today's cached player pool...")
-                    with open('player_pool.json', 'r') as f:
-                        data = json.load(f)
-                        player_pool = data['players']
+            if os.path.exists(PLAYER_POOL_FILE):
+                player_pool = load_pool_players(PLAYER_POOL_FILE)
+                    
+                # Convert JSON data to internal format
+                for player_data in player_pool:
+                    player_name = player_data['name']
+                    cost = int(player_data['cost'].replace('$', ''))
+                    self.players[player_name] = {'cost': cost}
+                    self.player_stats[player_name] = pd.Series(player_data['stats'])
                         
-                    # Convert JSON data to internal format
-                    for player_data in player_pool:
-                        player_name = player_data['name']
-                        cost = int(player_data['cost'].replace('$', ''))
-                        self.players[player_name] = {'cost': cost}
-                        self.player_stats[player_name] = pd.Series(player_data['stats'])
-                            
-                    print(f"Loaded {len(self.players)} players from today's pool")
-                    return
+                print(f"Loaded {len(self.players)} players from {PLAYER_POOL_FILE}")
+                return
                 
-            print("Player pool not found or outdated. Building new pool...")
+            print("Player pool not found. Building new pool...")
             self._build_player_pool()
             
         except Exception as e:
@@ -84,16 +81,16 @@ class PlayerPool:
                 print(f"Error processing player: {str(e)}")
                 continue
         
-        # Save to JSON file with timestamp
+        # Save to its own snapshot file: player_pool.json belongs to the pool builders
         data = {
             'timestamp': datetime.now().isoformat(),
             'players': player_pool
         }
         
-        with open('player_pool.json', 'w') as f:
+        with open(SNAPSHOT_FILE, 'w') as f:
             json.dump(data, f, indent=2)
         
-        print("\nPlayer pool saved to player_pool.json")
+        print(f"\nPlayer pool saved to {SNAPSHOT_FILE}")
         print("Category counts:")
         for cost, players in categorized_players.items():
             print(f"${cost}: {len(players)} players")
@@ -1,11 +1,8 @@
-import nba_api.stats.static.players as nba_players
-from nba_api.stats.endpoints import playercareerstats
-from nba_api.stats.endpoints import commonplayerinfo
-import time
-import json
-
 def get_player_stats(player_id):
     """Get detailed stats for a specific player"""
+    # nba_api is only needed for live fetches; the formulas below are shared with the ingest tools
+    from nba_api.stats.endpoints import playercareerstats
+    from nba_api.stats.endpoints import commonplayerinfo
     try:
         # Get career stats
         career_stats = playercareerstats.PlayerCareerStats(player_id=player_id)
@@ -15,40 +12,45 @@ def get_player_stats(player_id):
         player_info = commonplayerinfo.CommonPlayerInfo(player_id=player_id)
         player_info_df = player_info.get_data_frames()[0]
         
-        # Get the most recent season's stats
-        if not career_stats_df.empty:
-            recent_stats = career_stats_df.iloc[-1]
-            
-            # Calculate player rating based on stats (simplified version)
-            rating = calculate_player_rating(recent_stats)
-            
-            # Create stats dictionary with safe value access
-            stats_dict = {
-                'pts': safe_float(recent_stats, 'PTS'),
-                'ast': safe_float(recent_stats, 'AST'),
-                'reb': safe_float(recent_stats, 'REB'),
-                'stl': safe_float(recent_stats, 'STL'),
-                'blk': safe_float(recent_stats, 'BLK'),
-                'fg_pct': safe_float(recent_stats, 'FG_PCT') * 100,
-                'ts_pct': calculate_ts_pct(recent_stats),
-                'gp': int(safe_float(recent_stats, 'GP')),
-                '3pt_pct': safe_float(recent_stats, 'FG3_PCT') * 100,
-                'ft_pct': safe_float(recent_stats, 'FT_PCT') * 100,
-                'tov': safe_float(recent_stats, 'TOV')
-            }
-            
-            return {
-                'name': player_info_df['DISPLAY_FIRST_LAST'].iloc[0],
-                'position': player_info_df['POSITION'].iloc[0],
-                'team': player_info_df['TEAM_ABBREVIATION'].iloc[0],
-                'rating': rating,
-                'stats': stats_dict,
-                '3_season_avg': calculate_3_season_avg(career_stats_df)
-            }
+        return build_player_record(career_stats_df, player_info_df)
     except Exception as e:
         print(f"Error getting stats for player {player_id}: {str(e)}")
         return None
 
+def build_player_record(career_stats_df, player_info_df):
+    """Player entry from the career totals and player info frames, or None without any season"""
+    # Get the most recent season's stats
+    if not career_stats_df.empty:
+        recent_stats = career_stats_df.iloc[-1]
+        
+        # Calculate player rating based on stats (simplified version)
+        rating = calculate_player_rating(recent_stats)
+        
+        # Create stats dictionary with safe value access
+        stats_dict = {
+            'pts': safe_float(recent_stats, 'PTS'),
+            'ast': safe_float(recent_stats, 'AST'),
+            'reb': safe_float(recent_stats, 'REB'),
+            'stl': safe_float(recent_stats, 'STL'),
+            'blk': safe_float(recent_stats, 'BLK'),
+            'fg_pct': safe_float(recent_stats, 'FG_PCT') * 100,
+            'ts_pct': calculate_ts_pct(recent_stats),
+            'gp': int(safe_float(recent_stats, 'GP')),
+            '3pt_pct': safe_float(recent_stats, 'FG3_PCT') * 100,
+            'ft_pct': safe_float(recent_stats, 'FT_PCT') * 100,
+            'tov': safe_float(recent_stats, 'TOV')
+        }
+        
+        return {
+            'name': player_info_df['DISPLAY_FIRST_LAST'].iloc[0],
+            'position': player_info_df['POSITION'].iloc[0],
+            'team': player_info_df['TEAM_ABBREVIATION'].iloc[0],
+            'rating': rating,
+            'stats': stats_dict,
+            '3_season_avg': calculate_3_season_avg(career_stats_df)
+        }
+    return None
+
 def safe_float(stats, key):
     """Safely get a float value from stats, return 0.0 if not found or invalid"""
     try:
@@ -118,39 +120,11 @@ def calculate_3_season_avg(career_stats):
         return None
 
 def main():
-    # Get all active NBA players
-    active_players = nba_players.get_active_players()
-    
-    player_pool = []
-    start_processing = False
-    
-    print(f"Found {len(active_players)} active players")
-    
-    for player in active_players:
-        # Start processing after Domantas Sabonis
-        if not start_processing:
-            if player['full_name'] == 'Domantas Sabonis':
-                start_processing = True
-                continue
-        
-        if start_processing:
-            print(f"Processing {player['full_name']}...")
-            player_stats = get_player_stats(player['id'])
-            
-            if player_stats:
-                # Remove the cost field since we'll calculate that later
-                if 'cost' in player_stats:
-                    del player_stats['cost']
-                player_pool.append(player_stats)
-            
-            # Add delay to avoid rate limiting
-            time.sleep(0.6)
-    
-    # Save the player pool to a file
-    with open('raw_player_pool_part3.json', 'w') as f:
-        json.dump(player_pool, f, indent=4)
-    
-    print(f"Saved {len(player_pool)} players to raw_player_pool_part3.json")
+    # Fetching all active players concurrently, rate limited and resumable, lives in player_ingest
+    import player_ingest
+    player_ingest.main()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    import logging_config
+    logging_config.configure()
+    main()
@@ -8,19 +8,16 @@ import os
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
-from .static_player_pool import get_static_player_pool
+from static_player_pool import get_static_player_pool
+from metrics import PLAYER_STATS_LATENCY, cache_counters, timed
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Cache for player stats
 _player_stats_cache = {}
 _last_cache_update = 0
 CACHE_DURATION = 3600  # 1 hour in seconds
+_cache_hits, _cache_misses = cache_counters('player_stats')
 
 PLAYER_STATS = {
     'Nikola Jokic': {
@@ -235,12 +232,15 @@ PLAYER_STATS = {
     }
 }
 
+@timed(PLAYER_STATS_LATENCY.labels())
 def get_player_stats(player_name: str) -> Optional[Dict]:
     """Get stats for a specific player with caching"""
     try:
         # Check cache first
         if player_name in _player_stats_cache:
+            _cache_hits.value += 1
             return _player_stats_cache[player_name]
+        _cache_misses.value += 1
             
         # Get from static player pool
         player_pool = get_static_player_pool()
@@ -0,0 +1,318 @@
+"""
+On-demand request profiling.
+A request is profiled when it is picked by PROFILE_SAMPLE_RATE or carries an
+X-Profile-Token header matching PROFILE_TOKEN. Profiles are written to
+PROFILE_DIR in collapsed-stack format (one "frame;frame;frame count" line per
+stack), which flamegraph.pl, speedscope and inferno read directly, and are
+listed in PROFILE_DIR/index.jsonl with their route and duration. Profiles older
+than PROFILE_MAX_AGE_DAYS, and all but the newest PROFILE_MAX_FILES, are
+pruned as new ones are written.
+
+The default 'sample' mode uses a SIGPROF interval timer, so the overhead is a
+stack walk per interval of CPU time. Where signals cannot be used (requests
+served off the main thread) the 'trace' mode records every call with
+sys.setprofile and weights stacks by microseconds instead. Only one request
+per worker is profiled at a time; in sample mode, other greenlets that run
+meanwhile show up in its profile under their own stacks.
+
+Aggregate a route's profiles over a window:
+    python request_profiler.py --route /api/submit --since 1h --out submit.folded
+List profiled routes: python request_profiler.py --list
+Prune old profiles now: python request_profiler.py --prune
+"""
+
+import argparse
+import hmac
+import json
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import logging
+import logging_config
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from file_store import atomic_write_bytes, file_lock
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_INDEX = os.path.join(PROFILE_DIR, 'index.jsonl')
+PROFILE_LOCK = os.path.join(PROFILE_DIR, '.lock')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'sample')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.001))  # Seconds of CPU time between samples
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 1000))
+PROFILE_MAX_AGE_DAYS = float(os.environ.get('PROFILE_MAX_AGE_DAYS', 7))
+PRUNE_EVERY = 50  # Profiles a worker writes between prunes
+MAX_DEPTH = 128
+
+_active = None  # The profiler currently running in this worker
+_written = 0  # Profiles this worker has written
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class SamplingProfiler:
+    """Samples the running stack on SIGPROF (main thread only)"""
+
+    unit = 'samples'
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._previous = None
+
+    def _handle(self, signum, frame):
+        self.stacks[_collapse(frame)] += 1
+
+    def start(self) -> None:
+        self._previous = signal.signal(signal.SIGPROF, self._handle)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+class TracingProfiler:
+    """Records every call of the current thread, weighting stacks by microseconds"""
+
+    unit = 'us'
+
+    def __init__(self):
+        self.stacks = Counter()
+        self._stack = []
+        self._last = 0.0
+
+    def _account(self) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            self.stacks[';'.join(self._stack)] += int((now - self._last) * 1e6)
+        self._last = now
+
+    def _handle(self, frame, event, arg):
+        if event in ('call', 'c_call'):
+            self._account()
+            label = _frame_label(frame.f_code) if event == 'call' else f"{getattr(arg, '__qualname__', arg)}"
+            self._stack.append(label)
+        elif event in ('return', 'c_return', 'c_exception') and self._stack:
+            self._account()
+            self._stack.pop()
+
+    def start(self) -> None:
+        self._last = time.perf_counter()
+        sys.setprofile(self._handle)
+
+    def stop(self) -> None:
+        sys.setprofile(None)
+        self._account()
+
+def _new_profiler():
+    if PROFILE_MODE == 'sample' and threading.current_thread() is threading.main_thread() and hasattr(signal, 'setitimer'):
+        return SamplingProfiler()
+    return TracingProfiler()
+
+def _slug(route: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+
+def write_profile(stacks: Counter, route: str, method: str, duration_ms: float, unit: str) -> Optional[str]:
+    """Write one request's collapsed stacks and index it; returns the file name"""
+    global _written
+    if not stacks:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now()
+    name = f"{stamp.strftime('%Y%m%d-%H%M%S-%f')}_{_slug(route)}_{int(duration_ms)}ms_{os.getpid()}.folded"
+    with open(os.path.join(PROFILE_DIR, name), 'w') as f:
+        for stack, count in stacks.most_common():
+            if count:
+                f.write(f"{stack} {count}\n")
+    entry = {
+        'file': name,
+        'route': route,
+        'method': method,
+        'duration_ms': round(duration_ms, 2),
+        'timestamp': stamp.isoformat(),
+        'unit': unit,
+        'samples': sum(stacks.values())
+    }
+    # Appends share the lock prune_profiles rewrites the index under
+    with file_lock(PROFILE_LOCK):
+        with open(PROFILE_INDEX, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    if _written % PRUNE_EVERY == 0:
+        prune_profiles()
+    _written += 1
+    return name
+
+def prune_profiles(max_files: int = PROFILE_MAX_FILES, max_age_days: float = PROFILE_MAX_AGE_DAYS) -> int:
+    """Delete profiles older than max_age_days and all but the newest max_files; returns how many"""
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+    with file_lock(PROFILE_LOCK):
+        entries = read_index()
+        kept = [entry for entry in entries if entry['timestamp'] >= cutoff]
+        kept = kept[-max_files:] if max_files > 0 else []
+        if len(kept) == len(entries):
+            return 0
+        kept_files = {entry['file'] for entry in kept}
+        for entry in entries:
+            if entry['file'] not in kept_files:
+                try:
+                    os.remove(os.path.join(PROFILE_DIR, entry['file']))
+                except FileNotFoundError:
+                    pass
+        atomic_write_bytes(PROFILE_INDEX, ''.join(json.dumps(entry) + '\n' for entry in kept).encode())
+    logger.info(f"Pruned {len(entries) - len(kept)} profile(s)")
+    return len(entries) - len(kept)
+
+def should_profile(headers) -> bool:
+    if PROFILE_TOKEN and hmac.compare_digest(headers.get('X-Profile-Token', '').encode(), PROFILE_TOKEN.encode()):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def init_app(app) -> None:
+    """Profile sampled or token-authorized requests around the whole handler"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        global _active
+        if _active is not None or not should_profile(request.headers):
+            return
+        profiler = _new_profiler()
+        try:
+            profiler.start()
+        except (ValueError, OSError) as e:
+            logger.error(f"Could not start profiler: {str(e)}")
+            return
+        _active = profiler
+        g.profile = (profiler, time.perf_counter())
+
+    def _finish(profiler, start, route, method, response=None):
+        global _active
+        profiler.stop()
+        _active = None
+        try:
+            name = write_profile(profiler.stacks, route, method, (time.perf_counter() - start) * 1000, profiler.unit)
+            if name and response is not None:
+                response.headers['X-Profile-Id'] = name
+        except OSError as e:
+            logger.error(f"Error writing profile: {str(e)}")
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        profiler, start = profile
+        route = request.url_rule.rule if request.url_rule else request.path
+        method = request.method
+        if response.is_streamed:
+            # Streamed bodies do their work while being sent; keep profiling until then
+            response.call_on_close(lambda: _finish(profiler, start, route, method))
+        else:
+            _finish(profiler, start, route, method, response)
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc=None):
+        # Handlers that raised never reach after_request
+        global _active
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile[0].stop()
+            _active = None
+
+# Aggregation
+
+def read_index(route: Optional[str] = None, since: Optional[datetime] = None,
+               until: Optional[datetime] = None) -> List[Dict]:
+    """Profiles in the index, optionally for one route within a time window"""
+    entries = []
+    try:
+        with open(PROFILE_INDEX, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if route and entry['route'] != route:
+                    continue
+                stamp = datetime.fromisoformat(entry['timestamp'])
+                if (since and stamp < since) or (until and stamp > until):
+                    continue
+                entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return entries
+
+def aggregate(entries: List[Dict]) -> Counter:
+    """Sum the collapsed stacks of several profiles"""
+    stacks = Counter()
+    for entry in entries:
+        try:
+            with open(os.path.join(PROFILE_DIR, entry['file']), 'r') as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        stacks[stack] += int(count)
+        except (FileNotFoundError, ValueError):
+            continue
+    return stacks
+
+def _parse_since(value: str) -> datetime:
+    units = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+    match = re.fullmatch(r'(\d+)([smhd])', value)
+    if match:
+        return datetime.now() - timedelta(**{units[match.group(2)]: int(match.group(1))})
+    return datetime.fromisoformat(value)
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate request profiles into one collapsed-stack file')
+    parser.add_argument('--route', help='route rule, e.g. /api/challenge/<date>')
+    parser.add_argument('--since', help='window start: ISO time or age like 30m, 2h, 1d')
+    parser.add_argument('--until', help='window end (ISO time)')
+    parser.add_argument('--out', help='write the aggregated stacks here (default: stdout)')
+    parser.add_argument('--list', action='store_true', help='summarize profiled routes instead')
+    parser.add_argument('--prune', action='store_true', help='delete profiles past the retention limits instead')
+    args = parser.parse_args()
+
+    if args.prune:
+        print(f"Pruned {prune_profiles()} profile(s)")
+        return
+
+    entries = read_index(args.route, _parse_since(args.since) if args.since else None,
+                         datetime.fromisoformat(args.until) if args.until else None)
+    if args.list:
+        by_route = {}
+        for entry in entries:
+            by_route.setdefault((entry['method'], entry['route']), []).append(entry['duration_ms'])
+        for (method, route), durations in sorted(by_route.items()):
+            print(f"{method:<6}{route:<45}{len(durations):>6} profiles  avg {sum(durations) / len(durations):8.1f}ms"
+                  f"  max {max(durations):8.1f}ms")
+        return
+
+    stacks = aggregate(entries)
+    lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        print(f"Aggregated {len(entries)} profile(s) into {args.out}")
+    else:
+        print('\n'.join(lines))
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
@@ -0,0 +1,146 @@
+"""
+Cache of final response bytes for read-mostly endpoints.
+Each entry holds the serialized JSON body plus gzip and (when brotli is
+installed) brotli variants, so hot responses skip serialization and
+compression entirely. Entries are keyed by endpoint, view arguments, the query
+arguments the view declares, the mtime and size of the data files it declares
+and the data generation: rewriting a source file invalidates its responses in
+every worker on the next request, and unknown query arguments cannot add
+entries.
+"""
+
+import gzip
+import hashlib
+import os
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Iterable, Union
+from flask import Response, request
+from werkzeug.datastructures import Accept
+import json_provider
+from file_store import file_stamp
+from metrics import cache_counters
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+MIN_COMPRESS_SIZE = 512  # Bodies smaller than this are not worth compressing
+
+_cache = OrderedDict()  # key -> CachedResponse
+_generation = 0
+_cache_hits, _cache_misses = cache_counters('response')
+
+class CachedResponse:
+    __slots__ = ('body', 'gzip', 'br', 'etag')
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.gzip = gzip.compress(body, compresslevel=6, mtime=0)
+            self.br = brotli.compress(body) if brotli else None
+        else:
+            self.gzip = None
+            self.br = None
+
+def get_generation() -> int:
+    """Current data generation; part of every cache key"""
+    return _generation
+
+def bump_generation() -> None:
+    """Invalidate all cached responses, e.g. after the player pool was refreshed"""
+    global _generation
+    _generation += 1
+    _cache.clear()
+
+def _serialize(data) -> bytes:
+    return json_provider.dumps_bytes(data)
+
+def _get_entry(key, build):
+    entry = _cache.get(key)
+    if entry is not None:
+        _cache.move_to_end(key)
+        _cache_hits.value += 1
+        return entry
+    _cache_misses.value += 1
+    data = build()
+    if isinstance(data, Response) or isinstance(data, tuple):
+        # Errors and custom responses are passed through uncached
+        return data
+    entry = CachedResponse(data if isinstance(data, bytes) else _serialize(data))
+    _cache[key] = entry
+    while len(_cache) > RESPONSE_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return entry
+
+def _etag_matches(etag: str) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+
+def _quality(accept: Accept, coding: str) -> float:
+    """Quality the client gives a content coding; its own entry overrides '*'"""
+    for value, quality in accept:
+        if value.lower() == coding:
+            return quality
+    return accept['*']
+
+def make_response(entry: CachedResponse, max_age: int) -> Response:
+    """Build the response for a cached entry, negotiating encoding and conditional requests"""
+    headers = {
+        'ETag': entry.etag,
+        'Cache-Control': f'public, max-age={max_age}',
+        'Vary': 'Accept-Encoding'
+    }
+    if _etag_matches(entry.etag):
+        return Response(status=304, headers=headers)
+
+    # q=0 means "not acceptable"; between brotli and gzip the client's preference wins, then brotli
+    br = _quality(request.accept_encodings, 'br') if entry.br is not None else 0
+    gz = _quality(request.accept_encodings, 'gzip') if entry.gzip is not None else 0
+    body = entry.body
+    if br > 0 and br >= gz:
+        body = entry.br
+        headers['Content-Encoding'] = 'br'
+    elif gz > 0:
+        body = entry.gzip
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, status=200, mimetype='application/json', headers=headers)
+
+def cached_json(max_age: int = 300, sources: Union[Iterable[str], Callable, None] = None,
+                args: Iterable[str] = ()):
+    """Cache a view's JSON output.
+    The view returns plain data (or already serialized JSON bytes) on success;
+    Response objects and (body, status) tuples are returned uncached.
+    sources lists the data files the view reads, or is a function of the view's
+    arguments returning them; args names the query arguments it reads."""
+    args = tuple(args)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*view_args, **kwargs):
+            paths = sources(**kwargs) if callable(sources) else (sources or ())
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple((name, tuple(request.args.getlist(name))) for name in args),
+                tuple(file_stamp(path) for path in paths),
+                _generation
+            )
+            entry = _get_entry(key, lambda: view(*view_args, **kwargs))
+            if not isinstance(entry, CachedResponse):
+                return entry
+            return make_response(entry, max_age)
+        return wrapper
+    return decorator
+
+def clear_cache():
+    """Clear all cached responses"""
+    _cache.clear()
@@ -6,14 +6,10 @@ import sys
 import time
 from typing import Dict, List, Optional
 import logging
-from .player_stats import get_player_stats, get_all_player_stats
-from .static_player_pool import get_static_player_pool, get_players_by_cost
+import logging_config
+from player_stats import get_player_stats, get_all_player_stats
+from static_player_pool import get_static_player_pool, get_players_by_cost
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 def load_player_pool():
@@ -104,7 +100,7 @@ class TeamBuilder:
             self.players.append(player_name)
             self.positions[position] += 1
             
-            logger.info(f"Added {player_name} to the team")
+            logger.debug(f"Added {player_name} to the team")
             return True
             
         except Exception as e:
@@ -127,7 +123,7 @@ class TeamBuilder:
             self.players.remove(player_name)
             self.positions[player_data['position']] -= 1
             
-            logger.info(f"Removed {player_name} from the team")
+            logger.debug(f"Removed {player_name} from the team")
             return True
             
         except Exception as e:
@@ -347,4 +343,5 @@ def build_team():
         print(f"{i}. {player['name']} ({player['cost']})")
 
 if __name__ == "__main__":
+    logging_config.configure()
     build_team() 
\ No newline at end of file
@@ -4,15 +4,12 @@ import numpy as np
 import random
 import math
 import logging
+import logging_config
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 from player_stats import get_player_stats, get_player_3_season_avg
+from metrics import SIMULATION_LATENCY, timed
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class Player:
@@ -135,6 +132,7 @@ class TeamSimulator:
             logger.error(f"Error calculating team rating: {str(e)}")
             return 0.0
             
+    @timed(SIMULATION_LATENCY.labels('game'))
     def simulate_game(self, team1: List[str], team2: List[str]) -> Dict:
         """Simulate a game between two teams"""
         try:
@@ -173,6 +171,7 @@ class TeamSimulator:
             logger.error(f"Error simulating game: {str(e)}")
             return {}
             
+    @timed(SIMULATION_LATENCY.labels('season'))
     def simulate_season(self, teams: Dict[str, List[str]], games_per_team: int = 82) -> Dict:
         """Simulate a full season for all teams"""
         try:
@@ -317,4 +316,5 @@ def simulate():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    logging_config.configure()
     app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,57 @@
+import logging
+import logging_config
+import pytest
+import admission
+from admission import take_tokens
+
+logger = logging.getLogger(__name__)
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    monkeypatch.setattr(admission, 'ADMISSION_STATE_FILE', str(tmp_path / 'admission'))
+    monkeypatch.setattr(admission, '_state', None)
+    fake = Clock()
+    monkeypatch.setattr(admission.time, 'time', fake)
+    yield fake
+    admission._state[1].close()
+
+def test_bucket_refills_at_rate(clock):
+    assert [take_tokens('ip:a', rate=2, burst=3)[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = take_tokens('ip:a', rate=2, burst=3)
+    assert not allowed and retry_after == pytest.approx(0.5)
+
+    # Half a second refills one token at 2/s
+    clock.now += 0.5
+    assert take_tokens('ip:a', rate=2, burst=3)[0]
+    assert not take_tokens('ip:a', rate=2, burst=3)[0]
+
+    # A denied request takes nothing, so the wait it was told is still enough
+    clock.now += 0.25
+    assert not take_tokens('ip:a', rate=2, burst=3)[0]
+    clock.now += 0.25
+    assert take_tokens('ip:a', rate=2, burst=3)[0]
+
+def test_refill_is_capped_at_burst(clock):
+    for _ in range(3):
+        take_tokens('ip:a', rate=2, burst=3)
+    clock.now += 3600
+    assert [take_tokens('ip:a', rate=2, burst=3)[0] for _ in range(4)] == [True, True, True, False]
+
+def test_clients_have_separate_buckets(clock):
+    for _ in range(3):
+        take_tokens('ip:a', rate=2, burst=3)
+    assert not take_tokens('ip:a', rate=2, burst=3)[0]
+    assert take_tokens('ip:b', rate=2, burst=3)[0]
+    allowed, retry_after = take_tokens('ip:c', cost=5, rate=2, burst=3)
+    assert not allowed and retry_after == pytest.approx(1.0)
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
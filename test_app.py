@@ -0,0 +1,115 @@
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime
+import logging
+import logging_config
+import pytest
+
+# Limiter and metrics state of the test run only
+_state_dir = tempfile.mkdtemp(prefix='budget-gm-test-')
+os.environ.setdefault('ADMISSION_STATE_FILE', os.path.join(_state_dir, 'admission.state'))
+os.environ.setdefault('METRICS_DIR', os.path.join(_state_dir, 'metrics'))
+
+import app as app_module
+import models
+import response_cache
+
+logger = logging.getLogger(__name__)
+
+POOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'player_pool.json')
+TIERS = ['$5', '$4', '$3', '$2', '$1']
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client over a scratch data directory holding a copy of the player pool"""
+    shutil.copy(POOL_FILE, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    models.clear_challenge_cache()
+    response_cache.clear_cache()
+    random.seed(7)
+    return app_module.app.test_client()
+
+def _today() -> str:
+    return datetime.now().strftime('%Y-%m-%d')
+
+def _roster(client):
+    response = client.get(f"/api/challenge/{_today()}")
+    assert response.status_code == 200
+    return response.get_json()['players']
+
+def _lineup(roster):
+    """A $15 lineup from the roster: its best player of each tier"""
+    return [next(p['name'] for p in roster if p['cost'] == tier) for tier in TIERS]
+
+def test_simulate_team_uses_challenge_roster(client):
+    lineup = _lineup(_roster(client))
+    response = client.post('/api/simulate-team', json={'players': lineup})
+    assert response.status_code == 200, response.get_json()
+    result = response.get_json()
+    assert result['wins'] + result['losses'] == 82 and result['total_cost'] == 15
+
+    # Another date's roster is resolved against that date's challenge
+    response = client.post('/api/simulate-team', json={'players': lineup, 'date': '2024-01-15'})
+    assert response.status_code == 404
+    off_roster = next(p['name'] for p in models.load_pool_players() if p['name'] not in lineup
+                      and p['name'] not in {q['name'] for q in _roster(client)})
+    response = client.post('/api/simulate-team', json={'players': lineup[:4] + [off_roster]})
+    assert response.status_code == 400
+    assert off_roster in response.get_json()['error']
+
+def test_submit_roster_lineup(client):
+    lineup = _lineup(_roster(client))
+    response = client.post('/api/submit', json={'player_name': 'alice', 'players': lineup})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['success'] and body['date'] == _today()
+    assert body['record']['wins'] + body['record']['losses'] == 82
+
+    response = client.get('/api/check_submission?player_name=alice')
+    assert response.status_code == 200
+
+    # Same lineup from another user reuses the lineup's simulated season
+    response = client.post('/api/submit', json={'player_name': 'bob', 'players': lineup})
+    assert response.status_code == 200
+    assert response.get_json()['record'] == body['record']
+
+def test_submit_duplicate_is_409(client):
+    lineup = _lineup(_roster(client))
+    assert client.post('/api/submit', json={'player_name': 'alice', 'players': lineup}).status_code == 200
+    response = client.post('/api/submit', json={'player_name': 'alice', 'players': lineup})
+    assert response.status_code == 409
+
+    # Also when another worker stored the submission after this one loaded the challenge
+    models.DailyChallenge(_today(), generate=False).submit_team('carol', lineup, {'wins': 41, 'losses': 41})
+    response = client.post('/api/submit', json={'player_name': 'carol', 'players': lineup})
+    assert response.status_code == 409
+    stored = models.DailyChallenge(_today(), generate=False).submissions
+    assert [s['player_name'] for s in stored] == ['alice', 'carol']
+
+def test_submit_rejects_invalid_teams(client):
+    roster = _roster(client)
+    response = client.post('/api/submit', json={'player_name': 'dave', 'players': _lineup(roster)[:4]})
+    assert response.status_code == 400
+    over_budget = [p['name'] for p in roster if p['cost'] == '$5'][:5]
+    response = client.post('/api/submit', json={'player_name': 'dave', 'players': over_budget})
+    assert response.status_code == 400
+    assert client.post('/api/submit', json={'players': _lineup(roster)}).status_code == 400
+
+def test_validate_team_checks_roster(client):
+    roster = _roster(client)
+    lineup = _lineup(roster)
+    response = client.post('/api/validate-team', json={'players': [{'name': n} for n in lineup]})
+    assert response.status_code == 200
+    assert response.get_json() == {'valid': True, 'total_cost': 15, 'remaining_budget': 0}
+
+    roster_names = {p['name'] for p in roster}
+    off_roster = next(p['name'] for p in models.load_pool_players() if p['name'] not in roster_names)
+    response = client.post('/api/validate-team', json={'players': lineup[:4] + [off_roster]})
+    assert response.status_code == 400
+    assert off_roster in response.get_json()['error']
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
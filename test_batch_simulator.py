@@ -0,0 +1,78 @@
+import random
+import shutil
+import logging
+import logging_config
+import numpy as np
+from batch_simulator import get_roster_index, simulate_batch, simulate_seasons
+from models import DailyChallenge
+from team_simulator import TeamSimulator
+
+logger = logging.getLogger(__name__)
+
+TIERS = ['$5', '$4', '$3', '$2', '$1']
+
+def _challenge(directory, monkeypatch, date='2024-01-15'):
+    """A challenge generated from the repo's player pool in a scratch directory"""
+    shutil.copy('player_pool.json', directory)
+    monkeypatch.chdir(directory)
+    random.seed(7)
+    return DailyChallenge(date)
+
+def _scalar_simulator(challenge) -> TeamSimulator:
+    # TeamSimulator looks players up by name; point it at the roster's stats
+    simulator = TeamSimulator()
+    for player in challenge.players:
+        simulator._player_stats_cache[player['name']] = player
+    return simulator
+
+def test_roster_index_is_keyed_by_date(tmp_path, monkeypatch):
+    challenge = _challenge(tmp_path, monkeypatch)
+    pool = get_roster_index(challenge)
+    assert pool.names == [p['name'] for p in challenge.players]
+    assert get_roster_index(challenge) is pool
+
+    other = DailyChallenge('2024-01-16')
+    assert get_roster_index(other).names == [p['name'] for p in other.players]
+    assert get_roster_index(challenge) is pool
+
+    # Names off the day's roster do not resolve
+    outsider = next(p['name'] for p in other.players if p['name'] not in pool.index)
+    lineup = [p['name'] for p in challenge.players[:4]] + [outsider]
+    result = next(simulate_batch([lineup], pool))
+    assert result['error'] == f"Player {outsider} not found in pool"
+
+def test_vectorized_matches_scalar(tmp_path, monkeypatch):
+    challenge = _challenge(tmp_path, monkeypatch)
+    pool = get_roster_index(challenge)
+    simulator = _scalar_simulator(challenge)
+    by_tier = {tier: [p['name'] for p in challenge.players if p['cost'] == tier] for tier in TIERS}
+    everyone = [p['name'] for p in challenge.players]
+
+    # $15 lineups, one player per tier like the opponents, so win rates land mid-range
+    rng = random.Random(3)
+    lineups = [[rng.choice(by_tier[tier] or everyone) for tier in TIERS] for _ in range(4)]
+    results = list(simulate_batch(lineups, pool, seed=1))
+    random.seed(11)
+    np_rng = np.random.default_rng(5)
+    for lineup, result in zip(lineups, results):
+        # Same team rating as the scalar model (which rounds each player to 0.1)
+        assert abs(result['team_rating'] - simulator.calculate_team_rating(lineup)) <= 0.3, lineup
+
+        # Same win probability against random $15 opponents
+        games = 4000
+        won = 0
+        for _ in range(games):
+            opponent = [random.choice(by_tier[tier] or everyone) for tier in TIERS]
+            won += simulator.simulate_game(lineup, opponent)['winner'] is lineup
+        seasons = simulate_seasons(np.full(200, pool.ratings[pool.resolve(lineup)[0]].sum()), pool, rng=np_rng)
+        assert abs(won / games - seasons.mean() / 82) < 0.04, (lineup, won / games, seasons.mean() / 82)
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+    import pytest
+    logging_config.configure()
+    for test in (test_roster_index_is_keyed_by_date, test_vectorized_matches_scalar):
+        with tempfile.TemporaryDirectory() as directory, pytest.MonkeyPatch.context() as monkeypatch:
+            test(Path(directory), monkeypatch)
+    logger.info("batch_simulator tests passed")
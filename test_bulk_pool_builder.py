@@ -0,0 +1,83 @@
+import logging
+import logging_config
+from bulk_pool_builder import TIERS, build_pool, compute_columns, load_join_data
+from player_pool import PlayerPool
+from file_store import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+def _row(name, pts, gp=1, **columns):
+    return dict({'PLAYER_NAME': name, 'TEAM_ABBREVIATION': 'TST', 'GP': gp, 'PTS': pts}, **columns)
+
+def test_tier_cutoffs():
+    # Ratings 0.35..35 in steps of 0.35: each row's percentile is its index
+    rows = [_row(f"Player {i}", i + 1) for i in range(100)]
+    cols = compute_columns(rows, per_game=False)
+    assert [round(p, 6) for p in cols['PERCENTILE'].tolist()] == list(range(100))
+
+    pool = build_pool(rows, {}, {}, per_game=False)
+    assert [len(pool[tier]) for tier in TIERS] == [5, 15, 20, 30, 30]
+    # Each tier starts at its percentile cut-off (95/80/60/30), best rated first
+    assert [pool[tier][-1]['name'] for tier in TIERS] == ['Player 95', 'Player 80', 'Player 60', 'Player 30',
+                                                         'Player 0']
+    assert pool['$5'][0]['name'] == 'Player 99'
+
+def test_per_game_scaling():
+    rows = [_row('Starter', 20.5, gp=10, AST=4.0, FGA=15.0, FG_PCT=0.5)]
+    per_game = compute_columns(rows, per_game=True)
+    assert per_game['PTS'].tolist() == [205.0]
+    assert per_game['AST'].tolist() == [40.0]
+    # Rates are never scaled
+    assert per_game['FG_PCT'].tolist() == [0.5]
+
+    totals = compute_columns(rows, per_game=False)
+    assert totals['PTS'].tolist() == [20.5]
+    assert totals['TS_PCT'].tolist() == [68.3]
+
+def test_rows_without_games_are_dropped():
+    rows = [_row('Played', 10, gp=5), _row('Injured', 0, gp=0), _row('Unknown', 0, gp=None)]
+    pool = build_pool(rows, {'Played': 'G'}, {})
+    players = [p for tier in TIERS for p in pool[tier]]
+    assert [p['name'] for p in players] == ['Played']
+    assert players[0]['stats']['gp'] == 5
+    assert players[0]['position'] == 'G'
+    # No 3-season data: the current season stands in
+    assert players[0]['3_season_avg'] == players[0]['stats']
+
+def test_stand_in_averages_are_not_joined(tmp_path):
+    previous = str(tmp_path / 'pool.json')
+    stats = {'pts': 100.0}
+    atomic_write_json(previous, {'$1': [
+        {'name': 'Rookie', 'position': 'F', 'stats': stats, '3_season_avg': stats},
+        {'name': 'Veteran', 'position': 'C', 'stats': stats, '3_season_avg': {'pts': 900.0}}
+    ]})
+    positions, season_avgs = load_join_data([previous])
+    assert positions['Rookie'] == 'F'
+    assert 'Rookie' not in season_avgs
+    assert season_avgs['Veteran'] == {'pts': 900.0}
+
+def test_player_pool_loads_built_pool(tmp_path, monkeypatch):
+    # The app's PlayerPool reads the tier-keyed layout and leaves the built file alone
+    monkeypatch.chdir(tmp_path)
+    rows = [_row(f"Player {i}", i + 1) for i in range(20)]
+    atomic_write_json('player_pool.json', build_pool(rows, {}, {}, per_game=False), pretty=True)
+    before = (tmp_path / 'player_pool.json').read_bytes()
+
+    pool = PlayerPool()
+    assert len(pool.players) == 20
+    assert pool.get_player_cost('Player 19') == 5
+    assert (tmp_path / 'player_pool.json').read_bytes() == before
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+    logging_config.configure()
+    test_tier_cutoffs()
+    test_per_game_scaling()
+    test_rows_without_games_are_dropped()
+    import pytest
+    with tempfile.TemporaryDirectory() as directory:
+        test_stand_in_averages_are_not_joined(Path(directory))
+    with tempfile.TemporaryDirectory() as directory, pytest.MonkeyPatch.context() as monkeypatch:
+        test_player_pool_loads_built_pool(Path(directory), monkeypatch)
+    logger.info("bulk_pool_builder tests passed")
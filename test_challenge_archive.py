@@ -0,0 +1,108 @@
+import os
+import logging
+import logging_config
+import pytest
+import challenge_archive
+import models
+from challenge_archive import archive_month, archived_dates, read_archived_day
+from file_store import atomic_write_json
+from models import CHALLENGE_DIR, get_challenge
+
+logger = logging.getLogger(__name__)
+
+MONTH = '2024-01'
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    challenge_archive._index_cache.clear()
+    yield tmp_path
+    challenge_archive._index_cache.clear()
+
+def _write_day(date, names):
+    data = {'date': date, 'players': [{'name': 'Player A', 'cost': '$3'}], 'lineups': {},
+            'submissions': [{'player_name': name, 'record': {'wins': 41, 'losses': 41}} for name in names]}
+    atomic_write_json(os.path.join(CHALLENGE_DIR, f"{date}.json"), data)
+    return data
+
+def test_archive_round_trip():
+    days = {date: _write_day(date, [f"user-{date}"]) for date in ('2024-01-15', '2024-01-16')}
+    assert archive_month(MONTH) == 2
+    assert archived_dates() == sorted(days)
+    for date, data in days.items():
+        assert read_archived_day(date) == data
+        assert not os.path.exists(os.path.join(CHALLENGE_DIR, f"{date}.json"))
+    assert read_archived_day('2024-01-17') is None
+
+def test_rearchiving_replaces_the_frame():
+    _write_day('2024-01-15', ['ann'])
+    kept = _write_day('2024-01-16', ['bob'])
+    archive_month(MONTH)
+    size = os.path.getsize(challenge_archive._archive_path(MONTH))
+    stale_index = dict(challenge_archive.get_month_index(MONTH))
+
+    # The day is restored, changed and archived again
+    replaced = _write_day('2024-01-15', ['ann', 'cid'])
+    assert archive_month(MONTH) == 1
+    index = challenge_archive.get_month_index(MONTH)
+    assert sorted(index) == ['2024-01-15', '2024-01-16']
+    # No frame is left behind: the file holds exactly the indexed frames
+    assert os.path.getsize(challenge_archive._archive_path(MONTH)) == sum(frame[1] for frame in index.values())
+    assert os.path.getsize(challenge_archive._archive_path(MONTH)) < size + index['2024-01-15'][1]
+    assert read_archived_day('2024-01-15') == replaced
+    assert read_archived_day('2024-01-16') == kept
+
+    # A worker still holding the index from before the rewrite reloads it
+    challenge_archive._index_cache[MONTH] = stale_index
+    assert read_archived_day('2024-01-16') == kept
+    assert read_archived_day('2024-01-15') == replaced
+
+def test_corrupt_archive():
+    _write_day('2024-01-15', ['ann'])
+    kept = _write_day('2024-01-16', ['bob'])
+    archive_month(MONTH)
+    path = challenge_archive._archive_path(MONTH)
+    with open(path, 'rb') as f:
+        payload = f.read()
+
+    # A damaged frame reads as missing, the others are unaffected
+    first = challenge_archive.get_frame_info('2024-01-15')
+    damaged = bytearray(payload)
+    damaged[first[0] + first[1] - 4:first[0] + first[1]] = b'\0\0\0\0'
+    with open(path, 'wb') as f:
+        f.write(bytes(damaged))
+    assert read_archived_day('2024-01-15') is None
+    assert read_archived_day('2024-01-16') == kept
+
+    # An unreadable index is never replaced, so its month's frames are not lost
+    with open(challenge_archive._index_path(MONTH), 'w') as f:
+        f.write('{"2024-01-15": [0,')
+    challenge_archive._index_cache.clear()
+    _write_day('2024-01-17', ['cid'])
+    with pytest.raises(ValueError):
+        archive_month(MONTH)
+    assert os.path.getsize(path) == len(payload)
+    assert os.path.exists(os.path.join(CHALLENGE_DIR, '2024-01-17.json'))
+
+def test_past_days_are_revalidated():
+    models.clear_challenge_cache()
+    try:
+        _write_day('2024-01-15', ['ann'])
+        assert [s['player_name'] for s in get_challenge('2024-01-15', generate=False).submissions] == ['ann']
+        # A past day's file changes (restored, edited): the cached copy is not served
+        _write_day('2024-01-15', ['ann', 'bob'])
+        assert len(get_challenge('2024-01-15', generate=False).submissions) == 2
+
+        archive_month(MONTH)
+        assert get_challenge('2024-01-15', generate=False).archived
+        _write_day('2024-01-15', ['ann', 'bob', 'cid'])
+        archive_month(MONTH)
+        challenge = get_challenge('2024-01-15', generate=False)
+        assert challenge.archived and len(challenge.submissions) == 3
+        assert get_challenge('2024-01-15', generate=False) is challenge
+    finally:
+        models.clear_challenge_cache()
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
@@ -0,0 +1,62 @@
+import os
+import random
+import shutil
+import logging
+import logging_config
+import pytest
+import challenge_manifest
+import models
+from models import DailyChallenge
+
+logger = logging.getLogger(__name__)
+
+POOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'player_pool.json')
+DATE = '2024-01-15'
+
+@pytest.fixture
+def challenge(tmp_path, monkeypatch):
+    shutil.copy(POOL_FILE, tmp_path / 'player_pool.json')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(challenge_manifest, '_manifest', None)
+    models.clear_challenge_cache()
+    random.seed(7)
+    yield DailyChallenge(DATE)
+    models.clear_challenge_cache()
+
+def _team(challenge, skip=0):
+    """A valid $15 team: one player per tier"""
+    return [next(p for p in challenge.players if p['cost'] == cost) if cost != '$1' else
+            [p for p in challenge.players if p['cost'] == '$1'][skip] for cost in ('$5', '$4', '$3', '$2', '$1')]
+
+def test_submissions_update_the_summary(challenge):
+    assert challenge_manifest.get_summary(DATE) == {'submission_count': 0, 'top_record': None, 'top_player': None}
+    challenge.submit_team('ann', _team(challenge), {'wins': 40, 'losses': 42})
+    challenge.submit_team('bob', _team(challenge, 1), {'wins': 50, 'losses': 32})
+    challenge.submit_team('cid', _team(challenge, 2), {'wins': 50, 'losses': 32})
+    assert challenge_manifest.get_summary(DATE) == {'submission_count': 3, 'top_record': {'wins': 50, 'losses': 32},
+                                                   'top_player': 'bob'}
+    # A duplicate is not counted
+    challenge.submit_team('ann', _team(challenge), {'wins': 60, 'losses': 22})
+    assert challenge_manifest.get_summary(DATE)['submission_count'] == 3
+
+    # The incremental summary matches a rebuild from the challenge files
+    assert challenge_manifest.rebuild()['dates'][DATE] == challenge_manifest.get_summary(DATE)
+
+def test_corrupt_manifest_is_rebuilt(challenge):
+    challenge.submit_team('ann', _team(challenge), {'wins': 40, 'losses': 42})
+    with open(challenge_manifest.MANIFEST_FILE, 'w') as f:
+        f.write('{"dates": {"2024-01-1')
+    challenge_manifest._manifest = None
+
+    # Updates never write over a manifest they cannot read...
+    challenge.submit_team('bob', _team(challenge, 1), {'wins': 50, 'losses': 32})
+    with open(challenge_manifest.MANIFEST_FILE, 'r') as f:
+        assert f.read() == '{"dates": {"2024-01-1'
+    # ...and the next read rebuilds it from the challenge files
+    assert challenge_manifest.get_summary(DATE) == {'submission_count': 2, 'top_record': {'wins': 50, 'losses': 32},
+                                                   'top_player': 'bob'}
+    assert challenge_manifest.list_dates(before='2024-02-01') == [DATE]
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
@@ -1,13 +1,29 @@
-from data_fetcher import NBADataFetcher
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
 import logging
+import logging_config
+from data_fetcher import NBADataFetcher
+from nba_stub_server import RecordedData, StubServer
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+@contextmanager
+def stats_upstream():
+    """NBA_STATS_BASE_URL if set, else an in-process stub serving the recorded league dump"""
+    if os.environ.get('NBA_STATS_BASE_URL'):
+        yield os.environ['NBA_STATS_BASE_URL'].rstrip('/'), None
+        return
+    stub = StubServer(RecordedData(os.path.join(HERE, 'cache', 'player_stats.json'),
+                                   [os.path.join(HERE, 'player_pool.json')])).start()
+    try:
+        yield stub.url, stub
+    finally:
+        stub.stop()
+
 def test_data_fetcher():
     fetcher = NBADataFetcher()
     
@@ -15,7 +31,7 @@ def test_data_fetcher():
     logger.info("Testing get_player_stats()...")
     df = fetcher.get_player_stats()
     logger.info(f"Retrieved stats for {len(df)} players")
-    logger.info(f"Sample player stats:\n{df[['PLAYER_NAME', 'PTS', 'AST', 'REB', 'STL', 'BLK', 'FG_PCT', 'TS_PCT']].head()}")
+    logger.info(f"Sample player stats:\n{df[['name', 'pts', 'ast', 'reb', 'stl', 'blk', 'fg_pct', 'ts_pct']].head()}")
     
     # Test 2: Get active players
     logger.info("\nTesting get_active_players()...")
@@ -40,14 +56,38 @@ def test_data_fetcher():
     top_scorers = fetcher.get_top_scorers(limit=5)
     logger.info("Top 5 scorers:")
     for player in top_scorers:
-        logger.info(f"{player['PLAYER_NAME']}: {player['PTS']} PPG")
+        logger.info(f"{player['name']}: {player['stats']['pts']} PPG")
     
     # Test 4: Get bottom scorers
     logger.info("\nTesting get_bottom_scorers()...")
     bottom_scorers = fetcher.get_bottom_scorers(limit=5)
     logger.info("Bottom 5 scorers:")
     for player in bottom_scorers:
-        logger.info(f"{player['PLAYER_NAME']}: {player['PTS']} PPG")
+        logger.info(f"{player['name']}: {player['stats']['pts']} PPG")
+
+def test_league_player_stats_revalidates():
+    directory = tempfile.mkdtemp()
+    try:
+        with stats_upstream() as (base_url, stub):
+            fetcher = NBADataFetcher()
+            fetcher.base_url = base_url
+            fetcher.cache_dir = directory
+
+            rows = fetcher.get_league_player_stats(refresh=True)
+            assert rows and 'PLAYER_NAME' in rows[0]
+            cached = fetcher._read_cache_entry('player_stats')
+            assert cached['data'] == rows and cached['validators']
+
+            # Unchanged upstream data comes back as a 304 and keeps the cached rows
+            assert fetcher.get_league_player_stats(refresh=True) == rows
+            if stub is not None:
+                assert stub.stats()['requests']['leaguedashplayerstats'] == {'200': 1, '304': 1}
+                assert len(rows) == len(stub.data.rows)
+    finally:
+        shutil.rmtree(directory)
 
 if __name__ == '__main__':
-    test_data_fetcher() 
\ No newline at end of file
+    logging_config.configure()
+    test_data_fetcher()
+    test_league_player_stats_revalidates()
+    logger.info("data_fetcher tests passed")
@@ -0,0 +1,172 @@
+import json
+import threading
+import logging
+import logging_config
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_session
+from requests.exceptions import TooManyRedirects
+from http_session import CircuitBreaker, CircuitOpenError, request_json
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD = {'resultSets': [{'name': 'LeagueDashPlayerStats', 'headers': ['PLAYER_ID', 'PTS'],
+                           'rowSet': [[1, 20.5], [2, 11.0]]}]}
+ETAG = '"v1"'
+
+class StandInServer:
+    """Local server counting requests, connections and 304s per path"""
+
+    def __init__(self):
+        self.hits = {}
+        self.clients = set()
+        self.not_modified = 0
+        self.flaky_failures = 2
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                server.hits[path] = server.hits.get(path, 0) + 1
+                server.clients.add(self.client_address)
+                if path == '/stats/players':
+                    if self.headers.get('If-None-Match') == ETAG:
+                        server.not_modified += 1
+                        return self._send(304, headers={'ETag': ETAG})
+                    return self._send(200, json.dumps(PAYLOAD).encode(),
+                                      {'ETag': ETAG, 'Content-Type': 'application/json'})
+                if path == '/stats/flaky' and server.hits[path] <= server.flaky_failures:
+                    return self._send(503, headers={'Retry-After': '0'})
+                if path == '/stats/flaky':
+                    return self._send(200, json.dumps(PAYLOAD).encode(), {'Content-Type': 'application/json'})
+                if path == '/stats/down':
+                    return self._send(500)
+                if path == '/stats/loop':
+                    return self._send(302, headers={'Location': '/stats/loop'})
+                return self._send(404)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/stats"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def test_keep_alive_and_conditional_requests():
+    server = StandInServer()
+    try:
+        breaker = CircuitBreaker('test')
+        data, validators = request_json(f"{server.url}/players", breaker=breaker)
+        assert data == PAYLOAD and validators == {'etag': ETAG}
+
+        # Unchanged data comes back as a 304 without a body
+        for _ in range(3):
+            data, validators = request_json(f"{server.url}/players", validators=validators, breaker=breaker)
+            assert data is None and validators['etag'] == ETAG
+        assert server.not_modified == 3
+
+        # All four requests went over one pooled connection
+        assert len(server.clients) == 1, server.clients
+        assert http_session.get_session() is http_session.get_session()
+    finally:
+        server.close()
+
+def test_retries_with_backoff():
+    server = StandInServer()
+    try:
+        data, _ = request_json(f"{server.url}/flaky", breaker=CircuitBreaker('test'), max_retries=3,
+                               backoff_base=0.01, backoff_cap=0.05)
+        assert data == PAYLOAD
+        assert server.hits['/stats/flaky'] == 3
+        for attempt in range(10):
+            assert 0 <= http_session.backoff_delay(attempt, 0.5, 8) <= 8
+    finally:
+        server.close()
+
+def test_circuit_breaker_fails_fast():
+    server = StandInServer()
+    try:
+        breaker = CircuitBreaker('test', threshold=3, cooldown=60)
+        try:
+            request_json(f"{server.url}/down", breaker=breaker, max_retries=5, backoff_base=0.01, backoff_cap=0.01)
+            assert False, 'expected the breaker to open'
+        except CircuitOpenError:
+            pass
+        assert server.hits['/stats/down'] == 3
+        assert breaker.state == 'open'
+
+        # While open, calls fail without reaching the upstream
+        try:
+            request_json(f"{server.url}/players", breaker=breaker)
+            assert False, 'expected CircuitOpenError'
+        except CircuitOpenError:
+            pass
+        assert '/stats/players' not in server.hits
+
+        # After the cooldown one trial request goes through and closes it again
+        breaker.cooldown = 0
+        assert breaker.state == 'half-open'
+        data, _ = request_json(f"{server.url}/players", breaker=breaker)
+        assert data == PAYLOAD and breaker.state == 'closed'
+    finally:
+        server.close()
+
+def test_half_open_admits_one_trial():
+    breaker = CircuitBreaker('test', threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == 'half-open'
+    start = threading.Barrier(16)
+    allowed = []
+
+    def attempt():
+        start.wait()
+        allowed.append(breaker.allow())
+
+    threads = [threading.Thread(target=attempt) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert allowed.count(True) == 1, allowed
+
+def test_failed_trial_reopens_circuit():
+    server = StandInServer()
+    try:
+        breaker = CircuitBreaker('test', threshold=1, cooldown=0)
+        breaker.record_failure()
+        assert breaker.state == 'half-open'
+        # The trial dies on a non-transport error: it must still be reported, not left claimed
+        try:
+            request_json(f"{server.url}/loop", breaker=breaker, max_retries=3)
+            assert False, 'expected TooManyRedirects'
+        except TooManyRedirects:
+            pass
+        assert breaker.allow(), 'the next trial must be admitted after the cooldown'
+        breaker.record_success()
+
+        data, _ = request_json(f"{server.url}/players", breaker=breaker)
+        assert data == PAYLOAD and breaker.state == 'closed'
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    logging_config.configure()
+    test_keep_alive_and_conditional_requests()
+    test_retries_with_backoff()
+    test_circuit_breaker_fails_fast()
+    test_half_open_admits_one_trial()
+    test_failed_trial_reopens_circuit()
+    logger.info("http_session tests passed")
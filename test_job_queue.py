@@ -0,0 +1,97 @@
+import os
+import logging
+import logging_config
+from concurrent.futures import ProcessPoolExecutor, wait
+import pytest
+import job_queue
+
+logger = logging.getLogger(__name__)
+
+def _echo(params, progress):
+    progress(1, 1)
+    return params
+
+def _crash(params, progress):
+    os._exit(1)
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(job_queue.JOB_TYPES, 'echo', _echo)
+    monkeypatch.setitem(job_queue.JOB_TYPES, 'crash', _crash)
+    os.makedirs(job_queue.QUEUE_DIR)
+    os.makedirs(job_queue.RUNNING_DIR)
+    return tmp_path
+
+def _drain(workers=2, rounds=10):
+    """Run the worker loop's steps until the queue is empty; returns how often the pool broke"""
+    running, breaks = {}, 0
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for _ in range(rounds):
+            if job_queue._fill(executor, running, workers):
+                breaks += 1
+            if not running:
+                break
+            wait(list(running))
+            if job_queue._reap(running):
+                breaks += 1
+                executor.shutdown(wait=True)
+                executor = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        executor.shutdown(wait=True)
+    return breaks
+
+def test_enqueue_claim_complete(queue):
+    job = job_queue.submit_job('echo', {'value': 1})
+    assert job_queue.get_job(job['id'])['status'] == 'queued'
+    assert len(os.listdir(job_queue.QUEUE_DIR)) == 1
+
+    marker = job_queue._claim_next(set())
+    assert marker.endswith(job['id'])
+    assert os.listdir(job_queue.QUEUE_DIR) == [] and os.listdir(job_queue.RUNNING_DIR) == [marker]
+    assert job_queue._claim_next(set()) is None
+
+    assert job_queue.execute_job(job['id']) == 'done'
+    done = job_queue.get_job(job['id'])
+    assert done['status'] == 'done' and done['result'] == {'value': 1}
+    assert done['progress'] == {'done': 1, 'total': 1}
+
+def test_worker_runs_jobs_in_order(queue):
+    jobs = [job_queue.submit_job('echo', {'value': i}) for i in range(3)]
+    assert _drain(workers=1) == 0
+    for i, job in enumerate(jobs):
+        assert job_queue.get_job(job['id'])['result'] == {'value': i}
+    assert os.listdir(job_queue.QUEUE_DIR) == [] and os.listdir(job_queue.RUNNING_DIR) == []
+
+def test_crashed_pool_is_recovered(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOB_MAX_ATTEMPTS', 2)
+    crash = job_queue.submit_job('crash', {})
+    echo = job_queue.submit_job('echo', {'value': 2})
+    assert _drain() >= 2
+
+    # The job that kills its process is retried alone, then failed; the one sharing its pool still runs
+    crashed = job_queue.get_job(crash['id'])
+    assert crashed['status'] == 'failed' and crashed['attempts'] == 2
+    assert job_queue.get_job(echo['id'])['result'] == {'value': 2}
+    assert os.listdir(job_queue.QUEUE_DIR) == [] and os.listdir(job_queue.RUNNING_DIR) == []
+
+def test_orphans_are_requeued(queue):
+    job = job_queue.submit_job('echo', {})
+    marker = job_queue._claim_next(set())
+    job_queue._update_job(job['id'], status='running', worker_pid=2 ** 22 + 1)
+    assert job_queue.requeue_orphans() == 1
+    assert job_queue.get_job(job['id'])['status'] == 'queued'
+    assert os.listdir(job_queue.QUEUE_DIR) == [marker]
+
+def test_removed_job_is_skipped(queue):
+    job = job_queue.submit_job('echo', {})
+    os.remove(job_queue._job_path(job['id']))
+    assert job_queue._update_job(job['id'], status='running') is None
+    assert job_queue.execute_job(job['id']) == 'failed'
+    assert _drain() == 0
+    assert os.listdir(job_queue.RUNNING_DIR) == []
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
@@ -0,0 +1,47 @@
+import json
+import logging
+import logging_config
+import pytest
+from flask import Flask
+import json_provider
+
+logger = logging.getLogger(__name__)
+
+class Money:
+    def __init__(self, amount):
+        self.amount = amount
+
+@pytest.fixture
+def provider():
+    app = Flask(__name__)
+    json_provider.init_app(app)
+    return app.json
+
+def test_dumps_is_compact_by_default(provider):
+    assert provider.dumps({'b': 1, 'a': [1, 2]}) == '{"b":1,"a":[1,2]}'
+    assert provider.loads(b'{"a": 1}') == {'a': 1}
+
+def test_dumps_honors_keyword_arguments(provider):
+    data = {'b': 1, 'a': {'d': 2, 'c': 3}}
+    assert list(json.loads(provider.dumps(data, sort_keys=True))) == ['a', 'b']
+    assert provider.dumps(data, sort_keys=True).index('"c"') < provider.dumps(data, sort_keys=True).index('"d"')
+    assert json.loads(provider.dumps({'cost': Money(5)}, default=lambda o: f"${o.amount}")) == {'cost': '$5'}
+    assert provider.dumps(data, indent=2).startswith('{\n  "') and json.loads(provider.dumps(data, indent=2)) == data
+    assert provider.dumps({'name': 'Dončić'}, ensure_ascii=True) == '{"name": "Don\\u010di\\u0107"}'
+    # Options without an orjson equivalent still work, through the stdlib provider
+    assert provider.dumps(data, indent=4).startswith('{\n    "') and json.loads(provider.dumps(data, indent=4)) == data
+    with pytest.raises(TypeError):
+        provider.dumps({'cost': Money(5)}, default=None)
+
+@pytest.mark.skipif(json_provider.orjson is None, reason='orjson is not installed')
+def test_orjson_options():
+    orjson = json_provider.orjson
+    assert json_provider._orjson_option({'sort_keys': True}) & orjson.OPT_SORT_KEYS
+    assert json_provider._orjson_option({'indent': 2, 'separators': (',', ': ')}) & orjson.OPT_INDENT_2
+    assert json_provider._orjson_option({'ensure_ascii': False, 'default': str}) is not None
+    for kwargs in ({'indent': 4}, {'ensure_ascii': True}, {'separators': (', ', ': ')}, {'cls': json.JSONEncoder}):
+        assert json_provider._orjson_option(kwargs) is None, kwargs
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
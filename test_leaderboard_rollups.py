@@ -0,0 +1,71 @@
+import logging
+import logging_config
+import pytest
+import file_store
+import leaderboard_rollups
+from leaderboard_rollups import CLOSED_DAYS_FILE, PERIODS, close_day, get_period_leaderboard
+
+logger = logging.getLogger(__name__)
+
+DATE = '2024-01-15'
+SUBMISSIONS = [
+    {'player_name': 'ann', 'record': {'wins': 50, 'losses': 32}},
+    {'player_name': 'bob', 'record': {'wins': 40, 'losses': 42}},
+    {'player_name': 'cid', 'team': []}  # No record yet: not counted
+]
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    leaderboard_rollups._rollup_cache.clear()
+    return tmp_path
+
+def test_close_day_round_trip():
+    assert close_day(DATE, SUBMISSIONS)
+    assert not close_day(DATE, SUBMISSIONS)
+    close_day('2024-01-16', [{'player_name': 'bob', 'record': {'wins': 30, 'losses': 52}}])
+    for period in PERIODS:
+        board = get_period_leaderboard(period, leaderboard_rollups.period_key(period, DATE))
+        assert board['days'] == 2
+        assert [(e['player_name'], e['wins'], e['losses'], e['days']) for e in board['leaderboard']] == \
+            [('bob', 70, 94, 2), ('ann', 50, 32, 1)]
+        assert [e['rank'] for e in board['leaderboard']] == [1, 2]
+
+def test_retry_after_crash_counts_day_once(monkeypatch):
+    write = file_store.atomic_write_json
+
+    def crash_on_index(path, data, pretty=False):
+        if path == CLOSED_DAYS_FILE:
+            raise OSError('disk full')
+        write(path, data, pretty)
+
+    # The period files are written, then the process dies before the closed-days index
+    monkeypatch.setattr(leaderboard_rollups, 'atomic_write_json', crash_on_index)
+    with pytest.raises(OSError):
+        close_day(DATE, SUBMISSIONS)
+    monkeypatch.setattr(leaderboard_rollups, 'atomic_write_json', write)
+
+    assert close_day(DATE, SUBMISSIONS)
+    for period in PERIODS:
+        board = get_period_leaderboard(period, leaderboard_rollups.period_key(period, DATE))
+        assert board['days'] == 1
+        assert board['leaderboard'][0]['wins'] == 50
+
+def test_corrupt_rollup_is_not_overwritten():
+    close_day(DATE, SUBMISSIONS)
+    path = leaderboard_rollups._rollup_path('month', '2024-01')
+    with open(path, 'w') as f:
+        f.write('{"users": {"ann"')
+
+    # Folding a day into an unreadable rollup would silently reset its totals
+    with pytest.raises(ValueError):
+        close_day('2024-01-16', SUBMISSIONS)
+    with open(path, 'r') as f:
+        assert f.read() == '{"users": {"ann"'
+    with pytest.raises(ValueError):
+        get_period_leaderboard('month', '2024-01')
+    assert get_period_leaderboard('all')['days'] == 1
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
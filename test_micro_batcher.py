@@ -0,0 +1,60 @@
+import threading
+import logging
+import logging_config
+import pytest
+from micro_batcher import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+def _submit_concurrently(batcher, items):
+    """Submit every item from its own thread; returns item -> result or raised error"""
+    outcomes = {}
+    start = threading.Barrier(len(items))
+
+    def call(item):
+        start.wait()
+        try:
+            outcomes[item] = batcher.submit(item)
+        except Exception as e:
+            outcomes[item] = e
+
+    threads = [threading.Thread(target=call, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+def test_followers_get_results_from_the_leaders_batch():
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    # The leader waits until the batch is full, so all four callers share one batch
+    batcher = MicroBatcher(process, max_wait_ms=5000, max_batch=4, name='test')
+    outcomes = _submit_concurrently(batcher, [1, 2, 3, 4])
+    assert outcomes == {1: 10, 2: 20, 3: 30, 4: 40}
+    assert len(batches) == 1 and sorted(batches[0]) == [1, 2, 3, 4]
+    assert batcher.stats()['batches'] == 1 and batcher.stats()['requests'] == 4
+
+    # A full batch is closed: the next caller leads a new one
+    batcher.wait_ms = 0
+    assert batcher.submit(5) == 50
+    assert batches[-1] == [5]
+
+def test_batch_error_reaches_every_caller():
+    def process(items):
+        raise ValueError('simulation failed')
+
+    outcomes = _submit_concurrently(MicroBatcher(process, max_wait_ms=5000, max_batch=3), ['a', 'b', 'c'])
+    assert all(isinstance(error, ValueError) for error in outcomes.values()), outcomes
+
+    short = MicroBatcher(lambda items: items[:1], max_wait_ms=5000, max_batch=2)
+    outcomes = _submit_concurrently(short, ['a', 'b'])
+    assert all(isinstance(error, RuntimeError) for error in outcomes.values()), outcomes
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
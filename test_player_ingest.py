@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+import logging_config
+from player_ingest import Checkpoint, HttpFetcher, RateLimiter, ingest, write_pool
+from nba_stub_server import RecordedData, StubServer
+
+logger = logging.getLogger(__name__)
+
+RECORDED_STATS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'player_stats.json')
+CAREER_HEADERS = ['PLAYER_ID', 'SEASON_ID', 'TEAM_ABBREVIATION', 'GP', 'PTS', 'AST', 'REB', 'STL', 'BLK',
+                  'FGA', 'FTA', 'FG_PCT', 'FG3_PCT', 'FT_PCT', 'TOV']
+
+class RecordedFetcher:
+    """Serves stats.nba.com shaped responses built from the recorded league stats"""
+
+    def __init__(self, limit=20, fail_ids=()):
+        with open(RECORDED_STATS, 'r') as f:
+            rows = json.load(f)['data'][:limit]
+        self.rows = {row['PLAYER_ID']: row for row in rows}
+        self.fail_ids = set(fail_ids)
+        self.calls = []  # (monotonic time, endpoint, player id)
+        self._lock = threading.Lock()
+
+    def active_players(self):
+        return [{'id': pid, 'full_name': row['PLAYER_NAME']} for pid, row in self.rows.items()]
+
+    def _log(self, endpoint, player_id):
+        with self._lock:
+            self.calls.append((time.monotonic(), endpoint, player_id))
+        if player_id in self.fail_ids:
+            raise ConnectionError(f"recorded failure for {player_id}")
+
+    def career_stats(self, player_id):
+        self._log('career', player_id)
+        row = self.rows[player_id]
+        values = [player_id, '2024-25'] + [row.get(h) for h in CAREER_HEADERS[2:]]
+        return {'resultSets': [{'name': 'SeasonTotalsRegularSeason', 'headers': CAREER_HEADERS, 'rowSet': [values]}]}
+
+    def player_info(self, player_id):
+        self._log('info', player_id)
+        row = self.rows[player_id]
+        return {'resultSets': [{
+            'name': 'CommonPlayerInfo',
+            'headers': ['PERSON_ID', 'DISPLAY_FIRST_LAST', 'POSITION', 'TEAM_ABBREVIATION'],
+            'rowSet': [[player_id, row['PLAYER_NAME'], 'Guard', row['TEAM_ABBREVIATION']]]
+        }]}
+
+def test_ingest_respects_rate():
+    directory = tempfile.mkdtemp()
+    try:
+        fetcher = RecordedFetcher(limit=20)
+        players = fetcher.active_players()
+        checkpoint = Checkpoint(os.path.join(directory, 'players.jsonl'))
+        counts = ingest(fetcher, players, checkpoint, RateLimiter(rate=50, burst=1), workers=8)
+        assert counts['ok'] == 20, counts
+
+        # 40 requests at 50/s with no burst take at least 39 intervals
+        times = sorted(t for t, _, _ in fetcher.calls)
+        assert len(times) == 40
+        assert times[-1] - times[0] >= 39 / 50 * 0.95
+
+        written = write_pool(players, checkpoint, os.path.join(directory, 'pool.json'))
+        with open(os.path.join(directory, 'pool.json'), 'r') as f:
+            pool = json.load(f)
+        assert written == len(pool) == 20
+        assert [p['name'] for p in pool] == [p['full_name'] for p in players]
+        assert all(p['rating'] > 0 and 'stats' in p for p in pool)
+    finally:
+        shutil.rmtree(directory)
+
+def test_ingest_resumes_from_checkpoint():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'players.jsonl')
+        fetcher = RecordedFetcher(limit=12, fail_ids=())
+        players = fetcher.active_players()
+        failing = players[3]['id']
+
+        # First run stops after 6 players, and one of them fails
+        first = RecordedFetcher(limit=12, fail_ids=(failing,))
+        counts = ingest(first, players[:6], Checkpoint(path), RateLimiter(rate=0), workers=4, max_retries=0)
+        assert counts == {'skipped': 0, 'ok': 5, 'empty': 0, 'failed': 1}, counts
+
+        # A write cut short by a kill must not break the next run
+        with open(path, 'a') as f:
+            f.write('{"player_id": ')
+
+        counts = ingest(fetcher, players, Checkpoint(path), RateLimiter(rate=0), workers=4, max_retries=0)
+        assert counts == {'skipped': 5, 'ok': 7, 'empty': 0, 'failed': 0}, counts
+        fetched = {pid for _, endpoint, pid in fetcher.calls if endpoint == 'career'}
+        assert fetched == {p['id'] for p in players[6:]} | {failing}
+
+        entries = Checkpoint(path).load()
+        assert all(entries[p['id']]['status'] == 'ok' for p in players)
+    finally:
+        shutil.rmtree(directory)
+
+class CountingLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__(rate=0)
+        self.acquired = 0
+        self._count_lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._count_lock:
+            self.acquired += 1
+
+def test_every_request_takes_a_token():
+    # Against a failing upstream, retries happen in fetch_player only, one token each
+    directory = tempfile.mkdtemp()
+    stub = StubServer(RecordedData(RECORDED_STATS, []), error_rate=1.0).start()
+    try:
+        players = RecordedFetcher(limit=2).active_players()
+        limiter = CountingLimiter()
+        counts = ingest(HttpFetcher(stub.url), players, Checkpoint(os.path.join(directory, 'players.jsonl')),
+                        limiter, workers=2, max_retries=1)
+        assert counts['failed'] == 2, counts
+        assert stub.stats()['requests']['playercareerstats'] == {'500': 4}
+        assert limiter.acquired == stub.stats()['total'] == 4
+    finally:
+        stub.stop()
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    logging_config.configure()
+    test_ingest_respects_rate()
+    test_ingest_resumes_from_checkpoint()
+    test_every_request_takes_a_token()
+    logger.info("player_ingest tests passed")
@@ -0,0 +1,81 @@
+import gzip
+import json
+import logging
+import logging_config
+import pytest
+from flask import Flask
+import response_cache
+from response_cache import CachedResponse, cached_json, make_response
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD = {'players': [{'name': f"Player {i}", 'cost': '$3'} for i in range(40)]}
+
+@pytest.fixture
+def app(tmp_path):
+    source = tmp_path / 'source.json'
+    source.write_text(json.dumps(PAYLOAD))
+    flask_app = Flask(__name__)
+    calls = []
+
+    @flask_app.route('/data')
+    @cached_json(sources=[str(source)])
+    def data():
+        calls.append(1)
+        return json.loads(source.read_text())
+
+    response_cache.clear_cache()
+    flask_app.calls = calls
+    flask_app.source = source
+    yield flask_app
+    response_cache.clear_cache()
+
+def test_if_none_match_returns_304(app):
+    client = app.test_client()
+    first = client.get('/data')
+    assert first.status_code == 200 and first.get_json() == PAYLOAD
+    etag = first.headers['ETag']
+
+    for header in (etag, f'"other", {etag}', '*'):
+        response = client.get('/data', headers={'If-None-Match': header})
+        assert response.status_code == 304 and response.data == b''
+        assert response.headers['ETag'] == etag
+    assert client.get('/data', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert len(app.calls) == 1
+
+    # Rewriting the source file changes the body and so the ETag
+    app.source.write_text(json.dumps({'players': []}))
+    changed = client.get('/data', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.get_json() == {'players': []}
+    assert changed.headers['ETag'] != etag
+
+def test_gzip_negotiation(app):
+    client = app.test_client()
+    compressed = client.get('/data', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == PAYLOAD
+    for header in ('gzip;q=0', 'identity', '*;q=0'):
+        plain = client.get('/data', headers={'Accept-Encoding': header})
+        assert 'Content-Encoding' not in plain.headers and plain.get_json() == PAYLOAD
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('br, gzip', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip, br;q=0', 'gzip'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('*', 'br'),
+    ('*, br;q=0', 'gzip'),
+    ('br;q=0, gzip;q=0', None),
+    ('', None)
+])
+def test_brotli_negotiation_honors_q(accept_encoding, expected):
+    entry = CachedResponse(json.dumps(PAYLOAD).encode())
+    entry.br = b'brotli body'  # Negotiation only; brotli itself may not be installed
+    with Flask(__name__).test_request_context(headers={'Accept-Encoding': accept_encoding}):
+        response = make_response(entry, 60)
+    assert response.headers.get('Content-Encoding') == expected
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+if __name__ == '__main__':
+    logging_config.configure()
+    raise SystemExit(pytest.main(['-q', __file__]))
@@ -0,0 +1,160 @@
+"""
+Per-user history across challenge days.
+Each user has a small file under data/users holding their per-day record, rank
+and percentile, updated on every submission, so history, streaks and lifetime
+stats never have to open challenge files.
+
+Rebuild from all challenges: python user_history.py --rebuild
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import logging
+import logging_config
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from file_store import atomic_write_json, file_lock
+
+logger = logging.getLogger(__name__)
+
+USER_HISTORY_DIR = 'data/users'
+USER_HISTORY_LOCK = os.path.join(USER_HISTORY_DIR, '.lock')
+
+def _record_key(record: Dict) -> tuple:
+    return (record['wins'], -record['losses'])
+
+def _percentile(rank: int, total: int) -> float:
+    """Percentile for a 1-based rank, matching DailyChallenge.calculate_percentile"""
+    if total <= 1:
+        return 100
+    return round(100 - (((rank - 1) / (total - 1)) * 100), 1)
+
+def _user_path(player_name: str) -> str:
+    digest = hashlib.sha1(player_name.encode('utf-8')).hexdigest()[:20]
+    return os.path.join(USER_HISTORY_DIR, f"{digest}.json")
+
+def _read_user(player_name: str) -> Dict:
+    try:
+        with open(_user_path(player_name), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'player_name': player_name, 'days': {}}
+
+def _day_entry(submission: Dict, rank: int, total: int) -> Dict:
+    return {
+        'record': submission['record'],
+        'lineup': submission.get('lineup'),
+        'rank': rank,
+        'percentile': _percentile(rank, total),
+        'entries': total
+    }
+
+def rank_submissions(submissions: List[Dict]) -> Dict[str, Dict]:
+    """Rank every submission of a day, keyed by player name"""
+    ranked = sorted(
+        (sub for sub in submissions if isinstance(sub.get('record'), dict) and 'wins' in sub['record']),
+        key=lambda sub: _record_key(sub['record']),
+        reverse=True
+    )
+    total = len(ranked)
+    return {sub['player_name']: _day_entry(sub, i + 1, total) for i, sub in enumerate(ranked)}
+
+def _merge(updates: Dict[str, Dict[str, Dict]]) -> None:
+    """Merge {player_name: {date: entry}} into the user files"""
+    with file_lock(USER_HISTORY_LOCK):
+        for player_name, days in updates.items():
+            history = _read_user(player_name)
+            history['days'].update(days)
+            atomic_write_json(_user_path(player_name), history)
+
+def record_submission(date: str, submission: Dict, submissions: List[Dict]) -> None:
+    """Record a new submission; its rank is provisional until the day is refreshed"""
+    try:
+        key = _record_key(submission['record'])
+        total = sum(1 for sub in submissions if isinstance(sub.get('record'), dict) and 'wins' in sub['record'])
+        rank = 1 + sum(1 for sub in submissions
+                       if isinstance(sub.get('record'), dict) and 'wins' in sub['record']
+                       and _record_key(sub['record']) > key)
+        _merge({submission['player_name']: {date: _day_entry(submission, rank, total)}})
+    except Exception as e:
+        logger.error(f"Error recording history for {submission.get('player_name')}: {str(e)}")
+
+def refresh_day(date: str, submissions: List[Dict]) -> None:
+    """Recompute final ranks and percentiles of a day for all of its players"""
+    _merge({name: {date: entry} for name, entry in rank_submissions(submissions).items()})
+
+def get_history(player_name: str) -> Optional[Dict]:
+    """Get a user's per-day history, or None if they never submitted"""
+    history = _read_user(player_name)
+    if not history['days']:
+        return None
+    return history
+
+def _streaks(dates: List[str]) -> Dict:
+    """Current and longest streaks of consecutive days played"""
+    longest = current = 0
+    previous = None
+    for date in dates:
+        day = datetime.strptime(date, '%Y-%m-%d').date()
+        current = current + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    # A streak is still alive if the last day played was today or yesterday
+    if previous is None or (datetime.now().date() - previous).days > 1:
+        current = 0
+    return {'current_streak': current, 'longest_streak': longest}
+
+def get_lifetime_stats(history: Dict) -> Dict:
+    """Lifetime aggregates over a user's history"""
+    days = history['days']
+    dates = sorted(days)
+    wins = sum(days[d]['record']['wins'] for d in dates)
+    losses = sum(days[d]['record']['losses'] for d in dates)
+    stats = {
+        'days_played': len(dates),
+        'total_wins': wins,
+        'total_losses': losses,
+        'win_pct': round(wins / (wins + losses), 3) if wins + losses else 0,
+        'best_rank': min((days[d]['rank'] for d in dates), default=None),
+        'average_percentile': round(sum(days[d]['percentile'] for d in dates) / len(dates), 1) if dates else 0,
+        'first_played': dates[0] if dates else None,
+        'last_played': dates[-1] if dates else None
+    }
+    stats.update(_streaks(dates))
+    return stats
+
+def rebuild(flush_every: int = 30) -> int:
+    """Rebuild all user files from the challenge archive, one day at a time"""
+    import challenge_manifest
+    from models import DailyChallenge
+
+    dates = sorted(challenge_manifest.list_dates())
+    pending = {}
+    for i, date in enumerate(dates, 1):
+        challenge = DailyChallenge(date, generate=False)
+        for name, entry in rank_submissions(challenge.submissions).items():
+            pending.setdefault(name, {})[date] = entry
+        if i % flush_every == 0:
+            _merge(pending)
+            pending = {}
+    _merge(pending)
+    logger.info(f"Rebuilt user history from {len(dates)} challenge days")
+    return len(dates)
+
+def main():
+    parser = argparse.ArgumentParser(description='User history index')
+    parser.add_argument('--rebuild', action='store_true', help='rebuild the index from all challenges')
+    parser.add_argument('--user', help='print the history of a user')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"Processed {rebuild()} challenge day(s)")
+    if args.user:
+        history = get_history(args.user)
+        print(json.dumps({'history': history, 'stats': get_lifetime_stats(history) if history else None}, indent=2))
+
+if __name__ == '__main__':
+    logging_config.configure()
+    main()
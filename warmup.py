@@ -0,0 +1,108 @@
+"""
+Worker warm-up.
+Run from gunicorn's post_worker_init hook, before the worker starts accepting
+connections: loads the player pool, today's challenge and its roster's
+rating/tier index and the leaderboards, compiles the templates and pre-renders the hot read-only
+responses into the response cache, so a freshly (re)started worker serves its
+first requests warm. Each step is timed and a failing step is logged and skipped.
+Warm-up requests are marked so metrics does not count them as traffic, and
+/healthz reports the worker unready until warm-up has finished.
+"""
+
+import gc
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+from metrics import UNCOUNTED_ENVIRON_KEY, gauge
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+WARMUP_SECONDS = gauge('budget_gm_worker_warmup_seconds', 'Time the worker spent warming up before serving')
+
+_ready = False
+
+def is_ready() -> bool:
+    """Whether this worker has finished warming up"""
+    return _ready
+
+def _hot_paths(today: str) -> List[str]:
+    """Read-only endpoints worth having in the response cache before the first request"""
+    return [
+        '/api/players',
+        f'/api/challenge/{today}',
+        '/api/available_dates?summary=1',
+        '/api/leaderboard?period=week',
+        '/api/leaderboard?period=month',
+        '/api/leaderboard?period=all'
+    ]
+
+def _steps(app_module, today: str) -> List[Tuple[str, Callable]]:
+    import batch_simulator
+    import challenge_manifest
+    import leaderboard_rollups
+    import micro_batcher
+
+    flask_app = app_module.app
+
+    def compile_templates():
+        for name in flask_app.jinja_env.list_templates():
+            flask_app.jinja_env.get_template(name)
+
+    def load_challenge():
+        challenge = app_module.load_challenge(today)
+        challenge.get_leaderboard()
+        batch_simulator.get_roster_index(challenge)
+
+    def load_leaderboards():
+        for period in leaderboard_rollups.PERIODS:
+            leaderboard_rollups.get_period_leaderboard(period)
+
+    def prerender():
+        client = flask_app.test_client()
+        for path in _hot_paths(today):
+            response = client.get(path, headers={'Accept-Encoding': 'br, gzip'},
+                                  environ_base={UNCOUNTED_ENVIRON_KEY: True})
+            if response.status_code >= 400:
+                logger.debug(f"Warm-up request {path} returned {response.status_code}")
+
+    return [
+        ('player pool', app_module.get_cached_player_pool),
+        ('simulation batcher', micro_batcher.get_season_batcher),
+        ('templates', compile_templates),
+        ("today's challenge", load_challenge),
+        ('challenge manifest', challenge_manifest.list_dates),
+        ('leaderboards', load_leaderboards),
+        ('hot responses', prerender)
+    ]
+
+def warm_up(app_module) -> Dict[str, float]:
+    """Run every warm-up step against the loaded app module; returns each step's time in seconds"""
+    global _ready
+    timings = {}
+    if not WARMUP_ENABLED:
+        _ready = True
+        return timings
+
+    today = datetime.now().strftime('%Y-%m-%d')
+    start = time.perf_counter()
+    for name, step in _steps(app_module, today):
+        step_start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"Warm-up step '{name}' failed: {str(e)}")
+        timings[name] = time.perf_counter() - step_start
+    # Leave the warm-up garbage behind before the first real request
+    gc.collect()
+
+    total = time.perf_counter() - start
+    WARMUP_SECONDS.set(total)
+    _ready = True
+    slowest = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in
+                        sorted(timings.items(), key=lambda item: item[1], reverse=True)[:3])
+    logger.info(f"Worker {os.getpid()} warmed up in {total:.2f}s ({slowest}), ready")
+    return timings